@@ -7,6 +7,8 @@ from fastapi.responses import PlainTextResponse
 from pyfiglet import figlet_format
 from core.config import settings
 from core.redis_client import redis_client
+from core.ssm_client import ssm_client
+from services.feature_flag_service import feature_flag_service
 from loguru import logger
 
 
@@ -39,14 +41,24 @@ async def readiness():
     redis_status = "disabled"
     is_ready = True
 
-    # check redis if it's enabled
+    # redis is reported but doesn't gate readiness, reads fall back to ssm and the
+    # snapshot while it's down, and pulling every replica at once would be an outage
     if settings.redis_enabled:
-        if redis_client.is_connected():
+        if await redis_client.is_connected():
             redis_status = "connected"
         else:
-            redis_status = "disconnected"
+            redis_status = "unavailable"
+            logger.warning("Redis unavailable, serving from SSM and the snapshot")
+
+    # with warm-up on, stay out of rotation until the flag snapshot is loaded
+    snapshot_status = "disabled"
+    if settings.snapshot_warmup_enabled and settings.ssm_enabled:
+        if feature_flag_service.snapshot_loaded:
+            snapshot_status = "loaded"
+        else:
+            snapshot_status = "loading"
             is_ready = False
-            logger.warning("Readiness check failed: Redis not connected")
+            logger.warning("Readiness check failed: flag snapshot not loaded")
 
     status_text = "READY" if is_ready else "NOT READY"
     ascii_art = generate_ascii_status(status_text)
@@ -55,7 +67,9 @@ async def readiness():
         f"App: {settings.app_name}\n"
         f"Version: {settings.app_version}\n"
         f"Environment: {settings.environment}\n"
-        f"Redis: {redis_status}"
+        f"Redis: {redis_status}\n"
+        f"Snapshot: {snapshot_status}\n"
+        f"Circuits: redis {redis_client.breaker.state}, ssm {ssm_client.breaker.state}"
     )
 
     # return 503 if not ready
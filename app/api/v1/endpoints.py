@@ -38,7 +38,7 @@ async def info():
 
     redis_connected = False
     if settings.redis_enabled:
-        redis_connected = redis_client.is_connected()
+        redis_connected = await redis_client.is_connected()
 
     return InfoResponse(
         app_name=settings.app_name,
@@ -67,8 +67,8 @@ async def test_cache():
     try:
         test_key = "test:connection"
         test_value = "ok"
-        client.set(test_key, test_value, ex=60)
-        retrieved_value = client.get(test_key)
+        await client.set(test_key, test_value, ex=60)
+        retrieved_value = await client.get(test_key)
 
         if retrieved_value == test_value:
             logger.info("Redis cache test successful")
@@ -3,8 +3,21 @@ Feature flag API endpoints.
 CRUD operations and flag evaluation.
 """
 
-from fastapi import APIRouter, HTTPException, status, Query
-from typing import List, Optional
+from fastapi import APIRouter, HTTPException, status, Query, Request, Response
+from fastapi.responses import StreamingResponse
+from typing import (
+    AsyncGenerator,
+    AsyncIterator,
+    Dict,
+    Iterable,
+    List,
+    Literal,
+    Optional,
+    Set,
+    TypeVar,
+)
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
 from loguru import logger
 
 from models.feature_flag import (
@@ -13,18 +26,145 @@ from models.feature_flag import (
     FeatureFlagUpdate,
     FeatureFlagEvaluation,
     FeatureFlagEvaluationResult,
+    FeatureFlagBatchEvaluation,
+    FeatureFlagBatchEvaluationResult,
+    FlagImportResult,
 )
-from services.feature_flag_service import feature_flag_service
+from services.feature_flag_service import FlagConflictError, feature_flag_service
+from services.flag_import import FlagImporter, iter_lines
+from services.flag_stream import FlagStream
+from services.config_version import config_version
+from services.flag_index import SortOrder, decode_cursor, encode_cursor
+from services.targeting import InvalidRuleError
+from core import metrics
+from core.serialization import dumps, model_response
 
 
 router = APIRouter(prefix="/flags", tags=["feature-flags"])
 
+T = TypeVar("T")
+
+
+def _validators(etag: str, last_modified: Optional[datetime]) -> Dict[str, str]:
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if last_modified:
+        headers["Last-Modified"] = format_datetime(last_modified.astimezone(timezone.utc), True)
+    return headers
+
+
+def _not_modified(request: Request, etag: str, last_modified: Optional[datetime]) -> bool:
+    # If-None-Match wins over If-Modified-Since, like RFC 9110 says
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        tags = [tag.strip() for tag in if_none_match.split(",")]
+        return "*" in tags or etag in tags or etag.removeprefix("W/") in tags
+
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since and last_modified:
+        try:
+            since = parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return False
+        return last_modified.replace(microsecond=0) <= since
+    return False
+
+
+# flags per chunk written to a streamed listing
+STREAM_CHUNK = 100
+
+
+def _projection(fields: Optional[str]) -> Optional[Set[str]]:
+    if not fields:
+        return None
+    include = {name.strip() for name in fields.split(",") if name.strip()}
+    unknown = include - set(FeatureFlag.model_fields)
+    if unknown:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail=f"Unknown fields: {', '.join(sorted(unknown))}",
+        )
+    return include
+
+
+async def _as_async(flags: Iterable[FeatureFlag]) -> AsyncIterator[FeatureFlag]:
+    for flag in flags:
+        yield flag
+
+
+async def _started(items: AsyncGenerator[T, None]) -> AsyncIterator[T]:
+    # pulls the first item before the response starts, so a body that can't be read
+    # is an error status and not a 200 that's empty or cut short
+    try:
+        first = await items.__anext__()
+    except StopAsyncIteration:
+        return _as_async([])
+
+    async def resumed():
+        try:
+            yield first
+            async for item in items:
+                yield item
+        finally:
+            # a client that disconnected closes this, pass it on so cleanup runs now
+            await items.aclose()
+
+    return resumed()
+
+
+async def _encode_flags(
+    flags: AsyncIterator[FeatureFlag], include: Optional[Set[str]], ndjson: bool
+) -> AsyncIterator[str]:
+    # one flag at a time into small chunks, memory doesn't grow with the number of flags
+    def encode(flag: FeatureFlag) -> str:
+        if include is None:
+            return flag.model_dump_json()
+        return dumps(flag.model_dump(mode="json", include=include)).decode()
+
+    def join(encoded: List[str], first: bool) -> str:
+        if ndjson:
+            return "".join(line + "\n" for line in encoded)
+        return ("" if first else ",") + ",".join(encoded)
+
+    chunk: List[str] = []
+    first = True
+    try:
+        if not ndjson:
+            yield "["
+        async for flag in flags:
+            chunk.append(encode(flag))
+            if len(chunk) >= STREAM_CHUNK:
+                yield join(chunk, first)
+                first = False
+                chunk = []
+        if chunk:
+            yield join(chunk, first)
+        if not ndjson:
+            yield "]"
+    except Exception as e:
+        # headers are gone already, all we can do is cut the response short
+        logger.error(f"Error streaming flags: {e}")
+        raise
+
+
+def _json(content: bytes) -> Response:
+    # evaluation results encode themselves, response_model is only there for the docs
+    return Response(content=content, media_type="application/json")
+
+
+def _flag_etag(flag: FeatureFlag) -> str:
+    # version alone repeats if a flag is deleted and created again
+    updated_ms = int(flag.updated_at.timestamp() * 1000) if flag.updated_at else 0
+    return f'W/"{flag.version}-{updated_ms}"'
+
 
 @router.post("", response_model=FeatureFlag, status_code=status.HTTP_201_CREATED)
 async def create_feature_flag(flag_data: FeatureFlagCreate):
     try:
-        flag = feature_flag_service.create_flag(flag_data)
-        return flag
+        # strict: an ssm write that fails is an error, not a change only the caches have
+        flag = await feature_flag_service.create_flag(flag_data, strict=True)
+        return model_response(flag, status_code=status.HTTP_201_CREATED)
+    except InvalidRuleError as e:
+        raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail=str(e))
     except ValueError as e:
         raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=str(e))
     except Exception as e:
@@ -36,36 +176,154 @@ async def create_feature_flag(flag_data: FeatureFlagCreate):
 
 
 @router.get("", response_model=List[FeatureFlag])
-async def list_feature_flags():
+async def list_feature_flags(
+    request: Request,
+    prefix: Optional[str] = Query(None, description="Only keys starting with this"),
+    sort: SortOrder = Query("key", description="key, or updated_at (newest first)"),
+    limit: Optional[int] = Query(None, ge=1, le=1000),
+    offset: int = Query(0, ge=0),
+    cursor: Optional[str] = Query(None, description="X-Next-Cursor of the previous page"),
+    fields: Optional[str] = Query(None, description="Comma separated, e.g. key,enabled"),
+    output: Literal["json", "ndjson"] = Query("json", alias="format"),
+):
+    # the config version changes on every write, so an unchanged list costs one redis read
+    headers: Dict[str, str] = {}
+    current = await config_version.current()
+    if current:
+        headers = _validators(*current)
+        if _not_modified(request, *current):
+            return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+    # metadata filters come in as ?metadata.team=checkout
+    metadata = {
+        name.removeprefix("metadata."): value
+        for name, value in request.query_params.items()
+        if name.startswith("metadata.")
+    }
+    include = _projection(fields)
     try:
-        flags = feature_flag_service.list_flags()
-        return flags
+        after = decode_cursor(sort, cursor) if cursor else None
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+
+    query = dict(prefix=prefix, metadata=metadata, order=sort, after=after, offset=offset)
+    try:
+        if limit is None:
+            flags = await _started(feature_flag_service.iter_flags(**query))
+        else:
+            # one extra tells whether there's a next page
+            page = await feature_flag_service.list_flags(**query, limit=limit + 1)
     except Exception as e:
+        # no validators on an error, a client mustn't keep it as the current list
         logger.error(f"Error listing flags: {e}")
         raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Failed to list feature flags"
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Failed to list feature flags",
+        )
+
+    if limit is not None:
+        if len(page) > limit:
+            page = page[:limit]
+            next_cursor = encode_cursor(sort, page[-1])
+            next_url = request.url.remove_query_params("offset").include_query_params(
+                cursor=next_cursor
+            )
+            headers["X-Next-Cursor"] = next_cursor
+            headers["Link"] = f'<{next_url}>; rel="next"'
+        flags = _as_async(page)
+
+    ndjson = output == "ndjson" or "application/x-ndjson" in request.headers.get("accept", "")
+    return StreamingResponse(
+        _encode_flags(flags, include, ndjson),
+        media_type="application/x-ndjson" if ndjson else "application/json",
+        headers=headers,
+    )
+
+
+@router.get("/stream")
+async def stream_feature_flags():
+    # declared before /{flag_key} so "stream" isn't taken for a flag key
+    try:
+        events = await _started(FlagStream().events())
+    except Exception as e:
+        logger.error(f"Error starting flag stream: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Failed to read feature flags",
+        )
+    return StreamingResponse(
+        events,
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@router.get("/export")
+async def export_feature_flags(
+    prefix: Optional[str] = Query(None, description="Only keys starting with this"),
+):
+    # every flag as NDJSON straight off the index, the input format of /flags/import
+    try:
+        flags = await _started(feature_flag_service.iter_flags(prefix=prefix))
+    except Exception as e:
+        logger.error(f"Error exporting flags: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Failed to export feature flags",
         )
+    return StreamingResponse(
+        _encode_flags(flags, None, ndjson=True),
+        media_type="application/x-ndjson",
+        headers={"Content-Disposition": 'attachment; filename="flags.ndjson"'},
+    )
+
+
+@router.post("/import", response_model=List[FlagImportResult])
+async def import_feature_flags(
+    request: Request,
+    overwrite: bool = Query(False, description="Update flags that already exist"),
+):
+    # the body is read a line at a time as workers free up. Results go out once it's all
+    # in, a streamed response would compete with the upload for the connection
+    importer = FlagImporter(overwrite=overwrite)
+    lines = []
+    async for result in importer.run(iter_lines(request.stream())):
+        lines.append(result.model_dump_json(exclude_none=True) + "\n")
+    return Response(content="".join(lines), media_type="application/x-ndjson")
 
 
 @router.get("/{flag_key}", response_model=FeatureFlag)
-async def get_feature_flag(flag_key: str):
-    flag = feature_flag_service.get_flag(flag_key)
-    if not flag:
+async def get_feature_flag(flag_key: str, request: Request):
+    found = await feature_flag_service.get_flag_payload(flag_key)
+    if not found:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND, detail=f"Feature flag '{flag_key}' not found"
         )
-    return flag
+
+    flag, payload = found
+    etag = _flag_etag(flag)
+    headers = _validators(etag, flag.updated_at)
+    if _not_modified(request, etag, flag.updated_at):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    # cached bytes go out as they are, no validation or encoding per request
+    return Response(content=payload, media_type="application/json", headers=headers)
 
 
 @router.put("/{flag_key}", response_model=FeatureFlag)
 async def update_feature_flag(flag_key: str, update_data: FeatureFlagUpdate):
     try:
-        flag = feature_flag_service.update_flag(flag_key, update_data)
+        flag = await feature_flag_service.update_flag(flag_key, update_data, strict=True)
         if not flag:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND, detail=f"Feature flag '{flag_key}' not found"
             )
-        return flag
+        return model_response(flag)
+    except HTTPException:
+        raise
+    except FlagConflictError as e:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=str(e))
+    except InvalidRuleError as e:
+        raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail=str(e))
     except Exception as e:
         logger.error(f"Error updating flag: {e}")
         raise HTTPException(
@@ -77,13 +335,15 @@ async def update_feature_flag(flag_key: str, update_data: FeatureFlagUpdate):
 @router.delete("/{flag_key}", status_code=status.HTTP_204_NO_CONTENT)
 async def delete_feature_flag(flag_key: str):
     try:
-        success = feature_flag_service.delete_flag(flag_key)
+        success = await feature_flag_service.delete_flag(flag_key, strict=True)
         if not success:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND, detail=f"Feature flag '{flag_key}' not found"
             )
     except HTTPException:
         raise
+    except FlagConflictError as e:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=str(e))
     except Exception as e:
         logger.error(f"Error deleting flag: {e}")
         raise HTTPException(
@@ -95,11 +355,12 @@ async def delete_feature_flag(flag_key: str):
 @router.post("/evaluate", response_model=FeatureFlagEvaluationResult)
 async def evaluate_feature_flag(evaluation: FeatureFlagEvaluation):
     try:
-        result = feature_flag_service.evaluate_flag(
+        result = await feature_flag_service.evaluate_flag(
             flag_key=evaluation.key, user_id=evaluation.user_id, context=evaluation.context
         )
-        return result
+        return _json(result.to_json())
     except Exception as e:
+        metrics.errors.labels("evaluation").inc()
         logger.error(f"Error evaluating flag: {e}")
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -107,12 +368,29 @@ async def evaluate_feature_flag(evaluation: FeatureFlagEvaluation):
         )
 
 
+@router.post("/evaluate/batch", response_model=FeatureFlagBatchEvaluationResult)
+async def evaluate_feature_flags_batch(evaluation: FeatureFlagBatchEvaluation):
+    try:
+        result = await feature_flag_service.evaluate_flags(
+            flag_keys=evaluation.flags, users=evaluation.users
+        )
+        return _json(result.to_json())
+    except Exception as e:
+        metrics.errors.labels("evaluation").inc()
+        logger.error(f"Error evaluating flags in batch: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Failed to evaluate feature flags",
+        )
+
+
 @router.get("/{flag_key}/evaluate", response_model=FeatureFlagEvaluationResult)
 async def evaluate_feature_flag_get(flag_key: str, user_id: Optional[str] = Query(None)):
     try:
-        result = feature_flag_service.evaluate_flag(flag_key=flag_key, user_id=user_id)
-        return result
+        result = await feature_flag_service.evaluate_flag(flag_key=flag_key, user_id=user_id)
+        return _json(result.to_json())
     except Exception as e:
+        metrics.errors.labels("evaluation").inc()
         logger.error(f"Error evaluating flag: {e}")
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
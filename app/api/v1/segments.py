@@ -0,0 +1,111 @@
+"""
+Segment API endpoints.
+Manage named user segments that flags target with the segment strategy.
+"""
+
+from fastapi import APIRouter, HTTPException, status
+from typing import List
+from loguru import logger
+
+from models.segment import (
+    Segment,
+    SegmentCreate,
+    SegmentMembers,
+    SegmentMembersResult,
+    SegmentMembership,
+)
+from services.segment_service import segment_service
+
+
+router = APIRouter(prefix="/segments", tags=["segments"])
+
+
+def _not_found(name: str) -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_404_NOT_FOUND, detail=f"Segment '{name}' not found"
+    )
+
+
+@router.post("", response_model=Segment, status_code=status.HTTP_201_CREATED)
+async def create_segment(segment_data: SegmentCreate):
+    try:
+        return await segment_service.create_segment(segment_data)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=str(e))
+    except Exception as e:
+        logger.error(f"Error creating segment: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Failed to create segment"
+        )
+
+
+@router.get("", response_model=List[Segment])
+async def list_segments():
+    try:
+        return await segment_service.list_segments()
+    except Exception as e:
+        logger.error(f"Error listing segments: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Failed to list segments"
+        )
+
+
+@router.get("/{name}", response_model=Segment)
+async def get_segment(name: str):
+    try:
+        segment = await segment_service.get_segment(name)
+    except Exception as e:
+        logger.error(f"Error getting segment: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Failed to get segment"
+        )
+    if not segment:
+        raise _not_found(name)
+    return segment
+
+
+@router.delete("/{name}", status_code=status.HTTP_204_NO_CONTENT)
+async def delete_segment(name: str):
+    try:
+        deleted = await segment_service.delete_segment(name)
+    except Exception as e:
+        logger.error(f"Error deleting segment: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Failed to delete segment"
+        )
+    if not deleted:
+        raise _not_found(name)
+
+
+@router.post("/{name}/members", response_model=SegmentMembersResult)
+async def add_segment_members(name: str, members: SegmentMembers):
+    try:
+        result = await segment_service.add_members(name, members.user_ids)
+    except Exception as e:
+        logger.error(f"Error adding segment members: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Failed to add members"
+        )
+    if result is None:
+        raise _not_found(name)
+    return result
+
+
+@router.post("/{name}/members/remove", response_model=SegmentMembersResult)
+async def remove_segment_members(name: str, members: SegmentMembers):
+    try:
+        result = await segment_service.remove_members(name, members.user_ids)
+    except Exception as e:
+        logger.error(f"Error removing segment members: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Failed to remove members"
+        )
+    if result is None:
+        raise _not_found(name)
+    return result
+
+
+@router.get("/{name}/members/{user_id}", response_model=SegmentMembership)
+async def check_segment_membership(name: str, user_id: str):
+    member = await segment_service.is_member(name, user_id)
+    return SegmentMembership(name=name, user_id=user_id, member=member)
@@ -0,0 +1,84 @@
+"""
+Circuit breaker for backend calls.
+After `threshold` failures inside `window` seconds the circuit opens and
+callers fail fast instead of waiting on timeouts. After `reset_timeout` one
+call is let through as a probe; its result closes or re-opens the circuit.
+Everything runs on the event loop, so no locking.
+"""
+
+import time
+from collections import deque
+from typing import Deque
+
+from loguru import logger
+
+from core import metrics
+
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitOpenError(Exception):
+    pass
+
+
+class CircuitBreaker:
+    def __init__(self, name: str, threshold: int, window: float, reset_timeout: float):
+        self.name = name
+        self.threshold = threshold
+        self.window = window
+        self.reset_timeout = reset_timeout
+        self._state = CLOSED
+        self._failures: Deque[float] = deque()
+        self._opened_at = 0.0
+
+    @property
+    def state(self) -> str:
+        return self._state
+
+    @property
+    def enabled(self) -> bool:
+        return self.threshold > 0
+
+    def _set_state(self, state: str):
+        if state == self._state:
+            return
+        logger.warning(f"{self.name} circuit {self._state} -> {state}")
+        metrics.circuit_transitions.labels(self.name, state).inc()
+        self._state = state
+
+    def allow(self) -> bool:
+        if self._state == CLOSED:
+            return True
+        if self._state == OPEN and time.monotonic() - self._opened_at >= self.reset_timeout:
+            # let exactly one call through to find out if the backend is back
+            self._set_state(HALF_OPEN)
+            return True
+        return False
+
+    def record_success(self):
+        if self._state != CLOSED:
+            self._failures.clear()
+            self._set_state(CLOSED)
+
+    def record_failure(self):
+        if not self.enabled:
+            return
+
+        now = time.monotonic()
+        if self._state == HALF_OPEN:
+            self._trip(now)
+            return
+
+        self._failures.append(now)
+        while self._failures and now - self._failures[0] > self.window:
+            self._failures.popleft()
+        if self._state == CLOSED and len(self._failures) >= self.threshold:
+            self._trip(now)
+
+    def _trip(self, now: float):
+        self._opened_at = now
+        self._failures.clear()
+        self._set_state(OPEN)
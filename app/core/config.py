@@ -27,17 +27,72 @@ class Settings(BaseSettings):
     redis_password: str | None = None
     redis_enabled: bool = False
 
+    # redis connection pool, timeouts in seconds
+    redis_max_connections: int = 50
+    redis_pool_timeout: float = 2.0
+    redis_connect_timeout: float = 5.0
+    redis_socket_timeout: float = 5.0
+    # background ping that notices outages and reconnects (seconds, 0 = off)
+    redis_health_check_interval: float = 5.0
+
     # aws stuff - also disabled by default
     aws_region: str = "us-east-1"
     ssm_enabled: bool = False
     ssm_prefix: str = "/feature-flags"
+    # size of the thread pool blocking boto3 calls run on
+    ssm_max_workers: int = 8
+    # how long to gather single flag reads into one GetParameters call
+    ssm_batch_window_ms: float = 2.0
+
+    # circuit breakers: open after this many backend errors within the window (0 = never),
+    # then fail fast for reset_timeout seconds before letting a probe through
+    redis_breaker_threshold: int = 5
+    ssm_breaker_threshold: int = 5
+    circuit_breaker_window: float = 30.0
+    circuit_breaker_reset_timeout: float = 10.0
 
     # how long to cache flags in redis == 5 minutes
     feature_flag_cache_ttl: int = 300
+    # how long to remember keys ssm says don't exist, locally and in redis (seconds, 0 = off)
+    negative_cache_ttl: int = 10
+
+    # push flag changes to every replica over redis pub/sub
+    flag_change_events_enabled: bool = True
+    flag_change_channel: str = "feature_flags:changes"
+
+    # in-process snapshot in front of redis, ttl in seconds
+    local_cache_enabled: bool = True
+    local_cache_ttl: int = 30
+    local_cache_max_size: int = 10000
+    # expired snapshot entries keep being served for this long while they're refreshed in
+    # the background, which also covers redis and ssm outages (seconds, 0 = off)
+    local_cache_stale_ttl: int = 300
+
+    # single evaluations remembered per (flag version, user, context), 0 = off
+    evaluation_memo_size: int = 100000
+
+    # load every flag on startup, then refresh from the flag index (seconds, 0 = off)
+    snapshot_warmup_enabled: bool = False
+    snapshot_refresh_interval: int = 20
+    snapshot_refresh_jitter: float = 0.1
+
+    # flag index used for listing, rebuilt from a full ssm scan this often (seconds, 0 = never)
+    flag_index_ttl: int = 3600
+
+    # server-sent events stream: keepalive comment interval (seconds) and per-client backlog
+    flag_stream_keepalive: int = 15
+    flag_stream_queue_size: int = 1000
+
+    # bulk import: flags written in parallel, and attempts per flag when ssm throttles or fails
+    import_concurrency: int = 4
+    import_max_retries: int = 5
 
     # logging level
     log_level: str = "INFO"
 
+    # expose prometheus metrics on /metrics
+    metrics_enabled: bool = True
+
 
 # global settings instance
 settings = Settings()
@@ -0,0 +1,206 @@
+"""
+Minimal Prometheus metrics.
+Counters and histograms rendered in the text exposition format, with
+children pre-bound per label set so recording is just an addition.
+Everything runs on the event loop, so no locking.
+"""
+
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Sequence, Tuple
+
+
+# seconds, from sub-millisecond cache hits up to slow ssm calls
+DEFAULT_BUCKETS = (
+    0.00005,
+    0.0001,
+    0.00025,
+    0.0005,
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+)
+
+
+def _escape(value: str) -> str:
+    # label values are quoted, the text format escapes backslash, quote and newline
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class _CounterChild:
+    __slots__ = ("value",)
+
+    def __init__(self):
+        self.value = 0.0
+
+    def inc(self, amount: float = 1.0):
+        self.value += amount
+
+
+class Counter:
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children: Dict[Tuple[str, ...], _CounterChild] = {}
+
+    def labels(self, *values: str) -> _CounterChild:
+        child = self._children.get(values)
+        if child is None:
+            child = self._children[values] = _CounterChild()
+        return child
+
+    def inc(self, amount: float = 1.0):
+        self.labels().inc(amount)
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        for values, child in self._children.items():
+            lines.append(f"{self.name}{_format_labels(self.labelnames, values)} {child.value}")
+        return lines
+
+
+class _HistogramChild:
+    __slots__ = ("buckets", "counts", "sum", "count")
+
+    def __init__(self, buckets: Tuple[float, ...]):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        index = bisect_left(self.buckets, value)
+        if index < len(self.counts):
+            self.counts[index] += 1
+        self.sum += value
+        self.count += 1
+
+    @contextmanager
+    def time(self) -> Iterator[None]:
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start)
+
+
+class Histogram:
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS,
+    ):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._children: Dict[Tuple[str, ...], _HistogramChild] = {}
+
+    def labels(self, *values: str) -> _HistogramChild:
+        child = self._children.get(values)
+        if child is None:
+            child = self._children[values] = _HistogramChild(self.buckets)
+        return child
+
+    def observe(self, value: float):
+        self.labels().observe(value)
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        for values, child in self._children.items():
+            cumulative = 0
+            for bound, count in zip(self.buckets, child.counts):
+                cumulative += count
+                labels = _format_labels(self.labelnames, values, f'le="{bound}"')
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            labels = _format_labels(self.labelnames, values, 'le="+Inf"')
+            lines.append(f"{self.name}_bucket{labels} {child.count}")
+            labels = _format_labels(self.labelnames, values)
+            lines.append(f"{self.name}_sum{labels} {child.sum}")
+            lines.append(f"{self.name}_count{labels} {child.count}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: List = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+redis_latency = registry.register(
+    Histogram("feature_flag_redis_seconds", "Redis command latency", ["operation"])
+)
+ssm_latency = registry.register(
+    Histogram("feature_flag_ssm_seconds", "SSM API call latency", ["operation"])
+)
+evaluation_latency = registry.register(
+    Histogram("feature_flag_evaluation_seconds", "Flag evaluation time", ["kind"])
+)
+cache_lookups = registry.register(
+    Counter("feature_flag_cache_lookups_total", "Flag lookups per cache tier", ["tier", "result"])
+)
+memo_lookups = registry.register(
+    Counter("feature_flag_evaluation_memo_total", "Evaluation memo lookups", ["result"])
+)
+evaluations = registry.register(
+    Counter("feature_flag_evaluations_total", "Evaluation results", ["matched_rule"])
+)
+circuit_transitions = registry.register(
+    Counter(
+        "feature_flag_circuit_transitions_total",
+        "Circuit breaker state changes",
+        ["backend", "state"],
+    )
+)
+import_items = registry.register(
+    Counter("feature_flag_import_items_total", "Bulk import results per line", ["status"])
+)
+import_retries = registry.register(
+    Counter("feature_flag_import_retries_total", "Bulk import writes retried after SSM errors")
+)
+errors = registry.register(
+    Counter("feature_flag_errors_total", "Errors talking to backends", ["component"])
+)
+
+
+def rule_label(matched_rule: str) -> str:
+    # percentage_25 / percentage_bp_1250 would explode cardinality, fold them together
+    if matched_rule.startswith("percentage_") and matched_rule != "percentage_not_matched":
+        return "percentage"
+    # same for user-named custom rules and segments
+    if matched_rule.startswith("custom:"):
+        return "custom"
+    if matched_rule.startswith("segment:"):
+        return "segment"
+    return matched_rule
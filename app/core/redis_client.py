@@ -2,39 +2,67 @@
 Redis client wrapper
 Handles connection, disconnection, and basic health checks
 Gracefully fails if redis isn't available
+Uses redis.asyncio so cache calls never block the event loop
+A circuit breaker hides the client once calls keep failing, and a background
+monitor pings it to notice outages, recover and reconnect
 """
 
-import redis
+import asyncio
+import redis.asyncio as redis
 from typing import Optional
 from loguru import logger
 from core.config import settings
+from core.circuit_breaker import CLOSED, CircuitBreaker
+from core import metrics
+
+# errors that say redis itself is in trouble, as opposed to a bad command or payload
+CONNECTION_ERRORS = (redis.ConnectionError, redis.TimeoutError, OSError, asyncio.TimeoutError)
+
+REDIS_ERRORS = metrics.errors.labels("redis")
 
 
 class RedisClient:
     def __init__(self):
         self._client: Optional[redis.Redis] = None
+        self._pool: Optional[redis.BlockingConnectionPool] = None
         self._connected: bool = False
+        self.breaker = CircuitBreaker(
+            "redis",
+            threshold=settings.redis_breaker_threshold,
+            window=settings.circuit_breaker_window,
+            reset_timeout=settings.circuit_breaker_reset_timeout,
+        )
+        self._monitor: Optional[asyncio.Task] = None
+        # recovery probe started from get_client when the monitor is off
+        self._probe_task: Optional[asyncio.Task] = None
 
-    def connect(self) -> bool:
+    async def connect(self) -> bool:
         # don't even try if redis is disabled
         if not settings.redis_enabled:
             logger.info("Redis is disabled")
             return False
 
         try:
-            self._client = redis.Redis(
+            # blocking pool waits for a free connection instead of erroring under bursts
+            self._pool = redis.BlockingConnectionPool(
                 host=settings.redis_host,
                 port=settings.redis_port,
                 db=settings.redis_db,
                 password=settings.redis_password,
                 decode_responses=True,
-                socket_connect_timeout=5,
-                socket_timeout=5,
+                max_connections=settings.redis_max_connections,
+                timeout=settings.redis_pool_timeout,
+                socket_connect_timeout=settings.redis_connect_timeout,
+                socket_timeout=settings.redis_socket_timeout,
             )
+            self._client = redis.Redis(connection_pool=self._pool)
             # test the connection
-            self._client.ping()
+            await self._client.ping()
             self._connected = True
-            logger.info(f"Connected to Redis at {settings.redis_host}:{settings.redis_port}")
+            logger.info(
+                f"Connected to Redis at {settings.redis_host}:{settings.redis_port} "
+                f"(pool size {settings.redis_max_connections})"
+            )
             return True
         except redis.ConnectionError as e:
             # this is expected if redis isn't running
@@ -46,32 +74,108 @@ class RedisClient:
             self._connected = False
             return False
 
-    def disconnect(self):
+    async def disconnect(self):
         if self._client:
             try:
-                self._client.close()
+                await self._client.aclose()
+                if self._pool:
+                    await self._pool.disconnect()
                 logger.info("Disconnected from Redis")
             except Exception as e:
                 logger.error(f"Error disconnecting from Redis: {e}")
             finally:
                 self._connected = False
                 self._client = None
+                self._pool = None
 
-    def is_connected(self) -> bool:
+    async def is_connected(self) -> bool:
         if not self._connected or not self._client:
             return False
 
+        # the monitor is already pinging, don't add a round-trip per probe
+        if self._monitor:
+            return self.breaker.state == CLOSED
+
         try:
-            self._client.ping()
+            await self._client.ping()
             return True
-        except Exception:
-            # connection died, mark as disconnected
-            self._connected = False
+        except Exception as e:
+            # let the breaker take it, get_client probes it closed again once redis is back
+            self.record_error(e)
             return False
 
     def get_client(self) -> Optional[redis.Redis]:
-        # only return client if we're actually connected
-        return self._client if self._connected else None
+        # only return client if we're actually connected and it isn't failing,
+        # callers already treat None as "no redis" and fall back
+        if not self._connected:
+            return None
+        if self.breaker.state != CLOSED:
+            # with the monitor off nothing else would ever probe, so the first caller
+            # after the reset timeout starts one and keeps falling back meanwhile
+            if not self._monitor and self.breaker.allow():
+                self._probe_task = asyncio.create_task(self._probe())
+            return None
+        return self._client
+
+    def record_error(self, error: Exception):
+        REDIS_ERRORS.inc()
+        if isinstance(error, CONNECTION_ERRORS):
+            self.breaker.record_failure()
+
+    async def _ping(self) -> bool:
+        try:
+            await asyncio.wait_for(self._client.ping(), settings.redis_connect_timeout)
+            return True
+        except Exception as e:
+            logger.debug(f"Redis ping failed: {e}")
+            return False
+
+    async def _check(self):
+        if not self._connected:
+            # never connected, or gave up on the old pool
+            await self.disconnect()
+            await self.connect()
+            return
+
+        if self.breaker.state == CLOSED:
+            if not await self._ping():
+                self.breaker.record_failure()
+        elif self.breaker.allow():
+            # open long enough, this ping is the probe
+            await self._probe()
+
+    async def _probe(self):
+        if await self._ping():
+            self.breaker.record_success()
+        else:
+            self.breaker.record_failure()
+
+    async def _run_monitor(self):
+        while True:
+            await asyncio.sleep(settings.redis_health_check_interval)
+            try:
+                await self._check()
+            except Exception as e:
+                logger.error(f"Redis health check failed: {e}")
+
+    def start_monitor(self):
+        if not settings.redis_enabled or settings.redis_health_check_interval <= 0:
+            return
+        if self._monitor:
+            return
+
+        self._monitor = asyncio.create_task(self._run_monitor())
+
+    async def stop_monitor(self):
+        if not self._monitor:
+            return
+
+        self._monitor.cancel()
+        try:
+            await self._monitor
+        except asyncio.CancelledError:
+            pass
+        self._monitor = None
 
 
 # global redis client instance
@@ -0,0 +1,46 @@
+"""
+JSON encoding for responses.
+Uses orjson when it's installed (pip install .[fast]) and falls back to the
+stdlib json module, so both produce the same compact output.
+"""
+
+import json
+from typing import Any, Mapping, Optional
+
+from fastapi.responses import JSONResponse, Response
+from pydantic import BaseModel
+
+try:
+    import orjson
+except ImportError:  # optional speedup
+    orjson = None
+
+
+def dumps(content: Any) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(content)
+    return json.dumps(content, separators=(",", ":"), ensure_ascii=False).encode()
+
+
+def loads(data: Any) -> Any:
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+class FastJSONResponse(JSONResponse):
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+
+def model_response(
+    model: BaseModel, status_code: int = 200, headers: Optional[Mapping[str, str]] = None
+) -> Response:
+    # the model is already validated, skip the response_model round trip and let
+    # pydantic encode it directly
+    return Response(
+        content=model.model_dump_json(),
+        status_code=status_code,
+        headers=headers,
+        media_type="application/json",
+    )
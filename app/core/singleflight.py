@@ -0,0 +1,25 @@
+"""
+Request coalescing for concurrent lookups of the same key.
+Only the first caller does the work, everyone else awaits its result.
+"""
+
+import asyncio
+from typing import Any, Awaitable, Callable, Dict
+
+
+class SingleFlight:
+    def __init__(self):
+        self._calls: Dict[str, asyncio.Task] = {}
+
+    async def do(self, key: str, func: Callable[[], Awaitable[Any]]) -> Any:
+        task = self._calls.get(key)
+        if task is None:
+            task = asyncio.ensure_future(func())
+            self._calls[key] = task
+            task.add_done_callback(lambda _: self._calls.pop(key, None))
+
+        # shield so one cancelled caller doesn't cancel the fetch for the rest
+        return await asyncio.shield(task)
+
+    def in_flight(self) -> int:
+        return len(self._calls)
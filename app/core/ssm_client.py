@@ -1,27 +1,116 @@
 """
 AWS SSM Parameter Store client.
 Handles parameter storage and retrieval.
+boto3 is blocking, so every call runs on a small bounded thread pool
+instead of the event loop. Calls go through a circuit breaker, so a
+throttled or unreachable SSM fails fast instead of stacking up retries.
 """
 
+import asyncio
 import boto3
-from typing import Optional, Dict, Any
+from botocore.config import Config
+from botocore.exceptions import BotoCoreError, ClientError
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import Optional, Dict, Any, Callable, List
 from loguru import logger
 from core.config import settings
+from core.circuit_breaker import CircuitBreaker, CircuitOpenError
+from core import metrics
+
+# GetParameters accepts at most this many names per call
+GET_PARAMETERS_MAX_NAMES = 10
+
+
+class ParameterExistsError(Exception):
+    # put_parameter with overwrite=False hit an existing parameter
+    pass
+
+
+class SSMUnavailableError(Exception):
+    # a strict write with ssm configured but not connected
+    pass
+
+
+def _is_backend_failure(error: Exception) -> bool:
+    # throttling, 5xx and connection trouble count against the breaker, a missing or
+    # invalid parameter is an answer
+    if isinstance(error, BotoCoreError):
+        return True
+    if isinstance(error, ClientError):
+        code = error.response.get("Error", {}).get("Code", "")
+        status = error.response.get("ResponseMetadata", {}).get("HTTPStatusCode", 0)
+        return "Throttl" in code or status >= 500
+    return False
+
+
+def is_transient(error: Exception) -> bool:
+    # worth retrying after a pause: throttling, 5xx, connection trouble or an open circuit
+    if isinstance(error, (CircuitOpenError, SSMUnavailableError)):
+        return True
+    return _is_backend_failure(error)
 
 
 class SSMClient:
     def __init__(self):
         self._client: Optional[Any] = None
         self._enabled: bool = settings.ssm_enabled
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._monitor: Optional[asyncio.Task] = None
+        self.breaker = CircuitBreaker(
+            "ssm",
+            threshold=settings.ssm_breaker_threshold,
+            window=settings.circuit_breaker_window,
+            reset_timeout=settings.circuit_breaker_reset_timeout,
+        )
+
+    async def _run(self, operation: str, func: Callable, *args, **kwargs) -> Any:
+        # hand the blocking boto3 call to the pool and wait for it without blocking the loop
+        if not self.breaker.allow():
+            raise CircuitOpenError("SSM circuit is open")
+
+        loop = asyncio.get_running_loop()
+        # recorded whatever happens: a cancelled half-open probe that recorded nothing
+        # would leave the circuit half-open with no probe left, failing fast for good
+        failed = True
+        with metrics.ssm_latency.labels(operation).time():
+            try:
+                result = await loop.run_in_executor(self._executor, partial(func, *args, **kwargs))
+                failed = False
+            except Exception as e:
+                # a missing or already existing parameter is an answer, not a backend error
+                answers = (
+                    self._client.exceptions.ParameterNotFound,
+                    self._client.exceptions.ParameterAlreadyExists,
+                )
+                if not isinstance(e, answers):
+                    metrics.errors.labels("ssm").inc()
+                failed = _is_backend_failure(e)
+                raise
+            finally:
+                if failed:
+                    self.breaker.record_failure()
+                else:
+                    self.breaker.record_success()
+
+        return result
 
-    def connect(self) -> bool:
+    async def connect(self) -> bool:
         if not self._enabled:
             logger.info("SSM is disabled")
             return False
 
         try:
-            self._client = boto3.client("ssm", region_name=settings.aws_region)
-            self._client.describe_parameters(MaxResults=1)
+            self._executor = ThreadPoolExecutor(
+                max_workers=settings.ssm_max_workers, thread_name_prefix="ssm"
+            )
+            # one http connection per worker thread
+            self._client = boto3.client(
+                "ssm",
+                region_name=settings.aws_region,
+                config=Config(max_pool_connections=settings.ssm_max_workers),
+            )
+            await self._run("describe", self._client.describe_parameters, MaxResults=1)
             logger.info(f"Connected to SSM in region {settings.aws_region}")
             return True
         except Exception as e:
@@ -29,13 +118,46 @@ class SSMClient:
             self._client = None
             return False
 
-    def get_parameter(self, name: str, decrypt: bool = False) -> Optional[str]:
+    async def _reconnect(self):
+        # connect() failing at startup leaves us without a client, keep trying
+        while not self._client:
+            await asyncio.sleep(settings.circuit_breaker_reset_timeout)
+            if self._executor:
+                self._executor.shutdown(wait=False)
+                self._executor = None
+            await self.connect()
+
+    def start_monitor(self):
+        if not self._enabled or self._client or self._monitor:
+            return
+        self._monitor = asyncio.create_task(self._reconnect())
+
+    async def stop_monitor(self):
+        if not self._monitor:
+            return
+
+        self._monitor.cancel()
+        try:
+            await self._monitor
+        except asyncio.CancelledError:
+            pass
+        self._monitor = None
+
+    def disconnect(self):
+        if self._executor:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+        self._client = None
+
+    async def get_parameter(self, name: str, decrypt: bool = False) -> Optional[str]:
         if not self._client:
             return None
 
         try:
             full_name = f"{settings.ssm_prefix}/{name}"
-            response = self._client.get_parameter(Name=full_name, WithDecryption=decrypt)
+            response = await self._run(
+                "get", self._client.get_parameter, Name=full_name, WithDecryption=decrypt
+            )
             return response["Parameter"]["Value"]
         except self._client.exceptions.ParameterNotFound:
             logger.debug(f"Parameter not found: {name}")
@@ -44,15 +166,67 @@ class SSMClient:
             logger.error(f"Error getting parameter {name}: {e}")
             return None
 
-    def put_parameter(
-        self, name: str, value: str, description: str = "", overwrite: bool = True
+    async def get_parameters(
+        self, names: List[str], decrypt: bool = False, strict: bool = False
+    ) -> Dict[str, str]:
+        # batched read, missing names are simply absent from the result. strict raises on
+        # errors, so an absent name really means the parameter doesn't exist
+        if not self._client or not names:
+            return {}
+
+        unique = list(dict.fromkeys(names))
+        chunks = [
+            unique[i : i + GET_PARAMETERS_MAX_NAMES]
+            for i in range(0, len(unique), GET_PARAMETERS_MAX_NAMES)
+        ]
+        responses = await asyncio.gather(
+            *(self._get_parameters_chunk(chunk, decrypt, strict) for chunk in chunks)
+        )
+
+        parameters = {}
+        for response in responses:
+            parameters.update(response)
+        return parameters
+
+    async def _get_parameters_chunk(
+        self, names: List[str], decrypt: bool, strict: bool = False
+    ) -> Dict[str, str]:
+        try:
+            response = await self._run(
+                "get_batch",
+                self._client.get_parameters,
+                Names=[f"{settings.ssm_prefix}/{name}" for name in names],
+                WithDecryption=decrypt,
+            )
+            if response.get("InvalidParameters"):
+                logger.debug(f"Parameters not found: {len(response['InvalidParameters'])}")
+
+            return {
+                param["Name"].replace(f"{settings.ssm_prefix}/", "", 1): param["Value"]
+                for param in response.get("Parameters", [])
+            }
+        except Exception as e:
+            logger.error(f"Error getting parameters {names}: {e}")
+            if strict:
+                raise
+            return {}
+
+    async def put_parameter(
+        self,
+        name: str,
+        value: str,
+        description: str = "",
+        overwrite: bool = True,
+        strict: bool = False,
     ) -> bool:
         if not self._client:
             return False
 
         try:
             full_name = f"{settings.ssm_prefix}/{name}"
-            self._client.put_parameter(
+            await self._run(
+                "put",
+                self._client.put_parameter,
                 Name=full_name,
                 Value=value,
                 Type="String",
@@ -61,17 +235,23 @@ class SSMClient:
             )
             logger.info(f"Parameter saved: {name}")
             return True
+        except self._client.exceptions.ParameterAlreadyExists:
+            # only with overwrite=False, callers use it as an atomic existence check
+            raise ParameterExistsError(name)
         except Exception as e:
             logger.error(f"Error saving parameter {name}: {e}")
+            if strict:
+                raise
             return False
 
-    def delete_parameter(self, name: str) -> bool:
+    async def delete_parameter(self, name: str, strict: bool = False) -> bool:
+        # strict raises on errors, a parameter that's already gone is still just False
         if not self._client:
             return False
 
         try:
             full_name = f"{settings.ssm_prefix}/{name}"
-            self._client.delete_parameter(Name=full_name)
+            await self._run("delete", self._client.delete_parameter, Name=full_name)
             logger.info(f"Parameter deleted: {name}")
             return True
         except self._client.exceptions.ParameterNotFound:
@@ -79,29 +259,89 @@ class SSMClient:
             return False
         except Exception as e:
             logger.error(f"Error deleting parameter {name}: {e}")
+            if strict:
+                raise
             return False
 
-    def list_parameters(self, prefix: str = "") -> Dict[str, str]:
+    def _list_parameters(self, search_prefix: str) -> Dict[str, str]:
+        # runs on the pool, pagination is a chain of blocking calls
+        paginator = self._client.get_paginator("get_parameters_by_path")
+
+        parameters = {}
+        for page in paginator.paginate(Path=search_prefix, Recursive=True):
+            for param in page.get("Parameters", []):
+                key = param["Name"].replace(f"{settings.ssm_prefix}/", "")
+                parameters[key] = param["Value"]
+
+        return parameters
+
+    async def list_parameters(self, prefix: str = "", strict: bool = False) -> Dict[str, str]:
+        # strict raises instead of returning {}, for callers that must not mistake an error
+        # for "no parameters"
         if not self._client:
             return {}
 
         try:
             search_prefix = f"{settings.ssm_prefix}/{prefix}" if prefix else settings.ssm_prefix
-            paginator = self._client.get_paginator("get_parameters_by_path")
-
-            parameters = {}
-            for page in paginator.paginate(Path=search_prefix, Recursive=True):
-                for param in page.get("Parameters", []):
-                    key = param["Name"].replace(f"{settings.ssm_prefix}/", "")
-                    parameters[key] = param["Value"]
-
-            return parameters
+            return await self._run("list", self._list_parameters, search_prefix)
         except Exception as e:
             logger.error(f"Error listing parameters: {e}")
+            if strict:
+                raise
             return {}
 
     def is_enabled(self) -> bool:
         return self._enabled and self._client is not None
 
+    def is_configured(self) -> bool:
+        # enabled in settings, whether or not it's connected right now
+        return self._enabled
+
+
+class SSMBatchLoader:
+    # collects single-name reads that arrive close together into GetParameters calls
+    def __init__(self, client: SSMClient, window: float):
+        self._client = client
+        self._window = window
+        self._pending: Dict[str, asyncio.Future] = {}
+        self._flush_handle: Optional[asyncio.TimerHandle] = None
+        self._flushes: set = set()
+
+    async def load(self, name: str) -> Optional[str]:
+        future = self._pending.get(name)
+        if future is None:
+            loop = asyncio.get_running_loop()
+            future = loop.create_future()
+            self._pending[name] = future
+            if self._flush_handle is None:
+                self._flush_handle = loop.call_later(self._window, self._schedule_flush)
+
+        # shield so one cancelled caller doesn't cancel the shared result
+        return await asyncio.shield(future)
+
+    def _schedule_flush(self):
+        pending, self._pending = self._pending, {}
+        self._flush_handle = None
+        # keep a reference so the flush task isn't garbage collected mid-flight
+        task = asyncio.ensure_future(self._flush(pending))
+        self._flushes.add(task)
+        task.add_done_callback(self._flushes.discard)
+
+    async def _flush(self, pending: Dict[str, asyncio.Future]):
+        # None means the parameter doesn't exist, a failed read raises in every caller
+        try:
+            values = await self._client.get_parameters(list(pending), strict=True)
+        except Exception as e:
+            logger.error(f"Batched SSM read failed: {e}")
+            for future in pending.values():
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        for name, future in pending.items():
+            if not future.done():
+                future.set_result(values.get(name))
+
 
 ssm_client = SSMClient()
+ssm_batch_loader = SSMBatchLoader(ssm_client, window=settings.ssm_batch_window_ms / 1000)
@@ -81,4 +81,13 @@ echo -e "\n"
 
 echo "11. Delete flag"
 curl -X DELETE "$BASE_URL/api/v1/flags/beta_feature"
-echo -e "\n"
\ No newline at end of file
+echo -e "\n"
+echo "12. Export all flags as NDJSON"
+curl "$BASE_URL/api/v1/flags/export" -o flags.ndjson
+echo -e "\n"
+
+echo "13. Import them back, updating flags that exist"
+curl -X POST "$BASE_URL/api/v1/flags/import?overwrite=true" \
+  -H "Content-Type: application/x-ndjson" \
+  --data-binary @flags.ndjson
+echo -e "\n"
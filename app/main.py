@@ -10,8 +10,12 @@ from loguru import logger
 from core.config import settings
 from core.logging import setup_logging
 from core.redis_client import redis_client
+from core.serialization import FastJSONResponse
 from core.ssm_client import ssm_client
-from api import health
+from services.feature_flag_service import feature_flag_service
+from services.snapshot_refresher import snapshot_refresher
+from services.flag_change_bus import flag_change_bus
+from api import health, metrics
 from api.v1 import router as v1_router
 
 
@@ -24,30 +28,52 @@ async def lifespan(app: FastAPI):
 
     # connect to redis if we're using it
     if settings.redis_enabled:
-        redis_client.connect()
+        await redis_client.connect()
+        # pings in the background, reconnects if the first connect failed
+        redis_client.start_monitor()
+        # listen for flag changes made by other replicas
+        flag_change_bus.start()
 
     # same for ssm
     if settings.ssm_enabled:
-        ssm_client.connect()
+        await ssm_client.connect()
+        ssm_client.start_monitor()
+
+    # load every flag before we report ready, then keep the snapshot fresh
+    if settings.snapshot_warmup_enabled:
+        try:
+            await feature_flag_service.load_snapshot()
+        except Exception as e:
+            logger.error(f"Flag snapshot warm-up failed: {e}")
+        snapshot_refresher.start()
 
     yield
 
     # cleanup when shutting down
     logger.info("Shutting down application")
+    await snapshot_refresher.stop()
+    await flag_change_bus.stop()
+    await redis_client.stop_monitor()
+    await ssm_client.stop_monitor()
     if settings.redis_enabled:
-        redis_client.disconnect()
+        await redis_client.disconnect()
+    if settings.ssm_enabled:
+        ssm_client.disconnect()
 
 app = FastAPI(
     title=settings.app_name,
     version=settings.app_version,
     description="Feature Flag Service with Redis caching and AWS SSM Parameter Store",
     lifespan=lifespan,
+    default_response_class=FastJSONResponse,
     docs_url="/docs",
     redoc_url="/redoc",
 )
 
 # wire up the routes
 app.include_router(health.router)
+if settings.metrics_enabled:
+    app.include_router(metrics.router)
 app.include_router(v1_router)
 
 
@@ -4,7 +4,7 @@ Use pydantic models for validation and serialization.
 """
 
 from pydantic import BaseModel, Field
-from typing import Optional, Dict, Any, List
+from typing import Optional, Dict, Any, List, Literal, Union
 from datetime import datetime
 from enum import Enum
 
@@ -13,15 +13,24 @@ class RolloutStrategy(str, Enum):
     ALL = "all"                # everyone gets it
     PERCENTAGE = "percentage"  # gradual rollout based on hash
     USER_LIST = "user_list"    # specific users only
-    CUSTOM = "custom"          # for future expansion
+    SEGMENT = "segment"        # members of named segments
+    CUSTOM = "custom"          # targeting rules in custom_rules
+
+
+class BucketingHash(str, Enum):
+    MD5 = "md5"      # legacy, keeps existing users in their bucket
+    CRC32 = "crc32"  # faster, reshuffles users when switched to
 
 
 class FeatureFlagRule(BaseModel):
     # rules for how to roll out a feature
     strategy: RolloutStrategy = RolloutStrategy.ALL
     percentage: Optional[int] = Field(None, ge=0, le=100)  # 0-100%
+    basis_points: Optional[int] = Field(None, ge=0, le=10000)  # 0-10000, overrides percentage
+    bucketing: BucketingHash = BucketingHash.MD5
     user_ids: Optional[List[str]] = None                   # specific users
-    custom_rules: Optional[Dict[str, Any]] = None          # for later
+    segments: Optional[List[str]] = None                   # segment names, for the segment strategy
+    custom_rules: Optional[Dict[str, Any]] = None          # for the custom strategy
 
 
 class FeatureFlag(BaseModel):
@@ -31,6 +40,7 @@ class FeatureFlag(BaseModel):
     description: Optional[str] = None
     rules: FeatureFlagRule = Field(default_factory=lambda: FeatureFlagRule())
     metadata: Optional[Dict[str, Any]] = None  # extra stuff if needed
+    version: int = 0                           # bumped on every write
     created_at: Optional[datetime] = None
     updated_at: Optional[datetime] = None
 
@@ -66,3 +76,49 @@ class FeatureFlagEvaluationResult(BaseModel):
     enabled: bool
     matched_rule: Optional[str] = None  # which rule matched
     source: str                         # cache, ssm, or none
+
+
+class BatchEvaluationUser(BaseModel):
+    # one user to evaluate in a batch request
+    user_id: Optional[str] = None
+    context: Optional[Dict[str, Any]] = None
+
+
+class FeatureFlagBatchEvaluation(BaseModel):
+    # request model for evaluating many flags for many users at once
+    flags: Union[List[str], Literal["all"]] = "all"
+    users: List[BatchEvaluationUser] = Field(..., min_length=1, max_length=1000)
+
+
+class FlagOutcome(BaseModel):
+    # compact per-flag result used by batch evaluation
+    enabled: bool
+    matched_rule: Optional[str] = None
+
+
+class BatchEvaluationUserResult(BaseModel):
+    user_id: Optional[str] = None
+    flags: Dict[str, FlagOutcome]   # flag key -> outcome
+
+
+class FeatureFlagBatchEvaluationResult(BaseModel):
+    # response model for batch evaluation, one entry per requested user
+    results: List[BatchEvaluationUserResult]
+
+
+class FlagChangeEvent(BaseModel):
+    # published on every write so other replicas can drop their local copy
+    key: str
+    version: int
+    action: Literal["created", "updated", "deleted"]
+    origin: Optional[str] = None   # instance that made the change
+
+
+class FlagImportResult(BaseModel):
+    # one line of a bulk import, sent back as NDJSON
+    line: int                      # 1-based line number in the uploaded file
+    key: Optional[str] = None      # missing when the line couldn't be parsed
+    status: Literal["created", "updated", "unchanged", "exists", "invalid", "failed"]
+    version: Optional[int] = None
+    attempts: int = 0              # writes tried, more than 1 means ssm pushed back
+    error: Optional[str] = None
@@ -0,0 +1,44 @@
+"""
+Segment data models.
+Segments are named user sets that flags reference instead of inlining user ids.
+"""
+
+from pydantic import BaseModel, Field
+from typing import Optional, List
+from datetime import datetime
+
+
+SEGMENT_NAME_PATTERN = r"^[A-Za-z0-9_.-]+$"
+
+
+class SegmentCreate(BaseModel):
+    # for creating new segments, members can be added now or later
+    name: str = Field(..., min_length=1, max_length=100, pattern=SEGMENT_NAME_PATTERN)
+    description: Optional[str] = None
+    user_ids: List[str] = Field(default_factory=list, max_length=10000)
+
+
+class Segment(BaseModel):
+    # segment metadata, members live in their own redis set
+    name: str
+    description: Optional[str] = None
+    size: int = 0
+    created_at: Optional[datetime] = None
+    updated_at: Optional[datetime] = None
+
+
+class SegmentMembers(BaseModel):
+    # add or remove members, large segments are loaded in several calls
+    user_ids: List[str] = Field(..., min_length=1, max_length=10000)
+
+
+class SegmentMembersResult(BaseModel):
+    name: str
+    changed: int  # members actually added or removed
+    size: int
+
+
+class SegmentMembership(BaseModel):
+    name: str
+    user_id: str
+    member: bool
@@ -0,0 +1,7 @@
+"""
+Python client that evaluates flags in process.
+"""
+
+from sdk.client import FlagClient
+
+__all__ = ["FlagClient"]
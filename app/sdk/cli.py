@@ -0,0 +1,83 @@
+"""
+Bulk import and export from the command line.
+    python -m sdk.cli export --url http://localhost:8000 > flags.ndjson
+    python -m sdk.cli import flags.ndjson --url http://localhost:8000 --overwrite
+Files are streamed to and from the service, neither side holds all of them.
+"""
+
+import argparse
+import json
+import shutil
+import sys
+import urllib.parse
+import urllib.request
+from collections import Counter
+from typing import BinaryIO, Dict, List, Optional
+
+
+FLAGS_PATH = "/api/v1/flags"
+COPY_CHUNK = 64 * 1024
+
+
+def export_flags(base_url: str, out: BinaryIO, prefix: Optional[str] = None, timeout: float = 60.0):
+    query = "?" + urllib.parse.urlencode({"prefix": prefix}) if prefix else ""
+    url = base_url.rstrip("/") + FLAGS_PATH + "/export" + query
+    with urllib.request.urlopen(url, timeout=timeout) as response:
+        shutil.copyfileobj(response, out, COPY_CHUNK)
+
+
+def import_flags(
+    base_url: str, source: BinaryIO, overwrite: bool = False, timeout: float = 600.0
+) -> List[Dict]:
+    # a file with no Content-Length goes out chunked, it's never read into memory here
+    url = base_url.rstrip("/") + FLAGS_PATH + "/import"
+    if overwrite:
+        url += "?overwrite=true"
+    request = urllib.request.Request(
+        url, data=source, method="POST", headers={"Content-Type": "application/x-ndjson"}
+    )
+    with urllib.request.urlopen(request, timeout=timeout) as response:
+        return [json.loads(line) for line in response if line.strip()]
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m sdk.cli", description=__doc__.strip())
+    parser.add_argument("--url", default="http://localhost:8000", help="service base url")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    export = commands.add_parser("export", help="write every flag as NDJSON")
+    export.add_argument("--prefix", help="only keys starting with this")
+    export.add_argument("-o", "--output", help="file to write, stdout by default")
+
+    load = commands.add_parser("import", help="create flags from an NDJSON file")
+    load.add_argument("file", help="NDJSON file, - for stdin")
+    load.add_argument("--overwrite", action="store_true", help="update flags that exist")
+
+    args = parser.parse_args(argv)
+    if args.command == "export":
+        if args.output:
+            with open(args.output, "wb") as out:
+                export_flags(args.url, out, args.prefix)
+        else:
+            export_flags(args.url, sys.stdout.buffer, args.prefix)
+        return 0
+
+    if args.file == "-":
+        results = import_flags(args.url, sys.stdin.buffer, args.overwrite)
+    else:
+        with open(args.file, "rb") as source:
+            results = import_flags(args.url, source, args.overwrite)
+
+    # per line problems and a summary on stderr, so they don't mix with redirected output
+    for result in sorted(results, key=lambda r: r["line"]):
+        if result["status"] in ("invalid", "failed"):
+            where = f"line {result['line']} ({result.get('key') or '-'})"
+            print(f"{where}: {result['status']}, {result['error']}", file=sys.stderr)
+    counts = Counter(result["status"] for result in results)
+    summary = ", ".join(f"{status} {count}" for status, count in sorted(counts.items()))
+    print(summary or "nothing to import", file=sys.stderr)
+    return 1 if counts["invalid"] or counts["failed"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,132 @@
+"""
+Local evaluation client.
+Keeps a snapshot of every flag, polled from GET /api/v1/flags with
+If-None-Match so an unchanged snapshot costs a bodyless 304, and evaluates
+with the same compiled plans the service uses. Talks HTTP with urllib and
+imports the service's models and evaluation modules, so it needs pydantic
+and loguru but not Redis, boto3 or FastAPI.
+"""
+
+import asyncio
+import json
+import time
+import urllib.error
+import urllib.request
+from typing import Any, Dict, Optional, Tuple
+
+from loguru import logger
+
+from models.feature_flag import FeatureFlag
+from services.flag_evaluator import CompiledFlag, Outcome, compile_flag
+
+
+# what evaluate returns instead of a rule when there's nothing to evaluate against
+STALE = "stale"
+NOT_FOUND = "not_found"
+
+
+class FlagClient:
+    def __init__(
+        self,
+        base_url: str,
+        max_age: float = 60.0,
+        refresh_interval: float = 10.0,
+        timeout: float = 2.0,
+        defaults: Optional[Dict[str, bool]] = None,
+    ):
+        self.url = base_url.rstrip("/") + "/api/v1/flags"
+        # a snapshot not confirmed by the service for this long is treated as stale
+        self.max_age = max_age
+        self.refresh_interval = refresh_interval
+        self.timeout = timeout
+        self.defaults = defaults or {}
+        self._flags: Dict[str, CompiledFlag] = {}
+        self._etag: Optional[str] = None
+        self._synced_at: Optional[float] = None
+        self._task: Optional[asyncio.Task] = None
+
+    def _fetch(self, etag: Optional[str]) -> Tuple[int, Optional[str], bytes]:
+        request = urllib.request.Request(self.url, headers={"Accept": "application/json"})
+        if etag:
+            request.add_header("If-None-Match", etag)
+        try:
+            with urllib.request.urlopen(request, timeout=self.timeout) as response:
+                return response.status, response.headers.get("ETag"), response.read()
+        except urllib.error.HTTPError as e:
+            # urllib reports 304 as an error
+            if e.code == 304:
+                return 304, etag, b""
+            raise
+
+    def refresh(self) -> bool:
+        # True when the snapshot is confirmed current, a failed poll keeps the old one
+        try:
+            status, etag, body = self._fetch(self._etag)
+            if status != 304:
+                flags = [FeatureFlag.model_validate(data) for data in json.loads(body)]
+                # swapped in whole, readers never see a half-loaded snapshot
+                self._flags = {flag.key: compile_flag(flag) for flag in flags}
+                self._etag = etag
+        except Exception as e:
+            logger.warning(f"Flag snapshot refresh failed: {e}")
+            return False
+
+        self._synced_at = time.monotonic()
+        return True
+
+    @property
+    def stale(self) -> bool:
+        if self._synced_at is None:
+            return True
+        return time.monotonic() - self._synced_at > self.max_age
+
+    def evaluate(
+        self,
+        flag_key: str,
+        user_id: Optional[str] = None,
+        context: Optional[Dict[str, Any]] = None,
+        default: Optional[bool] = None,
+    ) -> Outcome:
+        # segment membership lives in the service, pass it in as context["$segments"]
+        if default is None:
+            default = self.defaults.get(flag_key, False)
+        if self.stale:
+            return default, STALE
+
+        compiled = self._flags.get(flag_key)
+        if compiled is None:
+            return default, NOT_FOUND
+        return compiled.evaluate(user_id, context)
+
+    def is_enabled(
+        self,
+        flag_key: str,
+        user_id: Optional[str] = None,
+        context: Optional[Dict[str, Any]] = None,
+        default: Optional[bool] = None,
+    ) -> bool:
+        return self.evaluate(flag_key, user_id, context, default)[0]
+
+    async def _run(self):
+        while True:
+            # urllib blocks, keep it off the event loop
+            await asyncio.to_thread(self.refresh)
+            await asyncio.sleep(self.refresh_interval)
+
+    def start(self):
+        if self.refresh_interval <= 0 or self._task:
+            return
+
+        self._task = asyncio.create_task(self._run())
+        logger.info(f"Flag client refreshing every {self.refresh_interval}s from {self.url}")
+
+    async def stop(self):
+        if not self._task:
+            return
+
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
@@ -0,0 +1,63 @@
+"""
+Percentage rollout bucketing.
+Maps (flag, user) to a stable bucket in 0..9999, so rollouts can be set in
+basis points (1/100 of a percent).
+"""
+
+import hashlib
+import zlib
+from typing import Callable, List, Optional, Sequence
+
+from models.feature_flag import BucketingHash
+
+
+# number of buckets, one per basis point
+BUCKETS = 10000
+
+# user id -> bucket, bound to one flag
+Bucketer = Callable[[str], int]
+
+
+def _md5_bucketer(flag_key: str) -> Bucketer:
+    # legacy hash, h % 100 stays the whole-percent part so existing users never move
+    prefix = f"{flag_key}:".encode()
+    md5 = hashlib.md5
+    from_bytes = int.from_bytes
+
+    def bucket(user_id: str) -> int:
+        hash_value = from_bytes(md5(prefix + user_id.encode()).digest(), "big")
+        return (hash_value % 100) * 100 + (hash_value // 100) % 100
+
+    return bucket
+
+
+def _crc32_bucketer(flag_key: str) -> Bucketer:
+    # crc32 seeded with the flag key, then a murmur3 finalizer so flags don't correlate
+    seed = zlib.crc32(f"{flag_key}:".encode())
+    crc32 = zlib.crc32
+
+    def bucket(user_id: str) -> int:
+        h = crc32(user_id.encode(), seed)
+        h ^= h >> 16
+        h = (h * 0x85EBCA6B) & 0xFFFFFFFF
+        h ^= h >> 13
+        h = (h * 0xC2B2AE35) & 0xFFFFFFFF
+        h ^= h >> 16
+        return h % BUCKETS
+
+    return bucket
+
+
+_BUCKETERS = {
+    BucketingHash.MD5: _md5_bucketer,
+    BucketingHash.CRC32: _crc32_bucketer,
+}
+
+
+def get_bucketer(flag_key: str, algorithm: BucketingHash = BucketingHash.MD5) -> Bucketer:
+    return _BUCKETERS[algorithm](flag_key)
+
+
+def bucket_many(bucket: Bucketer, user_ids: Sequence[Optional[str]]) -> List[int]:
+    # anonymous users land past the last bucket so they never match
+    return [bucket(user_id) if user_id else BUCKETS for user_id in user_ids]
@@ -0,0 +1,79 @@
+"""
+Config version for conditional GETs.
+A counter bumped on every flag write, shared through redis so all replicas
+hand out the same ETag for the flag list. The epoch changes whenever the
+counter is recreated, so a flushed redis can't bring an old ETag back.
+Without redis the counter is per process.
+"""
+
+import time
+import uuid
+from datetime import datetime, timezone
+from typing import Optional, Tuple
+
+from loguru import logger
+
+from core import metrics
+from core.redis_client import redis_client
+
+
+CONFIG_VERSION_KEY = "feature_flags:config"  # hash: epoch, version, updated_at
+
+
+class ConfigVersion:
+    def __init__(self):
+        self._epoch = uuid.uuid4().hex[:8]
+        self._version = 0
+        self._updated_at = time.time()
+
+    @staticmethod
+    def _format(epoch: str, version: int, updated_at: float) -> Tuple[str, datetime]:
+        return f'W/"{epoch}-{version}"', datetime.fromtimestamp(updated_at, timezone.utc)
+
+    @staticmethod
+    def queue_bump(pipe):
+        # same bump inside a caller's transaction
+        pipe.hsetnx(CONFIG_VERSION_KEY, "epoch", uuid.uuid4().hex[:8])
+        pipe.hincrby(CONFIG_VERSION_KEY, "version", 1)
+        pipe.hset(CONFIG_VERSION_KEY, "updated_at", time.time())
+
+    async def bump(self):
+        client = redis_client.get_client()
+        if not client:
+            self._version += 1
+            self._updated_at = time.time()
+            return
+
+        try:
+            pipe = client.pipeline(transaction=True)
+            self.queue_bump(pipe)
+            with metrics.redis_latency.labels("pipeline").time():
+                await pipe.execute()
+        except Exception as e:
+            redis_client.record_error(e)
+            logger.error(f"Config version bump failed: {e}")
+
+    async def current(self) -> Optional[Tuple[str, datetime]]:
+        # (etag, last_modified), None if it can't be read and responses shouldn't be cached
+        client = redis_client.get_client()
+        if not client:
+            return self._format(self._epoch, self._version, self._updated_at)
+
+        try:
+            with metrics.redis_latency.labels("hgetall").time():
+                stored = await client.hgetall(CONFIG_VERSION_KEY)
+        except Exception as e:
+            redis_client.record_error(e)
+            logger.error(f"Config version read failed: {e}")
+            return None
+
+        if "epoch" not in stored:
+            # nothing written since redis was (re)started, start a new epoch
+            await self.bump()
+            return None
+        return self._format(
+            stored["epoch"], int(stored.get("version", 0)), float(stored.get("updated_at", 0))
+        )
+
+
+config_version = ConfigVersion()
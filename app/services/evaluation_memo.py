@@ -0,0 +1,92 @@
+"""
+Memo of single-flag evaluation results.
+Outcomes only depend on the compiled plan, the user and (for targeting
+rules) the context, so repeat checks from the same users hand back the
+finished result instead of hashing and building it again. Entries hold the
+plan they came from; a new version is a new plan, so stale entries never
+match and age out of the LRU.
+"""
+
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Optional, Tuple
+
+from core import metrics
+from services.evaluation_result import EvaluationResult
+from services.flag_evaluator import CompiledFlag
+
+
+# (plan it was computed with, result, evaluations counter child)
+MemoEntry = Tuple[CompiledFlag, EvaluationResult, Any]
+
+MEMO_HIT = metrics.memo_lookups.labels("hit")
+MEMO_MISS = metrics.memo_lookups.labels("miss")
+
+
+def context_key(context: Optional[Dict[str, Any]]) -> Optional[Hashable]:
+    # None when the context can't be keyed (nested values), those aren't memoized.
+    # the type is part of the key so 1, 1.0 and True don't share an entry
+    if not context:
+        return ()
+    try:
+        return frozenset((name, value.__class__, value) for name, value in context.items())
+    except TypeError:
+        return None
+
+
+class EvaluationMemo:
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self._entries: "OrderedDict[Tuple, MemoEntry]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_size > 0
+
+    def key(
+        self, compiled: CompiledFlag, user_id: Optional[str], context: Optional[Dict[str, Any]]
+    ) -> Optional[Tuple]:
+        # None means don't memoize: segment membership changes without a new flag version
+        if not self.enabled or compiled.segments:
+            return None
+        if not compiled.reads_context:
+            return compiled.key, user_id
+        ctx = context_key(context)
+        return None if ctx is None else (compiled.key, user_id, ctx)
+
+    def get(self, key: Tuple, compiled: CompiledFlag) -> Optional[Tuple[EvaluationResult, Any]]:
+        entry = self._entries.get(key)
+        if entry is None or entry[0] is not compiled:
+            self.misses += 1
+            MEMO_MISS.inc()
+            return None
+
+        self._entries.move_to_end(key)
+        self.hits += 1
+        MEMO_HIT.inc()
+        return entry[1], entry[2]
+
+    def put(
+        self,
+        key: Tuple,
+        compiled: CompiledFlag,
+        result: EvaluationResult,
+        counter: Any,
+    ):
+        # counter is the pre-bound evaluations child, so a hit still counts the outcome
+        self._entries[key] = (compiled, result, counter)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    @property
+    def hit_rate(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def clear(self):
+        self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
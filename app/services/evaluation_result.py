@@ -0,0 +1,51 @@
+"""
+Internal evaluation results.
+Plain tuples and columns instead of pydantic models, the API encodes them
+straight to JSON. The response models in models.feature_flag still describe
+the wire format for the docs.
+"""
+
+from functools import lru_cache
+from typing import Dict, List, NamedTuple, Optional, Sequence
+
+from core.serialization import dumps
+from services.flag_evaluator import Outcome
+
+
+class EvaluationResult(NamedTuple):
+    key: str
+    enabled: bool
+    matched_rule: Optional[str]
+    source: str  # cache, ssm, or none
+
+    def to_json(self) -> bytes:
+        return dumps(self._asdict())
+
+
+@lru_cache(maxsize=4096)
+def _outcome_json(outcome: Outcome) -> bytes:
+    # outcomes are shared constants per plan, each one is encoded once
+    enabled, matched_rule = outcome
+    return dumps({"enabled": enabled, "matched_rule": matched_rule})
+
+
+class BatchEvaluationResult:
+    # the flags x users grid as it was evaluated, one column of outcomes per flag
+    __slots__ = ("user_ids", "columns")
+
+    def __init__(self, user_ids: Sequence[Optional[str]], columns: Dict[str, List[Outcome]]):
+        self.user_ids = user_ids
+        self.columns = columns
+
+    def outcome(self, user_index: int, flag_key: str) -> Outcome:
+        return self.columns[flag_key][user_index]
+
+    def to_json(self) -> bytes:
+        # {"results": [{"user_id": ..., "flags": {key: {"enabled", "matched_rule"}}}]}
+        keys = [dumps(key) + b":" for key in self.columns]
+        columns = list(self.columns.values())
+        rows = []
+        for i, user_id in enumerate(self.user_ids):
+            flags = b",".join(key + _outcome_json(column[i]) for key, column in zip(keys, columns))
+            rows.append(b'{"user_id":' + dumps(user_id) + b',"flags":{' + flags + b"}}")
+        return b'{"results":[' + b",".join(rows) + b"]}"
@@ -3,237 +3,996 @@ Feature flag servic, main logic.
 Handles caching with Redis and persistence with SSM.
 """
 
+import asyncio
 import json
-import hashlib
-from typing import Optional, List, Dict, Any
+import time
+from collections import Counter
+from typing import Optional, List, Dict, Any, AsyncIterator, FrozenSet, Tuple, Union
 from datetime import datetime, timezone
 from loguru import logger
 
 from core.redis_client import redis_client
-from core.ssm_client import ssm_client
+from core.ssm_client import (
+    ParameterExistsError,
+    SSMUnavailableError,
+    ssm_batch_loader,
+    ssm_client,
+)
 from core.config import settings
+from core.singleflight import SingleFlight
+from core import metrics
+from services.flag_cache import LocalFlagCache
+from services.evaluation_memo import EvaluationMemo
+from services.evaluation_result import BatchEvaluationResult, EvaluationResult
+from services.flag_evaluator import (
+    CompiledFlag,
+    NOT_FOUND,
+    UNAVAILABLE,
+    Outcome,
+    compile_flag,
+    validate_flag,
+)
+from services.flag_change_bus import flag_change_bus
+from services.config_version import config_version
+from services.flag_index import SortOrder, filter_flags, flag_index
+from services.segment_service import segment_service
+from services.targeting import SEGMENTS_KEY
 from models.feature_flag import (
     FeatureFlag,
     FeatureFlagCreate,
     FeatureFlagUpdate,
-    FeatureFlagEvaluationResult,
-    RolloutStrategy,
+    BatchEvaluationUser,
+    FlagChangeEvent,
 )
 
 
+# pre-bound metric children, recording is a plain addition
+LOCAL_HIT = metrics.cache_lookups.labels("local", "hit")
+LOCAL_MISS = metrics.cache_lookups.labels("local", "miss")
+LOCAL_NEGATIVE = metrics.cache_lookups.labels("local", "negative")
+LOCAL_STALE = metrics.cache_lookups.labels("local", "stale")
+REDIS_HIT = metrics.cache_lookups.labels("redis", "hit")
+REDIS_MISS = metrics.cache_lookups.labels("redis", "miss")
+REDIS_NEGATIVE = metrics.cache_lookups.labels("redis", "negative")
+SSM_HIT = metrics.cache_lookups.labels("ssm", "hit")
+SSM_MISS = metrics.cache_lookups.labels("ssm", "miss")
+SSM_ERRORS = metrics.errors.labels("ssm")
+EVALUATE_SINGLE = metrics.evaluation_latency.labels("single")
+EVALUATE_BATCH = metrics.evaluation_latency.labels("batch")
+
+# cached in redis in place of a flag whose key ssm doesn't have
+MISSING_VALUE = "null"
+
+# hash: flag key -> last version written to the cache. Kept after a delete so a
+# recreated flag continues the numbering and clients tracking versions don't skip it
+VERSIONS_KEY = "feature_flags:versions"
+
+# every cache write goes through this: the entry only moves forward, so a refill
+# that read an older version can't overwrite a write that landed in between.
+# KEYS: cache key, versions hash. ARGV: flag key, version, value, ttl (0 deletes)
+WRITE_FLAG_SCRIPT = """
+local current = tonumber(redis.call('HGET', KEYS[2], ARGV[1]) or 0)
+if current > tonumber(ARGV[2]) then
+    return 0
+end
+redis.call('HSET', KEYS[2], ARGV[1], ARGV[2])
+if tonumber(ARGV[4]) > 0 then
+    redis.call('SET', KEYS[1], ARGV[3], 'EX', ARGV[4])
+else
+    redis.call('DEL', KEYS[1])
+end
+return 1
+"""
+
+# a write takes the next version here before it touches ssm, and holds it until the
+# write-through. A write whose base version is behind the last one written, or that
+# races one still in flight, gets 0 and has to re-read.
+# KEYS: reservation key, versions hash. ARGV: flag key, base version, ttl
+RESERVE_VERSION_SCRIPT = """
+local current = tonumber(redis.call('HGET', KEYS[2], ARGV[1]) or 0)
+if current > tonumber(ARGV[2]) then
+    return 0
+end
+local version = math.max(current, tonumber(ARGV[2])) + 1
+if not redis.call('SET', KEYS[1], version, 'NX', 'EX', ARGV[3]) then
+    return 0
+end
+return version
+"""
+
+# drops a reservation, unless it expired and another write holds the key by now.
+# KEYS: reservation key. ARGV: version
+RELEASE_VERSION_SCRIPT = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+
+# outlasts an ssm put with its retries, and frees the key if a replica dies mid-write
+WRITE_RESERVATION_TTL = 30
+
+
+class _Missing:
+    __slots__ = ()
+
+    def __repr__(self) -> str:
+        return "MISSING"
+
+
+# returned by the cache and ssm reads for a key confirmed not to exist,
+# None from them only means "don't know"
+MISSING = _Missing()
+
+
+class FlagExistsError(ValueError):
+    pass
+
+
+class FlagConflictError(ValueError):
+    pass
+
+
 class FeatureFlagService:
     def __init__(self):
         self.cache_ttl = settings.feature_flag_cache_ttl
+        self.negative_cache_ttl = settings.negative_cache_ttl
+        self._local_cache = LocalFlagCache(
+            ttl=settings.local_cache_ttl if settings.local_cache_enabled else 0,
+            max_size=settings.local_cache_max_size,
+            negative_ttl=settings.negative_cache_ttl,
+            stale_ttl=settings.local_cache_stale_ttl,
+        )
+        self._memo = EvaluationMemo(settings.evaluation_memo_size)
+        self._ssm_flight = SingleFlight()
+        self._index_flight = SingleFlight()
+        # background refreshes of stale snapshot entries, one per key
+        self._revalidating: Dict[str, asyncio.Task] = {}
+        # keys with a write in flight, only consulted when redis can't coordinate
+        self._writing: set = set()
+        # lua script source -> its registered script, see _script
+        self._scripts: Dict[str, Any] = {}
+        self.snapshot_loaded: bool = False
+        flag_change_bus.add_listener(self._on_flag_change, self._local_cache.clear)
+
+    def _on_flag_change(self, event: FlagChangeEvent):
+        # our own writes are already applied locally
+        if event.origin == flag_change_bus.instance_id:
+            return
+
+        self._local_cache.invalidate(event.key)
+        logger.debug(f"Evicted {event.key} after remote {event.action} (v{event.version})")
 
     def _get_cache_key(self, flag_key: str) -> str:
         return f"feature_flag:{flag_key}"
 
-    def _get_from_cache(self, flag_key: str) -> Optional[FeatureFlag]:
+    async def _get_from_cache(self, flag_key: str) -> Union[FeatureFlag, _Missing, None]:
         client = redis_client.get_client()
         if not client:
             return None
 
         try:
             cache_key = self._get_cache_key(flag_key)
-            data = client.get(cache_key)
+            with metrics.redis_latency.labels("get").time():
+                data = await client.get(cache_key)
+            if data == MISSING_VALUE:
+                REDIS_NEGATIVE.inc()
+                return MISSING
             if data:
                 logger.debug(f"Cache hit for flag: {flag_key}")
+                REDIS_HIT.inc()
                 return FeatureFlag.model_validate_json(data)
+            REDIS_MISS.inc()
         except Exception as e:
+            redis_client.record_error(e)
             logger.error(f"Cache read error: {e}")
 
         return None
 
-    def _set_to_cache(self, flag: FeatureFlag) -> bool:
+    async def _get_many_from_cache(
+        self, flag_keys: List[str]
+    ) -> Dict[str, Union[FeatureFlag, _Missing]]:
+        client = redis_client.get_client()
+        if not client or not flag_keys:
+            return {}
+
+        flags: Dict[str, Union[FeatureFlag, _Missing]] = {}
+        try:
+            with metrics.redis_latency.labels("mget").time():
+                values = await client.mget([self._get_cache_key(key) for key in flag_keys])
+            missing = 0
+            for key, data in zip(flag_keys, values):
+                if data == MISSING_VALUE:
+                    flags[key] = MISSING
+                    missing += 1
+                elif data:
+                    flags[key] = FeatureFlag.model_validate_json(data)
+            REDIS_HIT.inc(len(flags) - missing)
+            REDIS_NEGATIVE.inc(missing)
+            REDIS_MISS.inc(len(flag_keys) - len(flags))
+            logger.debug(f"Cache hits for {len(flags)}/{len(flag_keys)} flags")
+        except Exception as e:
+            redis_client.record_error(e)
+            logger.error(f"Cache read error: {e}")
+
+        return flags
+
+    def _script(self, client, source: str):
+        # registered once per client, so calls send the sha (EVALSHA) and not the whole body
+        script = self._scripts.get(source)
+        if script is None or script.registered_client is not client:
+            script = self._scripts[source] = client.register_script(source)
+        return script
+
+    async def _write_flag(self, client, pipe, flag_key: str, version: int, value: str, ttl: int):
+        # WRITE_FLAG_SCRIPT on the client, or queued on pipe if there is one
+        return await self._script(client, WRITE_FLAG_SCRIPT)(
+            keys=[self._get_cache_key(flag_key), VERSIONS_KEY],
+            args=[flag_key, version, value, ttl],
+            client=pipe or client,
+        )
+
+    async def _set_to_cache(self, flag: FeatureFlag) -> bool:
         client = redis_client.get_client()
         if not client:
             return False
 
         try:
-            cache_key = self._get_cache_key(flag.key)
-            client.setex(cache_key, self.cache_ttl, flag.model_dump_json())
-            logger.debug(f"Cached flag: {flag.key}")
+            value = flag.model_dump_json()
+            with metrics.redis_latency.labels("evalsha").time():
+                written = await self._write_flag(
+                    client, None, flag.key, flag.version, value, self.cache_ttl
+                )
+            logger.debug(f"Cached flag: {flag.key}" if written else f"Kept newer cached {flag.key}")
+            return bool(written)
+        except Exception as e:
+            redis_client.record_error(e)
+            logger.error(f"Cache write error: {e}")
+            return False
+
+    async def _set_many_to_cache(self, flags: List[FeatureFlag]) -> bool:
+        client = redis_client.get_client()
+        if not client or not flags:
+            return False
+
+        try:
+            pipe = client.pipeline(transaction=False)
+            for flag in flags:
+                value = flag.model_dump_json()
+                await self._write_flag(client, pipe, flag.key, flag.version, value, self.cache_ttl)
+            with metrics.redis_latency.labels("pipeline").time():
+                await pipe.execute()
+            logger.debug(f"Cached {len(flags)} flags")
             return True
         except Exception as e:
+            redis_client.record_error(e)
             logger.error(f"Cache write error: {e}")
             return False
 
-    def _invalidate_cache(self, flag_key: str) -> bool:
+    async def _set_missing_to_cache(self, flag_keys: List[str]) -> bool:
         client = redis_client.get_client()
-        if not client:
+        if not client or not flag_keys or self.negative_cache_ttl <= 0:
             return False
 
         try:
-            cache_key = self._get_cache_key(flag_key)
-            client.delete(cache_key)
-            logger.debug(f"Invalidated cache for flag: {flag_key}")
+            # nx: a flag created while ssm was answering must not be hidden
+            pipe = client.pipeline(transaction=False)
+            for key in flag_keys:
+                pipe.set(
+                    self._get_cache_key(key), MISSING_VALUE, ex=self.negative_cache_ttl, nx=True
+                )
+            with metrics.redis_latency.labels("pipeline").time():
+                await pipe.execute()
             return True
         except Exception as e:
-            logger.error(f"Cache invalidation error: {e}")
+            redis_client.record_error(e)
+            logger.error(f"Cache write error: {e}")
             return False
 
-    def _get_from_ssm(self, flag_key: str) -> Optional[FeatureFlag]:
+    async def _get_write_state(self, flag_key: str) -> Tuple[Optional[FeatureFlag], int]:
+        # the cached flag and the last version written for the key, one round-trip
+        client = redis_client.get_client()
+        if not client:
+            return None, 0
+
+        try:
+            pipe = client.pipeline(transaction=False)
+            pipe.get(self._get_cache_key(flag_key))
+            pipe.hget(VERSIONS_KEY, flag_key)
+            with metrics.redis_latency.labels("pipeline").time():
+                data, version = await pipe.execute()
+        except Exception as e:
+            redis_client.record_error(e)
+            logger.error(f"Cache read error: {e}")
+            return None, 0
+
+        flag = FeatureFlag.model_validate_json(data) if data and data != MISSING_VALUE else None
+        return flag, int(version or 0)
+
+    def _reservation_key(self, flag_key: str) -> str:
+        return f"feature_flags:writing:{flag_key}"
+
+    def _conflict(self, flag_key: str) -> FlagConflictError:
+        # whatever we had is behind, the retry should read past the snapshot
+        self._local_cache.invalidate(flag_key)
+        return FlagConflictError(f"Feature flag '{flag_key}' was changed by another write")
+
+    async def _reserve_version(self, flag_key: str, base_version: int) -> int:
+        # the version a write of flag_key based on base_version gets, held for it until
+        # _release_version. Raises FlagConflictError if that base is already outdated
+        client = redis_client.get_client()
+        if client:
+            try:
+                with metrics.redis_latency.labels("evalsha").time():
+                    version = await self._script(client, RESERVE_VERSION_SCRIPT)(
+                        keys=[self._reservation_key(flag_key), VERSIONS_KEY],
+                        args=[flag_key, base_version, WRITE_RESERVATION_TTL],
+                    )
+            except Exception as e:
+                redis_client.record_error(e)
+                logger.error(f"Version reservation error: {e}")
+            else:
+                if not version:
+                    raise self._conflict(flag_key)
+                return int(version)
+
+        # nothing to coordinate replicas through, at least serialize this one
+        if flag_key in self._writing:
+            raise self._conflict(flag_key)
+        self._writing.add(flag_key)
+        return base_version + 1
+
+    async def _release(self, client, pipe, flag_key: str, version: int):
+        return await self._script(client, RELEASE_VERSION_SCRIPT)(
+            keys=[self._reservation_key(flag_key)], args=[version], client=pipe or client
+        )
+
+    async def _release_version(self, flag_key: str, version: int):
+        # for a write that failed before its write-through, which releases it otherwise
+        self._writing.discard(flag_key)
+        client = redis_client.get_client()
+        if not client:
+            return
+
+        try:
+            with metrics.redis_latency.labels("evalsha").time():
+                await self._release(client, None, flag_key, version)
+        except Exception as e:
+            # it expires on its own
+            redis_client.record_error(e)
+            logger.error(f"Version release error: {e}")
+
+    async def _write_through(
+        self, flag_key: str, flag: Optional[FeatureFlag], version: int
+    ) -> bool:
+        # the new cache entry (or a negative one for a delete) and the reservation release
+        # in one transaction, then the index and config version, so other replicas find
+        # it hot instead of missing. False if a newer version got to the cache first
+        self._writing.discard(flag_key)
+        client = redis_client.get_client()
+        if not client:
+            if flag:
+                await flag_index.put(flag)
+            else:
+                await flag_index.remove(flag_key)
+            await config_version.bump()
+            return True
+
+        if flag:
+            value, ttl = flag.model_dump_json(), self.cache_ttl
+        else:
+            value, ttl = MISSING_VALUE, self.negative_cache_ttl
+        try:
+            pipe = client.pipeline(transaction=True)
+            await self._write_flag(client, pipe, flag_key, version, value, ttl)
+            await self._release(client, pipe, flag_key, version)
+            with metrics.redis_latency.labels("pipeline").time():
+                written, _ = await pipe.execute()
+            if not written:
+                # the index already has that newer version, leave it alone
+                logger.warning(f"Write-through of {flag_key} v{version} was superseded")
+                return False
+
+            pipe = client.pipeline(transaction=True)
+            if flag:
+                flag_index.queue_put(pipe, flag)
+            else:
+                flag_index.queue_remove(pipe, flag_key)
+            config_version.queue_bump(pipe)
+            with metrics.redis_latency.labels("pipeline").time():
+                await pipe.execute()
+            logger.debug(f"Wrote through {flag_key} v{version}")
+        except Exception as e:
+            # the entry expires and the next index rebuild catches up, but the reservation
+            # shouldn't hold the key for its whole ttl
+            redis_client.record_error(e)
+            logger.error(f"Cache write-through error: {e}")
+            await self._release_version(flag_key, version)
+        return True
+
+    async def _get_from_ssm(self, flag_key: str) -> Union[FeatureFlag, _Missing, None]:
         if not ssm_client.is_enabled():
             return None
 
+        # concurrent misses for the same key share one ssm call
+        flag = await self._ssm_flight.do(flag_key, lambda: self._fetch_from_ssm(flag_key))
+        (SSM_HIT if isinstance(flag, FeatureFlag) else SSM_MISS).inc()
+        return flag
+
+    async def _fetch_from_ssm(self, flag_key: str) -> Union[FeatureFlag, _Missing, None]:
         try:
-            data = ssm_client.get_parameter(flag_key)
-            if data:
-                logger.debug(f"SSM hit for flag: {flag_key}")
-                flag_dict = json.loads(data)
-                return FeatureFlag(**flag_dict)
+            # lookups arriving together share one GetParameters call
+            data = await ssm_batch_loader.load(flag_key)
+            if not data:
+                return MISSING
+            logger.debug(f"SSM hit for flag: {flag_key}")
+            flag_dict = json.loads(data)
+            return FeatureFlag(**flag_dict)
         except Exception as e:
             logger.error(f"SSM read error: {e}")
 
         return None
 
-    def _save_to_ssm(self, flag: FeatureFlag) -> bool:
+    async def _get_many_from_ssm(
+        self, flag_keys: List[str]
+    ) -> Dict[str, Union[FeatureFlag, _Missing, None]]:
+        # keys ssm doesn't have come back MISSING, None for keys it couldn't answer for
+        if not flag_keys:
+            return {}
+        if not ssm_client.is_enabled():
+            # configured but not connected is an outage, not "no ssm"
+            return dict.fromkeys(flag_keys) if ssm_client.is_configured() else {}
+
+        try:
+            params = await ssm_client.get_parameters(flag_keys, strict=True)
+        except Exception as e:
+            logger.error(f"SSM read error: {e}")
+            return dict.fromkeys(flag_keys)
+
+        flags: Dict[str, Union[FeatureFlag, _Missing, None]] = {
+            key: MISSING for key in flag_keys if key not in params
+        }
+        for key, value in params.items():
+            try:
+                flags[key] = FeatureFlag(**json.loads(value))
+            except Exception as e:
+                logger.error(f"Error parsing flag {key}: {e}")
+                flags[key] = None
+
+        SSM_HIT.inc(len(params))
+        SSM_MISS.inc(len(flag_keys) - len(params))
+        logger.debug(f"SSM hits for {len(params)}/{len(flag_keys)} flags")
+        return flags
+
+    async def _save_to_ssm(
+        self, flag: FeatureFlag, overwrite: bool = True, strict: bool = False
+    ) -> bool:
+        # ParameterExistsError passes through when overwrite is off, strict raises on any error
         if not ssm_client.is_enabled():
+            if strict and ssm_client.is_configured():
+                raise SSMUnavailableError("SSM is not connected")
             return False
 
         try:
             flag_dict = flag.model_dump(mode="json")
             data = json.dumps(flag_dict)
             description = flag.description or f"Feature flag: {flag.key}"
-            return ssm_client.put_parameter(flag.key, data, description)
+            return await ssm_client.put_parameter(
+                flag.key, data, description, overwrite, strict=strict
+            )
+        except ParameterExistsError:
+            raise
         except Exception as e:
             logger.error(f"SSM write error: {e}")
+            if strict:
+                raise
             return False
 
-    def _delete_from_ssm(self, flag_key: str) -> bool:
+    async def _delete_from_ssm(self, flag_key: str, strict: bool = False) -> bool:
         if not ssm_client.is_enabled():
+            if strict and ssm_client.is_configured():
+                raise SSMUnavailableError("SSM is not connected")
             return False
 
-        return ssm_client.delete_parameter(flag_key)
+        return await ssm_client.delete_parameter(flag_key, strict=strict)
 
-    def create_flag(self, flag_data: FeatureFlagCreate) -> FeatureFlag:
-        existing = self.get_flag(flag_data.key)
-        if existing:
-            raise ValueError(f"Feature flag '{flag_data.key}' already exists")
+    async def create_flag(self, flag_data: FeatureFlagCreate, strict: bool = False) -> FeatureFlag:
+        # the snapshot and redis catch most duplicates for free, ssm's Overwrite=False
+        # settles the rest without reading the parameter first. strict raises if ssm
+        # can't be written instead of keeping the flag in the caches only
+        exists = FlagExistsError(f"Feature flag '{flag_data.key}' already exists")
+        if self._local_cache.get(flag_data.key, stale=True):
+            raise exists
+        cached, last_version = await self._get_write_state(flag_data.key)
+        if cached:
+            raise exists
 
         now = datetime.now(timezone.utc)
-        flag = FeatureFlag(**flag_data.model_dump(), created_at=now, updated_at=now)
+        flag = FeatureFlag(
+            **flag_data.model_dump(), version=last_version + 1, created_at=now, updated_at=now
+        )
+        validate_flag(flag)
 
-        self._save_to_ssm(flag)
-        self._set_to_cache(flag)
+        # reserved like any write, a create racing a delete of the same key conflicts
+        version = await self._reserve_version(flag.key, last_version)
+        flag = flag.model_copy(update={"version": version})
+        try:
+            await self._save_to_ssm(flag, overwrite=False, strict=strict)
+        except Exception as e:
+            await self._release_version(flag.key, version)
+            if isinstance(e, ParameterExistsError):
+                raise exists
+            raise
+        if not await self._write_through(flag.key, flag, flag.version):
+            raise self._conflict(flag.key)
+        self._local_cache.invalidate(flag.key)
+        self._local_cache.put(flag)
+        await flag_change_bus.publish(flag.key, flag.version, "created")
 
         logger.info(f"Created feature flag: {flag.key}")
         return flag
 
-    def get_flag(self, flag_key: str) -> Optional[FeatureFlag]:
-        flag = self._get_from_cache(flag_key)
+    async def _load_flag(
+        self, flag_key: str, generation: int
+    ) -> Tuple[Union[FeatureFlag, _Missing, None], str]:
+        # redis then ssm, refilling the snapshot. None with source "error" means they
+        # couldn't answer, which is not the same as the flag not existing
+        flag = await self._get_from_cache(flag_key)
+        if flag is MISSING:
+            self._local_cache.put_missing(flag_key, generation)
+            return MISSING, "none"
+        if flag:
+            self._local_cache.put(flag, generation)
+            return flag, "cache"
+
+        # configured but not connected is an outage, not "no ssm"
+        if not ssm_client.is_configured():
+            return None, "none"
+
+        flag = await self._get_from_ssm(flag_key)
+        if flag is MISSING:
+            # unknown keys are remembered briefly so they stop costing an ssm call each
+            await self._set_missing_to_cache([flag_key])
+            self._local_cache.put_missing(flag_key, generation)
+            return MISSING, "none"
         if flag:
-            return flag
+            await self._set_to_cache(flag)
+            self._local_cache.put(flag, generation)
+            return flag, "ssm"
 
-        flag = self._get_from_ssm(flag_key)
+        # ssm failed, the write-maintained index still has the last known good copy
+        try:
+            flag = await flag_index.get(flag_key)
+        except Exception as e:
+            redis_client.record_error(e)
+            logger.error(f"Flag index read error: {e}")
+            flag = None
+        return (flag, "stale") if flag else (None, "error")
+
+    def _revalidate(self, flag_key: str):
+        # readers keep getting the stale copy while one task per key refreshes it
+        if flag_key in self._revalidating:
+            return
+        task = asyncio.create_task(self._refresh(flag_key))
+        self._revalidating[flag_key] = task
+        task.add_done_callback(lambda _: self._revalidating.pop(flag_key, None))
+
+    async def _refresh(self, flag_key: str):
+        try:
+            flag, _ = await self._load_flag(flag_key, self._local_cache.generation)
+        except Exception as e:
+            logger.error(f"Revalidating {flag_key} failed: {e}")
+            return
+        if flag is MISSING:
+            # deleted somewhere we didn't hear about
+            self._local_cache.invalidate(flag_key)
+            self._local_cache.put_missing(flag_key)
+
+    async def _get_flag_with_source(self, flag_key: str) -> Tuple[Optional[FeatureFlag], str]:
+        # local snapshot first, redis and ssm only refill it
+        flag = self._local_cache.get(flag_key)
         if flag:
-            self._set_to_cache(flag)
-            return flag
+            LOCAL_HIT.inc()
+            return flag, "cache"
+        if self._local_cache.is_missing(flag_key):
+            LOCAL_NEGATIVE.inc()
+            return None, "none"
+
+        # past its ttl but still last known good, serve it and refresh in the background
+        flag = self._local_cache.get(flag_key, stale=True)
+        if flag:
+            LOCAL_STALE.inc()
+            self._revalidate(flag_key)
+            return flag, "stale"
+        LOCAL_MISS.inc()
 
-        return None
+        flag, source = await self._load_flag(flag_key, self._local_cache.generation)
+        return (flag if isinstance(flag, FeatureFlag) else None), source
+
+    async def get_flag(self, flag_key: str) -> Optional[FeatureFlag]:
+        flag, _ = await self._get_flag_with_source(flag_key)
+        return flag
 
-    def update_flag(self, flag_key: str, update_data: FeatureFlagUpdate) -> Optional[FeatureFlag]:
-        flag = self.get_flag(flag_key)
+    async def get_flag_payload(self, flag_key: str) -> Optional[Tuple[FeatureFlag, bytes]]:
+        # the flag and its encoded json, cached alongside it so hot reads skip serialization
+        flag = await self.get_flag(flag_key)
+        if not flag:
+            return None
+        return flag, self._local_cache.get_payload(flag) or flag.model_dump_json().encode()
+
+    async def get_flags(self, flag_keys: List[str]) -> Dict[str, FeatureFlag]:
+        flags, _ = await self._get_flags_with_errors(flag_keys)
+        return flags
+
+    async def _get_flags_with_errors(
+        self, flag_keys: List[str]
+    ) -> Tuple[Dict[str, FeatureFlag], List[str]]:
+        # same tiers as get_flag, but a single MGET for everything the snapshot misses.
+        # also returns the keys nothing could answer for, which aren't "not found"
+        flags = {}
+        missing = []
+        known_missing = 0
+        stale = 0
+        for key in dict.fromkeys(flag_keys):
+            flag = self._local_cache.get(key)
+            if flag:
+                flags[key] = flag
+            elif self._local_cache.is_missing(key):
+                known_missing += 1
+            elif flag := self._local_cache.get(key, stale=True):
+                flags[key] = flag
+                stale += 1
+                self._revalidate(key)
+            else:
+                missing.append(key)
+        LOCAL_HIT.inc(len(flags) - stale)
+        LOCAL_STALE.inc(stale)
+        LOCAL_NEGATIVE.inc(known_missing)
+        LOCAL_MISS.inc(len(missing))
+
+        if not missing:
+            return flags, []
+
+        generation = self._local_cache.generation
+        cached = await self._get_many_from_cache(missing)
+        for key, flag in cached.items():
+            if flag is MISSING:
+                self._local_cache.put_missing(key, generation)
+            else:
+                self._local_cache.put(flag, generation)
+                flags[key] = flag
+
+        # everything redis missed goes to ssm in GetParameters batches
+        from_ssm = await self._get_many_from_ssm([key for key in missing if key not in cached])
+        found = [flag for flag in from_ssm.values() if isinstance(flag, FeatureFlag)]
+        await self._set_many_to_cache(found)
+        await self._set_missing_to_cache([key for key, flag in from_ssm.items() if flag is MISSING])
+        failed = []
+        for key, flag in from_ssm.items():
+            if flag is MISSING:
+                self._local_cache.put_missing(key, generation)
+            elif flag:
+                self._local_cache.put(flag, generation)
+                flags[key] = flag
+            else:
+                failed.append(key)
+        if not failed:
+            return flags, []
+
+        # ssm failed, the write-maintained index still has the last known good copies
+        try:
+            for flag in await flag_index.get_many(failed):
+                flags[flag.key] = flag
+        except Exception as e:
+            redis_client.record_error(e)
+            logger.error(f"Flag index read error: {e}")
+        return flags, [key for key in failed if key not in flags]
+
+    async def update_flag(
+        self, flag_key: str, update_data: FeatureFlagUpdate, strict: bool = False
+    ) -> Optional[FeatureFlag]:
+        flag = await self.get_flag(flag_key)
         if not flag:
             return None
 
-        update_dict = update_data.model_dump(exclude_unset=True)
-        for key, value in update_dict.items():
-            setattr(flag, key, value)
-
-        flag.updated_at = datetime.now(timezone.utc)
+        # copy instead of mutating, the cached instance is shared with readers.
+        # model_copy doesn't validate, so pass the models and not model_dump() dicts
+        update_dict = {name: getattr(update_data, name) for name in update_data.model_fields_set}
+        update_dict["updated_at"] = datetime.now(timezone.utc)
+        flag = flag.model_copy(update=update_dict)
+        validate_flag(flag)
 
-        self._save_to_ssm(flag)
-        self._invalidate_cache(flag_key)
+        # the version comes from redis, not from a snapshot that may be behind
+        version = await self._reserve_version(flag_key, flag.version)
+        flag = flag.model_copy(update={"version": version})
+        try:
+            await self._save_to_ssm(flag, strict=strict)
+        except Exception:
+            await self._release_version(flag_key, version)
+            raise
+        if not await self._write_through(flag_key, flag, version):
+            raise self._conflict(flag_key)
+        self._local_cache.invalidate(flag_key)
+        self._local_cache.put(flag)
+        await flag_change_bus.publish(flag.key, flag.version, "updated")
 
         logger.info(f"Updated feature flag: {flag_key}")
         return flag
 
-    def delete_flag(self, flag_key: str) -> bool:
-        flag = self.get_flag(flag_key)
+    async def import_flag(
+        self, flag_data: FeatureFlagCreate, overwrite: bool = False
+    ) -> Tuple[Optional[FeatureFlag], str]:
+        # one item of a bulk import: "created", "updated", "unchanged" or "exists". SSM
+        # errors raise so the importer can retry, and a new key costs a single put
+        try:
+            return await self.create_flag(flag_data, strict=True), "created"
+        except FlagExistsError:
+            if not overwrite:
+                return None, "exists"
+
+        # fields the line has replace the stored ones, rules can't be cleared
+        changes = flag_data.model_dump(exclude={"key"}, exclude_unset=True)
+        if changes.get("rules") is None:
+            changes.pop("rules", None)
+        update = FeatureFlagUpdate(**changes)
+
+        existing = await self.get_flag(flag_data.key)
+        if not existing:
+            raise RuntimeError(f"Feature flag '{flag_data.key}' exists but couldn't be read")
+        changed = [
+            name
+            for name in update.model_fields_set
+            if getattr(existing, name) != getattr(update, name)
+        ]
+        if not changed:
+            return existing, "unchanged"
+
+        flag = await self.update_flag(flag_data.key, update, strict=True)
+        return flag, "updated"
+
+    async def delete_flag(self, flag_key: str, strict: bool = False) -> bool:
+        flag = await self.get_flag(flag_key)
         if not flag:
             return False
 
-        self._delete_from_ssm(flag_key)
-        self._invalidate_cache(flag_key)
+        # the delete is a version too, a refill still holding the old flag can't revive it
+        version = await self._reserve_version(flag_key, flag.version)
+        try:
+            await self._delete_from_ssm(flag_key, strict=strict)
+        except Exception:
+            await self._release_version(flag_key, version)
+            raise
+        if not await self._write_through(flag_key, None, version):
+            raise self._conflict(flag_key)
+        self._local_cache.invalidate(flag_key)
+        self._local_cache.put_missing(flag_key)
+        await flag_change_bus.publish(flag_key, version, "deleted")
 
         logger.info(f"Deleted feature flag: {flag_key}")
         return True
 
-    def list_flags(self) -> List[FeatureFlag]:
-        if not ssm_client.is_enabled():
-            return []
-
-        try:
-            params = ssm_client.list_parameters()
-            flags = []
-            for key, value in params.items():
-                try:
-                    flag_dict = json.loads(value)
-                    flags.append(FeatureFlag(**flag_dict))
-                except Exception as e:
-                    logger.error(f"Error parsing flag {key}: {e}")
-
-            return flags
-        except Exception as e:
-            logger.error(f"Error listing flags: {e}")
-            return []
-
-    def evaluate_flag(
-        self, flag_key: str, user_id: Optional[str] = None, context: Optional[Dict[str, Any]] = None
-    ) -> FeatureFlagEvaluationResult:
-        flag = self.get_flag(flag_key)
+    async def _scan_ssm(self) -> List[FeatureFlag]:
+        # every flag straight from ssm, raises if the scan fails
+        params = await ssm_client.list_parameters(strict=True)
+        flags = []
+        for key, value in params.items():
+            try:
+                flag_dict = json.loads(value)
+                flags.append(FeatureFlag(**flag_dict))
+            except Exception as e:
+                logger.error(f"Error parsing flag {key}: {e}")
+
+        return flags
+
+    async def _rebuild_index(self) -> List[FeatureFlag]:
+        # without ssm the index itself is the only copy of the flags, keep what's there
+        writes = await flag_index.writes()
+        flags = await self._scan_ssm() if ssm_client.is_enabled() else await flag_index.query()
+        if await flag_index.rebuild(flags, writes):
+            # parameters edited in ssm by hand, the list etag has to change with them
+            await config_version.bump()
+        return flags
+
+    async def _rebuild_due_index(self):
+        # one replica rescans ssm, the others keep reading the expired index meanwhile.
+        # a missing one is rebuilt regardless, there'd be nothing to read
+        if await flag_index.claim_rebuild():
+            try:
+                await self._rebuild_index()
+            finally:
+                await flag_index.release_rebuild()
+        elif not await flag_index.has_entries():
+            await self._rebuild_index()
+
+    async def _ensure_index(self) -> bool:
+        # False when redis is down, the index can't be trusted then
+        if not flag_index.available():
+            return False
+        if not await flag_index.is_ready():
+            await self._index_flight.do("rebuild", self._rebuild_due_index)
+        return True
 
+    async def iter_flags(
+        self,
+        prefix: Optional[str] = None,
+        metadata: Optional[Dict[str, str]] = None,
+        order: SortOrder = "key",
+        after: Optional[Tuple] = None,
+        offset: int = 0,
+    ) -> AsyncIterator[FeatureFlag]:
+        # like list_flags but streamed from the index page by page, errors are raised
+        if await self._ensure_index():
+            async for flag in flag_index.iter_flags(prefix, metadata, order, after, offset):
+                yield flag
+            return
+
+        # redis is down, scanning ssm is the only complete answer left
+        flags = await self._scan_ssm()
+        for flag in filter_flags(flags, prefix, metadata, order, offset, after=after):
+            yield flag
+
+    async def list_flags(
+        self,
+        prefix: Optional[str] = None,
+        metadata: Optional[Dict[str, str]] = None,
+        order: SortOrder = "key",
+        offset: int = 0,
+        limit: Optional[int] = None,
+        after: Optional[Tuple] = None,
+    ) -> List[FeatureFlag]:
+        # served from the flag index, a full ssm scan only fills a missing or expired index.
+        # errors are raised, an empty list would read as "there are no flags"
+        if await self._ensure_index():
+            return await flag_index.query(prefix, metadata, order, offset, limit, after)
+
+        flags = await self._scan_ssm()
+        return filter_flags(flags, prefix, metadata, order, offset, limit, after)
+
+    async def load_snapshot(self) -> int:
+        # pull every flag from ssm and refill redis, the index and the local snapshot in one go
+        if not ssm_client.is_enabled():
+            return 0
+
+        generation = self._local_cache.generation
+        writes = await flag_index.writes() if flag_index.available() else {}
+        flags = await self._scan_ssm()
+        await self._set_many_to_cache(flags)
+        for flag in flags:
+            self._local_cache.put(flag, generation)
+        if flag_index.available() and await flag_index.rebuild(flags, writes):
+            await config_version.bump()
+
+        self.snapshot_loaded = True
+        logger.info(f"Loaded flag snapshot: {len(flags)} flags")
+        return len(flags)
+
+    async def refresh_snapshot(self) -> int:
+        # the periodic refresh, from the index writes keep current instead of a full ssm
+        # scan per replica. SSM is only scanned when the index is due, by one replica
+        if not await self._ensure_index():
+            # no index while redis is down, entries go stale and refresh one by one
+            logger.warning("Flag index unavailable, skipping the snapshot refresh")
+            return 0
+
+        generation = self._local_cache.generation
+        count = 0
+        async for flag in flag_index.iter_flags():
+            self._local_cache.put(flag, generation)
+            count += 1
+        logger.debug(f"Refreshed flag snapshot: {count} flags")
+        return count
+
+    async def _get_compiled_with_source(self, flag_key: str) -> Tuple[Optional[CompiledFlag], str]:
+        compiled = self._local_cache.get_compiled(flag_key)
+        if compiled:
+            LOCAL_HIT.inc()
+            return compiled, "cache"
+
+        flag, source = await self._get_flag_with_source(flag_key)
         if not flag:
-            return FeatureFlagEvaluationResult(
-                key=flag_key, enabled=False, matched_rule="not_found", source="none"
-            )
-
-        if not flag.enabled:
-            return FeatureFlagEvaluationResult(
-                key=flag_key,
-                enabled=False,
-                matched_rule="disabled",
-                source="cache" if self._get_from_cache(flag_key) else "ssm",
-            )
-
-        rules = flag.rules
-        source = "cache" if self._get_from_cache(flag_key) else "ssm"
-
-        if rules.strategy == RolloutStrategy.ALL:
-            return FeatureFlagEvaluationResult(
-                key=flag_key, enabled=True, matched_rule="all", source=source
-            )
-
-        if rules.strategy == RolloutStrategy.USER_LIST:
-            if user_id and rules.user_ids and user_id in rules.user_ids:
-                return FeatureFlagEvaluationResult(
-                    key=flag_key, enabled=True, matched_rule="user_list", source=source
+            return None, source
+
+        # the refill (or the stale entry) usually compiled it already
+        compiled = self._local_cache.get_compiled(flag_key, stale=True)
+        if compiled is None or compiled.version != flag.version:
+            compiled = compile_flag(flag)
+        return compiled, source
+
+    async def _segment_contexts(
+        self,
+        segments: FrozenSet[str],
+        user_ids: List[Optional[str]],
+        contexts: List[Optional[Dict[str, Any]]],
+        columns: Dict[str, List[bool]],
+    ) -> List[Dict[str, Any]]:
+        # one SMISMEMBER per segment for the whole batch, shared between flags via columns
+        for name in segments:
+            if name not in columns:
+                columns[name] = await segment_service.contains_many(name, user_ids)
+        return [
+            {**(context or {}), SEGMENTS_KEY: {name for name in segments if columns[name][i]}}
+            for i, context in enumerate(contexts)
+        ]
+
+    async def evaluate_flag(
+        self, flag_key: str, user_id: Optional[str] = None, context: Optional[Dict[str, Any]] = None
+    ) -> EvaluationResult:
+        start = time.perf_counter()
+        compiled, source = await self._get_compiled_with_source(flag_key)
+
+        # only plans from the local snapshot, they're the same object until the flag changes
+        memo_key = None
+        if source == "cache" and self._local_cache.enabled:
+            memo_key = self._memo.key(compiled, user_id, context)
+        if memo_key is not None:
+            memoized = self._memo.get(memo_key, compiled)
+            if memoized:
+                result, counter = memoized
+                counter.inc()
+                EVALUATE_SINGLE.observe(time.perf_counter() - start)
+                return result
+
+        if compiled and compiled.segments:
+            member_of = await segment_service.memberships(compiled.segments, user_id)
+            context = {**(context or {}), SEGMENTS_KEY: member_of}
+        if compiled:
+            enabled, matched_rule = compiled.evaluate(user_id, context)
+        else:
+            enabled, matched_rule = UNAVAILABLE if source == "error" else NOT_FOUND
+        counter = metrics.evaluations.labels(metrics.rule_label(matched_rule))
+        counter.inc()
+        result = EvaluationResult(flag_key, enabled, matched_rule, source)
+        if memo_key is not None:
+            self._memo.put(memo_key, compiled, result, counter)
+        EVALUATE_SINGLE.observe(time.perf_counter() - start)
+        return result
+
+    async def evaluate_flags(
+        self, flag_keys: Union[List[str], str], users: List[BatchEvaluationUser]
+    ) -> BatchEvaluationResult:
+        # one cache pass for every flag, then evaluate the full flags x users grid
+        start = time.perf_counter()
+        if flag_keys == "all":
+            found = {flag.key: flag for flag in await self.list_flags()}
+            keys = list(found)
+            unavailable = set()
+        else:
+            found, failed = await self._get_flags_with_errors(list(flag_keys))
+            keys = list(dict.fromkeys(flag_keys))
+            unavailable = set(failed)
+
+        compiled: Dict[str, Optional[CompiledFlag]] = {}
+        for key in keys:
+            flag = found.get(key)
+            if flag:
+                compiled[key] = self._local_cache.get_compiled(key, stale=True)
+                if compiled[key] is None or compiled[key].version != flag.version:
+                    compiled[key] = compile_flag(flag)
+            else:
+                compiled[key] = None
+
+        # evaluate flag by flag so each plan can bucket all users in one pass
+        user_ids = [user.user_id for user in users]
+        contexts = [user.context for user in users]
+        columns: Dict[str, List[Outcome]] = {}
+        segment_columns: Dict[str, List[bool]] = {}
+        for key, evaluator in compiled.items():
+            flag_contexts = contexts
+            if evaluator and evaluator.segments:
+                flag_contexts = await self._segment_contexts(
+                    evaluator.segments, user_ids, contexts, segment_columns
                 )
-            return FeatureFlagEvaluationResult(
-                key=flag_key, enabled=False, matched_rule="user_not_in_list", source=source
-            )
-
-        if rules.strategy == RolloutStrategy.PERCENTAGE:
-            if rules.percentage is not None and user_id:
-                hash_value = int(hashlib.md5(f"{flag_key}:{user_id}".encode()).hexdigest(), 16)
-                user_percentage = hash_value % 100
-
-                if user_percentage < rules.percentage:
-                    return FeatureFlagEvaluationResult(
-                        key=flag_key,
-                        enabled=True,
-                        matched_rule=f"percentage_{rules.percentage}",
-                        source=source,
-                    )
-
-            return FeatureFlagEvaluationResult(
-                key=flag_key, enabled=False, matched_rule="percentage_not_matched", source=source
-            )
-
-        return FeatureFlagEvaluationResult(
-            key=flag_key, enabled=False, matched_rule="no_rule_matched", source=source
-        )
+            if evaluator:
+                column = evaluator.evaluate_many(user_ids, flag_contexts)
+            else:
+                column = [UNAVAILABLE if key in unavailable else NOT_FOUND] * len(users)
+            columns[key] = column
+            # outcomes are shared constants, count each distinct one once
+            for (_, matched_rule), count in Counter(column).items():
+                metrics.evaluations.labels(metrics.rule_label(matched_rule)).inc(count)
+
+        EVALUATE_BATCH.observe(time.perf_counter() - start)
+        return BatchEvaluationResult(user_ids, columns)
 
 
 feature_flag_service = FeatureFlagService()
@@ -0,0 +1,148 @@
+"""
+In-process snapshot of parsed feature flags.
+Sits in front of Redis so hot reads never leave the process.
+"""
+
+import time
+from collections import OrderedDict
+from typing import Optional
+
+from models.feature_flag import FeatureFlag
+from services.flag_evaluator import CompiledFlag, compile_flag
+
+
+class CachedFlag:
+    __slots__ = ("flag", "compiled", "expires_at", "_payload")
+
+    def __init__(self, flag: FeatureFlag, expires_at: float):
+        self.flag = flag
+        # compiled once per version, evaluations reuse it
+        self.compiled = compile_flag(flag)
+        self.expires_at = expires_at
+        self._payload: Optional[bytes] = None
+
+    @property
+    def payload(self) -> bytes:
+        # response body for GET /flags/{key}, encoded on first read and reused for the version
+        if self._payload is None:
+            self._payload = self.flag.model_dump_json().encode()
+        return self._payload
+
+
+class LocalFlagCache:
+    def __init__(self, ttl: float, max_size: int, negative_ttl: float = 0, stale_ttl: float = 0):
+        self.ttl = ttl
+        self.max_size = max_size
+        # expired entries are kept this much longer as last known good values
+        self.stale_ttl = stale_ttl
+        # keys known not to exist, key -> expires_at. kept short so a flag created
+        # somewhere we don't hear about still shows up quickly
+        self.negative_ttl = negative_ttl
+        self._entries: "OrderedDict[str, CachedFlag]" = OrderedDict()
+        self._missing: "OrderedDict[str, float]" = OrderedDict()
+        # bumped on every invalidation, lets refills detect they raced a write
+        self._generation: int = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.ttl > 0 and self.max_size > 0
+
+    @property
+    def generation(self) -> int:
+        return self._generation
+
+    def _get_entry(self, flag_key: str, stale: bool = False) -> Optional[CachedFlag]:
+        entry = self._entries.get(flag_key)
+        if entry is None:
+            return None
+
+        now = time.monotonic()
+        if entry.expires_at <= now:
+            if entry.expires_at + self.stale_ttl <= now:
+                del self._entries[flag_key]
+                return None
+            if not stale:
+                return None
+
+        self._entries.move_to_end(flag_key)
+        return entry
+
+    def get(self, flag_key: str, stale: bool = False) -> Optional[FeatureFlag]:
+        entry = self._get_entry(flag_key, stale)
+        return entry.flag if entry else None
+
+    def get_compiled(self, flag_key: str, stale: bool = False) -> Optional[CompiledFlag]:
+        entry = self._get_entry(flag_key, stale)
+        return entry.compiled if entry else None
+
+    def get_payload(self, flag: FeatureFlag) -> Optional[bytes]:
+        # only when the cached entry is this exact flag, a payload never outlives its version
+        entry = self._entries.get(flag.key)
+        return entry.payload if entry is not None and entry.flag is flag else None
+
+    def is_missing(self, flag_key: str) -> bool:
+        expires_at = self._missing.get(flag_key)
+        if expires_at is None:
+            return False
+
+        if expires_at <= time.monotonic():
+            del self._missing[flag_key]
+            return False
+        return True
+
+    def put_missing(self, flag_key: str, generation: Optional[int] = None) -> bool:
+        if not self.enabled or self.negative_ttl <= 0:
+            return False
+
+        # same race as put, a create may have landed while we were looking
+        if generation is not None and generation != self._generation:
+            return False
+        if flag_key in self._entries:
+            return False
+
+        self._missing[flag_key] = time.monotonic() + self.negative_ttl
+        self._missing.move_to_end(flag_key)
+        while len(self._missing) > self.max_size:
+            self._missing.popitem(last=False)
+        return True
+
+    def put(self, flag: FeatureFlag, generation: Optional[int] = None) -> bool:
+        if not self.enabled:
+            return False
+
+        # a refill that started before an invalidation must not bring stale data back
+        if generation is not None and generation != self._generation:
+            return False
+
+        # never replace a newer version with an older one
+        current = self._entries.get(flag.key)
+        if current is not None and current.flag.version > flag.version:
+            return False
+
+        # same version just renews the ttl, no need to compile it again
+        if current is not None and current.flag.version == flag.version:
+            current.expires_at = time.monotonic() + self.ttl
+            self._entries.move_to_end(flag.key)
+            return True
+
+        self._entries[flag.key] = CachedFlag(flag, time.monotonic() + self.ttl)
+        self._entries.move_to_end(flag.key)
+        self._missing.pop(flag.key, None)
+
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+        return True
+
+    def invalidate(self, flag_key: str):
+        self._entries.pop(flag_key, None)
+        self._missing.pop(flag_key, None)
+        self._generation += 1
+
+    def clear(self):
+        self._entries.clear()
+        self._missing.clear()
+        self._generation += 1
+
+    def __len__(self) -> int:
+        return len(self._entries)
@@ -0,0 +1,121 @@
+"""
+Flag change notifications across replicas.
+Writers publish to a Redis pub/sub channel, every worker subscribes and
+passes the events on to local listeners (e.g. to evict its snapshot).
+"""
+
+import asyncio
+import uuid
+from typing import Callable, List, Optional
+from loguru import logger
+
+from core.config import settings
+from core.redis_client import redis_client
+from models.feature_flag import FlagChangeEvent
+
+
+ChangeListener = Callable[[FlagChangeEvent], None]
+ResetListener = Callable[[], None]
+
+
+class FlagChangeBus:
+    def __init__(self, channel: str):
+        self.channel = channel
+        self.instance_id = uuid.uuid4().hex
+        self._listeners: List[ChangeListener] = []
+        self._reset_listeners: List[ResetListener] = []
+        self._task: Optional[asyncio.Task] = None
+
+    def add_listener(self, on_change: ChangeListener, on_reset: Optional[ResetListener] = None):
+        self._listeners.append(on_change)
+        if on_reset:
+            self._reset_listeners.append(on_reset)
+
+    def remove_listener(self, on_change: ChangeListener, on_reset: Optional[ResetListener] = None):
+        self._listeners.remove(on_change)
+        if on_reset:
+            self._reset_listeners.remove(on_reset)
+
+    def _dispatch(self, event: FlagChangeEvent):
+        for listener in self._listeners:
+            try:
+                listener(event)
+            except Exception as e:
+                logger.error(f"Flag change listener failed: {e}")
+
+    def _reset(self):
+        for listener in self._reset_listeners:
+            try:
+                listener()
+            except Exception as e:
+                logger.error(f"Flag reset listener failed: {e}")
+
+    async def publish(self, key: str, version: int, action: str) -> FlagChangeEvent:
+        event = FlagChangeEvent(key=key, version=version, action=action, origin=self.instance_id)
+
+        # local listeners first, the channel echo from our own instance is ignored
+        self._dispatch(event)
+
+        client = redis_client.get_client()
+        if client and settings.flag_change_events_enabled:
+            try:
+                await client.publish(self.channel, event.model_dump_json())
+            except Exception as e:
+                logger.error(f"Failed to publish flag change for {key}: {e}")
+
+        return event
+
+    async def _listen(self):
+        while True:
+            client = redis_client.get_client()
+            if not client:
+                await asyncio.sleep(1)
+                continue
+
+            pubsub = client.pubsub(ignore_subscribe_messages=True)
+            try:
+                await pubsub.subscribe(self.channel)
+                # anything published while we weren't subscribed is lost, start clean
+                self._reset()
+                logger.info(f"Subscribed to flag changes on {self.channel}")
+
+                async for message in pubsub.listen():
+                    if message.get("type") != "message":
+                        continue
+                    try:
+                        event = FlagChangeEvent.model_validate_json(message["data"])
+                    except Exception as e:
+                        logger.error(f"Invalid flag change event: {e}")
+                        continue
+                    if event.origin != self.instance_id:
+                        self._dispatch(event)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"Flag change subscription lost: {e}")
+                await asyncio.sleep(1)
+            finally:
+                try:
+                    await pubsub.aclose()
+                except Exception:
+                    pass
+
+    def start(self):
+        if not settings.flag_change_events_enabled or self._task:
+            return
+
+        self._task = asyncio.create_task(self._listen())
+
+    async def stop(self):
+        if not self._task:
+            return
+
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+
+flag_change_bus = FlagChangeBus(channel=settings.flag_change_channel)
@@ -0,0 +1,181 @@
+"""
+Compiled evaluation plans for feature flags.
+Each flag is turned into an immutable evaluator once, when it's loaded or
+updated, so evaluation is a single call with no pydantic access.
+"""
+
+from typing import Any, Callable, Dict, FrozenSet, List, Optional, Sequence, Tuple
+
+from loguru import logger
+
+from models.feature_flag import FeatureFlag, RolloutStrategy
+from services.bucketing import bucket_many, get_bucketer
+from services.targeting import (
+    SEGMENTS_KEY,
+    InvalidRuleError,
+    compile_custom_rules,
+    referenced_segments,
+)
+
+
+# (enabled, matched_rule)
+Outcome = Tuple[bool, str]
+Evaluator = Callable[[Optional[str], Optional[Dict[str, Any]]], Outcome]
+ManyEvaluator = Callable[
+    [Sequence[Optional[str]], Sequence[Optional[Dict[str, Any]]]], List[Outcome]
+]
+
+NOT_FOUND: Outcome = (False, "not_found")
+DISABLED: Outcome = (False, "disabled")
+ALL: Outcome = (True, "all")
+USER_LIST: Outcome = (True, "user_list")
+USER_NOT_IN_LIST: Outcome = (False, "user_not_in_list")
+PERCENTAGE_NOT_MATCHED: Outcome = (False, "percentage_not_matched")
+NO_RULE_MATCHED: Outcome = (False, "no_rule_matched")
+SEGMENT_NOT_MATCHED: Outcome = (False, "segment_not_matched")
+INVALID_RULES: Outcome = (False, "invalid_rules")
+UNAVAILABLE: Outcome = (False, "unavailable")  # lookup failed, the flag may well exist
+
+
+class CompiledFlag:
+    __slots__ = ("key", "version", "evaluate", "evaluate_many", "segments", "reads_context")
+
+    def __init__(
+        self,
+        key: str,
+        version: int,
+        evaluate: Evaluator,
+        evaluate_many: Optional[ManyEvaluator],
+        segments: FrozenSet[str] = frozenset(),
+        reads_context: bool = False,
+    ):
+        self.key = key
+        self.version = version
+        self.evaluate = evaluate
+        # evaluates a whole column of users at once, used by batch evaluation
+        self.evaluate_many = evaluate_many or _per_user(evaluate)
+        # segments whose membership has to be in the context under SEGMENTS_KEY
+        self.segments = segments
+        # False when the outcome depends on the user id alone
+        self.reads_context = reads_context
+
+    def __setattr__(self, name, value):
+        if hasattr(self, name):
+            raise AttributeError(f"{type(self).__name__} is immutable")
+        super().__setattr__(name, value)
+
+
+def _per_user(evaluate: Evaluator) -> ManyEvaluator:
+    def evaluate_many(user_ids, contexts):
+        return [evaluate(user_id, context) for user_id, context in zip(user_ids, contexts)]
+
+    return evaluate_many
+
+
+def _constant(outcome: Outcome) -> Tuple[Evaluator, ManyEvaluator]:
+    def evaluate(user_id, context=None):
+        return outcome
+
+    def evaluate_many(user_ids, contexts):
+        return [outcome] * len(user_ids)
+
+    return evaluate, evaluate_many
+
+
+def _compile_user_list(flag: FeatureFlag) -> Tuple[Evaluator, Optional[ManyEvaluator]]:
+    # hash lookup instead of scanning the list on every call
+    user_ids = frozenset(user_id for user_id in flag.rules.user_ids or () if user_id)
+    if not user_ids:
+        return _constant(USER_NOT_IN_LIST)
+
+    def evaluate(user_id, context=None):
+        return USER_LIST if user_id in user_ids else USER_NOT_IN_LIST
+
+    return evaluate, None
+
+
+def _compile_percentage(flag: FeatureFlag) -> Tuple[Evaluator, Optional[ManyEvaluator]]:
+    rules = flag.rules
+    if rules.basis_points is not None:
+        threshold = rules.basis_points
+        matched: Outcome = (True, f"percentage_bp_{rules.basis_points}")
+    elif rules.percentage is not None:
+        threshold = rules.percentage * 100
+        matched = (True, f"percentage_{rules.percentage}")
+    else:
+        return _constant(PERCENTAGE_NOT_MATCHED)
+
+    bucket = get_bucketer(flag.key, rules.bucketing)
+
+    def evaluate(user_id, context=None):
+        if not user_id:
+            return PERCENTAGE_NOT_MATCHED
+        return matched if bucket(user_id) < threshold else PERCENTAGE_NOT_MATCHED
+
+    def evaluate_many(user_ids, contexts):
+        return [
+            matched if value < threshold else PERCENTAGE_NOT_MATCHED
+            for value in bucket_many(bucket, user_ids)
+        ]
+
+    return evaluate, evaluate_many
+
+
+def _compile_segment(flag: FeatureFlag) -> Tuple[Evaluator, Optional[ManyEvaluator]]:
+    # membership is looked up by the service, the plan only picks the first matching segment
+    segments = tuple(dict.fromkeys(flag.rules.segments or ()))
+    if not segments:
+        return _constant(SEGMENT_NOT_MATCHED)
+    matched = {name: (True, f"segment:{name}") for name in segments}
+
+    def evaluate(user_id, context=None):
+        member_of = context.get(SEGMENTS_KEY) if context else None
+        if member_of:
+            for name in segments:
+                if name in member_of:
+                    return matched[name]
+        return SEGMENT_NOT_MATCHED
+
+    return evaluate, None
+
+
+def _compile_custom(flag: FeatureFlag) -> Tuple[Evaluator, Optional[ManyEvaluator]]:
+    bucket = get_bucketer(flag.key, flag.rules.bucketing)
+    try:
+        return compile_custom_rules(flag.rules.custom_rules, bucket), None
+    except InvalidRuleError as e:
+        # writes are validated, so this is a flag written by something else, fail closed
+        logger.error(f"Invalid custom rules for flag {flag.key}: {e}")
+        return _constant(INVALID_RULES)
+
+
+def validate_flag(flag: FeatureFlag):
+    # raises InvalidRuleError for rules that can't be compiled
+    if flag.rules.strategy == RolloutStrategy.SEGMENT and not flag.rules.segments:
+        raise InvalidRuleError("segment strategy needs at least one segment")
+    if flag.rules.strategy == RolloutStrategy.CUSTOM:
+        compile_custom_rules(flag.rules.custom_rules, get_bucketer(flag.key, flag.rules.bucketing))
+
+
+def compile_flag(flag: FeatureFlag) -> CompiledFlag:
+    segments: FrozenSet[str] = frozenset()
+    reads_context = False
+    if not flag.enabled:
+        evaluate, evaluate_many = _constant(DISABLED)
+    elif flag.rules.strategy == RolloutStrategy.ALL:
+        evaluate, evaluate_many = _constant(ALL)
+    elif flag.rules.strategy == RolloutStrategy.USER_LIST:
+        evaluate, evaluate_many = _compile_user_list(flag)
+    elif flag.rules.strategy == RolloutStrategy.PERCENTAGE:
+        evaluate, evaluate_many = _compile_percentage(flag)
+    elif flag.rules.strategy == RolloutStrategy.SEGMENT:
+        evaluate, evaluate_many = _compile_segment(flag)
+        segments = frozenset(flag.rules.segments or ())
+    elif flag.rules.strategy == RolloutStrategy.CUSTOM:
+        evaluate, evaluate_many = _compile_custom(flag)
+        segments = referenced_segments(flag.rules.custom_rules)
+        reads_context = True
+    else:
+        evaluate, evaluate_many = _constant(NO_RULE_MATCHED)
+
+    return CompiledFlag(flag.key, flag.version, evaluate, evaluate_many, segments, reads_context)
@@ -0,0 +1,166 @@
+"""
+Bulk flag import from NDJSON.
+Lines are parsed as they arrive and handed to a fixed number of workers, so
+neither the file nor the pending writes pile up in memory. SSM throttles per
+account, so when one write is pushed back every worker pauses before the
+write is retried.
+"""
+
+import asyncio
+import random
+import time
+from typing import AsyncIterator, Optional, Tuple
+
+from loguru import logger
+from pydantic import ValidationError
+
+from core import metrics
+from core.circuit_breaker import CircuitOpenError
+from core.config import settings
+from core.ssm_client import is_transient
+from models.feature_flag import FeatureFlagCreate, FlagImportResult
+from services.feature_flag_service import FlagConflictError, feature_flag_service
+from services.targeting import InvalidRuleError
+
+
+RETRY_BASE_DELAY = 0.2  # seconds before the first retry, doubled per attempt
+RETRY_MAX_DELAY = 10.0
+
+# tells a worker there's nothing more to write
+DONE = None
+
+
+async def iter_lines(chunks: AsyncIterator[bytes]) -> AsyncIterator[bytes]:
+    # body chunks split into lines, a line can span chunks
+    pending = b""
+    async for chunk in chunks:
+        pending += chunk
+        *lines, pending = pending.split(b"\n")
+        for line in lines:
+            yield line
+    if pending:
+        yield pending
+
+
+def _validation_error(error: ValidationError) -> str:
+    first = error.errors()[0]
+    where = ".".join(str(part) for part in first["loc"])
+    return f"{where}: {first['msg']}" if where else first["msg"]
+
+
+class FlagImporter:
+    def __init__(
+        self,
+        overwrite: bool = False,
+        concurrency: int = settings.import_concurrency,
+        max_retries: int = settings.import_max_retries,
+    ):
+        self.overwrite = overwrite
+        self.concurrency = max(1, concurrency)
+        self.max_retries = max_retries
+        # shared by the workers, pushed forward whenever ssm pushes back
+        self._resume_at = 0.0
+
+    async def _wait_turn(self):
+        delay = self._resume_at - time.monotonic()
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+    def _back_off(self, attempt: int, error: Exception) -> float:
+        if isinstance(error, CircuitOpenError):
+            # nothing gets through before the breaker lets a probe in
+            delay = settings.circuit_breaker_reset_timeout
+        else:
+            # full doubling with jitter, so the workers don't come back in lockstep
+            delay = min(RETRY_MAX_DELAY, RETRY_BASE_DELAY * 2**attempt) * random.uniform(0.5, 1)
+        self._resume_at = max(self._resume_at, time.monotonic() + delay)
+        return delay
+
+    async def _write(self, line: int, flag_data: FeatureFlagCreate) -> FlagImportResult:
+        attempts = 0
+        while True:
+            await self._wait_turn()
+            attempts += 1
+            try:
+                flag, status = await feature_flag_service.import_flag(flag_data, self.overwrite)
+            except (InvalidRuleError, ValidationError) as e:
+                error = _validation_error(e) if isinstance(e, ValidationError) else str(e)
+                return FlagImportResult(
+                    line=line, key=flag_data.key, status="invalid", attempts=attempts, error=error
+                )
+            except Exception as e:
+                # a conflict lost to a concurrent write, the retry reads the flag again
+                retryable = is_transient(e) or isinstance(e, FlagConflictError)
+                if attempts > self.max_retries or not retryable:
+                    logger.error(f"Importing {flag_data.key} failed: {e}")
+                    return FlagImportResult(
+                        line=line,
+                        key=flag_data.key,
+                        status="failed",
+                        attempts=attempts,
+                        error=str(e),
+                    )
+                metrics.import_retries.inc()
+                delay = self._back_off(attempts - 1, e)
+                logger.warning(f"Importing {flag_data.key} again in {delay:.1f}s: {e}")
+                continue
+
+            return FlagImportResult(
+                line=line,
+                key=flag_data.key,
+                status=status,
+                version=flag.version if flag else None,
+                attempts=attempts,
+            )
+
+    async def run(self, lines: AsyncIterator[bytes]) -> AsyncIterator[FlagImportResult]:
+        # results in the order they finish, each one carries its line number
+        pending: "asyncio.Queue[Optional[Tuple[int, FeatureFlagCreate]]]" = asyncio.Queue(
+            self.concurrency * 2
+        )
+        results: "asyncio.Queue[Optional[FlagImportResult]]" = asyncio.Queue()
+
+        async def feed():
+            try:
+                number = 0
+                async for raw in lines:
+                    number += 1
+                    if not raw.strip():
+                        continue
+                    try:
+                        flag_data = FeatureFlagCreate.model_validate_json(raw)
+                    except ValidationError as e:
+                        invalid = FlagImportResult(
+                            line=number, status="invalid", error=_validation_error(e)
+                        )
+                        await results.put(invalid)
+                        continue
+                    # blocks while the workers are busy, which paces reading the body
+                    await pending.put((number, flag_data))
+            finally:
+                for _ in range(self.concurrency):
+                    await pending.put(DONE)
+
+        async def work():
+            try:
+                while (item := await pending.get()) is not DONE:
+                    await results.put(await self._write(*item))
+            finally:
+                await results.put(DONE)
+
+        feeder = asyncio.create_task(feed())
+        workers = [asyncio.create_task(work()) for _ in range(self.concurrency)]
+        try:
+            running = len(workers)
+            while running:
+                result = await results.get()
+                if result is DONE:
+                    running -= 1
+                    continue
+                metrics.import_items.labels(result.status).inc()
+                yield result
+            # a body that couldn't be read to the end fails the import
+            await feeder
+        finally:
+            for task in (feeder, *workers):
+                task.cancel()
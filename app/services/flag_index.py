@@ -0,0 +1,367 @@
+"""
+Index of every flag, kept current by writes.
+Listing reads this instead of paginating all of SSM. In redis it's a hash of
+flag payloads plus two sorted sets, one lexicographic by key (prefix lookups
+are a ZRANGEBYLEX) and one scored by updated_at. Without redis it's a dict.
+A full rebuild from SSM happens when the index is missing or older than
+FLAG_INDEX_TTL, which also picks up parameters edited in SSM by hand. Keys
+written while the scan ran keep what the write put in the index.
+"""
+
+import base64
+import json
+import time
+from typing import AsyncIterator, Dict, Iterable, List, Literal, Optional, Set, Tuple
+
+from loguru import logger
+from redis.exceptions import WatchError
+
+from core import metrics
+from core.config import settings
+from core.redis_client import redis_client
+from models.feature_flag import FeatureFlag
+
+
+INDEX_KEY = "feature_flags:index"  # hash: flag key -> flag json
+INDEX_KEYS_KEY = "feature_flags:index:keys"  # zset, all scores 0, ordered by key
+INDEX_UPDATED_KEY = "feature_flags:index:updated"  # zset scored by updated_at
+INDEX_READY_KEY = "feature_flags:index:ready"  # set by a full rebuild, expires with the ttl
+INDEX_WRITES_KEY = "feature_flags:index:writes"  # hash: flag key -> writes, bumped by put/remove
+INDEX_REBUILD_KEY = "feature_flags:index:rebuilding"  # held by the replica rescanning ssm
+REBUILD_CLAIM_TTL = 300  # seconds, frees the claim if that replica dies
+FETCH_CHUNK = 500  # payloads per HMGET when filtering
+REBUILD_ATTEMPTS = 3  # swaps tried while writes keep landing
+
+SortOrder = Literal["key", "updated_at"]
+
+
+def _score(flag: FeatureFlag) -> float:
+    return flag.updated_at.timestamp() if flag.updated_at else 0.0
+
+
+def sort_key(order: SortOrder, key: str, score: float) -> Tuple:
+    # position of a flag in a listing, also what a cursor points at
+    return (-score, key) if order == "updated_at" else (key,)
+
+
+def encode_cursor(order: SortOrder, flag: FeatureFlag) -> str:
+    position = [order, *sort_key(order, flag.key, _score(flag))]
+    return base64.urlsafe_b64encode(json.dumps(position).encode()).decode().rstrip("=")
+
+
+def decode_cursor(order: SortOrder, cursor: str) -> Tuple:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        cursor_order, *position = json.loads(base64.urlsafe_b64decode(padded))
+    except Exception:
+        raise ValueError("Invalid cursor")
+    if cursor_order != order:
+        raise ValueError("Cursor was issued for a different sort order")
+    return tuple(position)
+
+
+def matches_metadata(flag: FeatureFlag, metadata: Optional[Dict[str, str]]) -> bool:
+    # query strings are text, compare the stored values as text too
+    if not metadata:
+        return True
+    stored = flag.metadata or {}
+    return all(key in stored and str(stored[key]) == value for key, value in metadata.items())
+
+
+def written_since(before: Dict[str, str], after: Dict[str, str]) -> Set[str]:
+    return {key for key in before.keys() | after.keys() if before.get(key) != after.get(key)}
+
+
+def filter_flags(
+    flags: Iterable[FeatureFlag],
+    prefix: Optional[str] = None,
+    metadata: Optional[Dict[str, str]] = None,
+    order: SortOrder = "key",
+    offset: int = 0,
+    limit: Optional[int] = None,
+    after: Optional[Tuple] = None,
+) -> List[FeatureFlag]:
+    positioned = [
+        (sort_key(order, flag.key, _score(flag)), flag)
+        for flag in flags
+        if (not prefix or flag.key.startswith(prefix)) and matches_metadata(flag, metadata)
+    ]
+    positioned.sort(key=lambda item: item[0])
+    selected = [flag for position, flag in positioned if after is None or position > after]
+    return selected[offset : offset + limit if limit is not None else None]
+
+
+class FlagIndex:
+    def __init__(self, ttl: int = settings.flag_index_ttl):
+        self.ttl = ttl
+        # only used when redis is disabled
+        self._local: Dict[str, FeatureFlag] = {}
+        self._local_writes: Dict[str, int] = {}
+        self._local_built_at: Optional[float] = None
+
+    def available(self) -> bool:
+        # redis enabled but down means there's no index to trust
+        return redis_client.get_client() is not None or not settings.redis_enabled
+
+    async def is_ready(self) -> bool:
+        client = redis_client.get_client()
+        if client is None:
+            if self._local_built_at is None:
+                return False
+            return not self.ttl or time.monotonic() - self._local_built_at < self.ttl
+
+        with metrics.redis_latency.labels("exists").time():
+            return bool(await client.exists(INDEX_READY_KEY))
+
+    async def has_entries(self) -> bool:
+        client = redis_client.get_client()
+        if client is None:
+            return bool(self._local)
+
+        with metrics.redis_latency.labels("exists").time():
+            return bool(await client.exists(INDEX_KEYS_KEY))
+
+    async def claim_rebuild(self) -> bool:
+        # one replica rescans ssm when the index expires, the rest keep reading the old one
+        client = redis_client.get_client()
+        if client is None:
+            return True
+
+        with metrics.redis_latency.labels("set").time():
+            return bool(await client.set(INDEX_REBUILD_KEY, 1, nx=True, ex=REBUILD_CLAIM_TTL))
+
+    async def release_rebuild(self):
+        client = redis_client.get_client()
+        if client is None:
+            return
+
+        try:
+            with metrics.redis_latency.labels("delete").time():
+                await client.delete(INDEX_REBUILD_KEY)
+        except Exception as e:
+            # it expires on its own
+            redis_client.record_error(e)
+            logger.error(f"Flag index claim release error: {e}")
+
+    async def writes(self) -> Dict[str, str]:
+        # write counts per key, taken before a scan so rebuild can tell what changed since
+        client = redis_client.get_client()
+        if client is None:
+            return dict(self._local_writes)
+
+        with metrics.redis_latency.labels("hgetall").time():
+            return await client.hgetall(INDEX_WRITES_KEY)
+
+    async def rebuild(self, flags: List[FeatureFlag], writes: Dict[str, str]) -> bool:
+        # flags is a scan that started when writes was taken. True if the content changed
+        client = redis_client.get_client()
+        if client is None:
+            entries = {flag.key: flag for flag in flags}
+            for key in written_since(writes, self._local_writes):
+                entries.pop(key, None)
+                if key in self._local:
+                    entries[key] = self._local[key]
+            changed = entries != self._local
+            self._local = entries
+            self._local_built_at = time.monotonic()
+            return changed
+
+        scanned = {flag.key: flag.model_dump_json() for flag in flags}
+        for _ in range(REBUILD_ATTEMPTS):
+            try:
+                async with client.pipeline(transaction=True) as pipe:
+                    # a write landing before the swap retries it, the merge would be out of date
+                    await pipe.watch(INDEX_WRITES_KEY)
+                    with metrics.redis_latency.labels("hgetall").time():
+                        live = await pipe.hgetall(INDEX_KEY)
+                        current = await pipe.hgetall(INDEX_WRITES_KEY)
+                    payloads = dict(scanned)
+                    for key in written_since(writes, current):
+                        payloads.pop(key, None)
+                        if key in live:
+                            payloads[key] = live[key]
+                    pipe.multi()
+                    self._queue_swap(pipe, payloads)
+                    with metrics.redis_latency.labels("pipeline").time():
+                        await pipe.execute()
+            except WatchError:
+                continue
+            logger.info(f"Rebuilt flag index: {len(payloads)} flags")
+            return payloads != live
+
+        # not marked ready, the next listing tries again
+        logger.warning("Flag index rebuild kept racing writes, keeping the current index")
+        return False
+
+    def _queue_swap(self, pipe, payloads: Dict[str, str]):
+        # build next to the live index and swap it in, readers never see a half-built one
+        staging = {key: f"{key}:rebuild" for key in (INDEX_KEY, INDEX_KEYS_KEY, INDEX_UPDATED_KEY)}
+        pipe.delete(*staging.values())
+        if payloads:
+            flags = [FeatureFlag.model_validate_json(payload) for payload in payloads.values()]
+            pipe.hset(staging[INDEX_KEY], mapping=payloads)
+            pipe.zadd(staging[INDEX_KEYS_KEY], {flag.key: 0 for flag in flags})
+            pipe.zadd(staging[INDEX_UPDATED_KEY], {flag.key: _score(flag) for flag in flags})
+            for live, staged in staging.items():
+                pipe.rename(staged, live)
+        else:
+            pipe.delete(*staging)
+        pipe.set(INDEX_READY_KEY, 1, ex=self.ttl or None)
+
+    @staticmethod
+    def queue_put(pipe, flag: FeatureFlag):
+        # adds the index update to a caller's transaction, writes commit it with the flag
+        pipe.hset(INDEX_KEY, flag.key, flag.model_dump_json())
+        pipe.zadd(INDEX_KEYS_KEY, {flag.key: 0})
+        pipe.zadd(INDEX_UPDATED_KEY, {flag.key: _score(flag)})
+        pipe.hincrby(INDEX_WRITES_KEY, flag.key, 1)
+
+    @staticmethod
+    def queue_remove(pipe, flag_key: str):
+        pipe.hdel(INDEX_KEY, flag_key)
+        pipe.zrem(INDEX_KEYS_KEY, flag_key)
+        pipe.zrem(INDEX_UPDATED_KEY, flag_key)
+        pipe.hincrby(INDEX_WRITES_KEY, flag_key, 1)
+
+    async def put(self, flag: FeatureFlag):
+        client = redis_client.get_client()
+        if client is None:
+            self._local[flag.key] = flag
+            self._local_writes[flag.key] = self._local_writes.get(flag.key, 0) + 1
+            return
+
+        try:
+            pipe = client.pipeline(transaction=True)
+            self.queue_put(pipe, flag)
+            with metrics.redis_latency.labels("pipeline").time():
+                await pipe.execute()
+        except Exception as e:
+            # the next rebuild brings it back in line
+            redis_client.record_error(e)
+            logger.error(f"Flag index write error: {e}")
+
+    async def remove(self, flag_key: str):
+        client = redis_client.get_client()
+        if client is None:
+            self._local.pop(flag_key, None)
+            self._local_writes[flag_key] = self._local_writes.get(flag_key, 0) + 1
+            return
+
+        try:
+            pipe = client.pipeline(transaction=True)
+            self.queue_remove(pipe, flag_key)
+            with metrics.redis_latency.labels("pipeline").time():
+                await pipe.execute()
+        except Exception as e:
+            redis_client.record_error(e)
+            logger.error(f"Flag index delete error: {e}")
+
+    async def get(self, flag_key: str) -> Optional[FeatureFlag]:
+        # single flag from the index, a last known good copy for when ssm can't answer
+        client = redis_client.get_client()
+        if client is None:
+            return self._local.get(flag_key) if self.available() else None
+
+        with metrics.redis_latency.labels("hget").time():
+            value = await client.hget(INDEX_KEY, flag_key)
+        return FeatureFlag.model_validate_json(value) if value else None
+
+    async def get_many(self, flag_keys: List[str]) -> List[FeatureFlag]:
+        # the batch version of get, whatever of flag_keys the index has
+        client = redis_client.get_client()
+        if client is None:
+            if not self.available():
+                return []
+            return [self._local[key] for key in flag_keys if key in self._local]
+        return await self._fetch(client, flag_keys)
+
+    async def _fetch(self, client, keys: List[str]) -> List[FeatureFlag]:
+        if not keys:
+            return []
+        with metrics.redis_latency.labels("hmget").time():
+            values = await client.hmget(INDEX_KEY, keys)
+        return [FeatureFlag.model_validate_json(value) for value in values if value]
+
+    async def _key_pages(
+        self, client, prefix: Optional[str], order: SortOrder, after: Optional[Tuple], size: int
+    ) -> AsyncIterator[List[str]]:
+        if order == "updated_at":
+            # scores are small, the payloads are what's worth paging
+            with metrics.redis_latency.labels("zrevrange").time():
+                scored = await client.zrevrange(INDEX_UPDATED_KEY, 0, -1, withscores=True)
+            positioned = sorted(
+                (sort_key(order, key, score), key)
+                for key, score in scored
+                if not prefix or key.startswith(prefix)
+            )
+            keys = [key for position, key in positioned if after is None or position > after]
+            for i in range(0, len(keys), size):
+                yield keys[i : i + size]
+            return
+
+        # by key the cursor is an exclusive ZRANGEBYLEX bound, each page is one call
+        low = f"({after[0]}" if after else f"[{prefix}" if prefix else "-"
+        high = f"[{prefix}\U0010ffff" if prefix else "+"
+        while True:
+            with metrics.redis_latency.labels("zrangebylex").time():
+                keys = await client.zrangebylex(INDEX_KEYS_KEY, low, high, start=0, num=size)
+            if keys:
+                yield keys
+            if len(keys) < size:
+                return
+            low = f"({keys[-1]}"
+
+    async def iter_flags(
+        self,
+        prefix: Optional[str] = None,
+        metadata: Optional[Dict[str, str]] = None,
+        order: SortOrder = "key",
+        after: Optional[Tuple] = None,
+        offset: int = 0,
+        page_size: int = FETCH_CHUNK,
+    ) -> AsyncIterator[FeatureFlag]:
+        # yields in listing order, a page of payloads at a time so memory stays flat
+        client = redis_client.get_client()
+        if client is None:
+            for flag in filter_flags(self._local.values(), prefix, metadata, order, after=after):
+                if offset:
+                    offset -= 1
+                    continue
+                yield flag
+            return
+
+        async for keys in self._key_pages(client, prefix, order, after, page_size):
+            for flag in await self._fetch(client, keys):
+                if not matches_metadata(flag, metadata):
+                    continue
+                if offset:
+                    offset -= 1
+                    continue
+                yield flag
+
+    async def query(
+        self,
+        prefix: Optional[str] = None,
+        metadata: Optional[Dict[str, str]] = None,
+        order: SortOrder = "key",
+        offset: int = 0,
+        limit: Optional[int] = None,
+        after: Optional[Tuple] = None,
+    ) -> List[FeatureFlag]:
+        flags: List[FeatureFlag] = []
+        if limit == 0:
+            return flags
+
+        # without a metadata filter the first page is all that's needed
+        page_size = FETCH_CHUNK
+        if limit is not None and not metadata:
+            page_size = min(FETCH_CHUNK, offset + limit)
+
+        async for flag in self.iter_flags(prefix, metadata, order, after, offset, page_size):
+            flags.append(flag)
+            if limit is not None and len(flags) >= limit:
+                break
+        return flags
+
+
+flag_index = FlagIndex()
@@ -0,0 +1,91 @@
+"""
+Server-sent event stream of flag changes.
+Each client gets a full snapshot and then one event per change, fed by the
+flag change bus, so SDKs can keep a local copy instead of polling.
+"""
+
+import asyncio
+from typing import AsyncIterator, Optional
+
+from loguru import logger
+
+from core.config import settings
+from core.serialization import dumps
+from models.feature_flag import FlagChangeEvent
+from services.feature_flag_service import feature_flag_service
+from services.flag_change_bus import flag_change_bus
+
+
+# queued instead of an event when the client has to start over
+RESYNC = None
+
+
+def format_event(event: str, data: str) -> str:
+    return f"event: {event}\ndata: {data}\n\n"
+
+
+class FlagStream:
+    # one per connected client
+    def __init__(
+        self,
+        keepalive: float = settings.flag_stream_keepalive,
+        queue_size: int = settings.flag_stream_queue_size,
+    ):
+        self.keepalive = keepalive
+        self._queue: "asyncio.Queue[Optional[FlagChangeEvent]]" = asyncio.Queue(queue_size)
+
+    def _resync(self):
+        # drop the backlog, a fresh snapshot replaces all of it
+        while not self._queue.empty():
+            self._queue.get_nowait()
+        self._queue.put_nowait(RESYNC)
+
+    def _on_change(self, event: FlagChangeEvent):
+        try:
+            self._queue.put_nowait(event)
+        except asyncio.QueueFull:
+            # slow client, don't let it hold an unbounded backlog
+            self._resync()
+
+    async def _snapshot(self) -> str:
+        # raises if the flags can't be read, clients replace their copy with whatever we send
+        encoded = [flag.model_dump_json() async for flag in feature_flag_service.iter_flags()]
+        return format_event("snapshot", '{"flags":[' + ",".join(encoded) + "]}")
+
+    async def _change(self, event: FlagChangeEvent) -> str:
+        flag_json = b"null"
+        if event.action != "deleted":
+            # current state when sent, a later change may already be in it
+            found = await feature_flag_service.get_flag_payload(event.key)
+            if found:
+                flag_json = found[1]
+        # the flag goes in already encoded, spliced in as the last member
+        data = dumps(event.model_dump(mode="json", exclude={"origin"}))
+        return format_event("change", (data[:-1] + b',"flag":' + flag_json + b"}").decode())
+
+    async def events(self) -> AsyncIterator[str]:
+        # subscribe before reading the snapshot so nothing falls in between,
+        # clients skip events with a version they already have. A failed first
+        # snapshot raises, a failed resync ends the stream and the client reconnects
+        flag_change_bus.add_listener(self._on_change, self._resync)
+        try:
+            yield await self._snapshot()
+            while True:
+                try:
+                    event = await asyncio.wait_for(self._queue.get(), self.keepalive)
+                except asyncio.TimeoutError:
+                    # comment line, keeps proxies from closing an idle connection
+                    yield ": keepalive\n\n"
+                    continue
+
+                if event is RESYNC:
+                    try:
+                        snapshot = await self._snapshot()
+                    except Exception as e:
+                        logger.error(f"Flag stream snapshot failed, closing the stream: {e}")
+                        return
+                    yield snapshot
+                else:
+                    yield await self._change(event)
+        finally:
+            flag_change_bus.remove_listener(self._on_change, self._resync)
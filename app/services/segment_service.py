@@ -0,0 +1,261 @@
+"""
+Segment service.
+Segments are named user sets kept in redis sets, so a flag only stores the
+segment name and membership is an O(1) SISMEMBER instead of a user list
+parsed out of every flag payload. Without redis, segments live in memory.
+"""
+
+from datetime import datetime, timezone
+from typing import Any, Dict, FrozenSet, Iterable, List, Optional, Set
+
+from loguru import logger
+
+from core import metrics
+from core.config import settings
+from core.redis_client import redis_client
+from models.segment import Segment, SegmentCreate, SegmentMembersResult
+
+
+SEGMENT_INDEX_KEY = "segments"  # hash of segment name -> metadata json
+WRITE_CHUNK = 1000  # members per SADD/SREM, keeps single commands small
+
+# bumps updated_at in place, so a touch racing a delete can't write the segment back.
+# KEYS: segment index. ARGV: name, updated_at. Returns the new json, nil if there's none
+TOUCH_SEGMENT_SCRIPT = """
+local data = redis.call('HGET', KEYS[1], ARGV[1])
+if not data then
+    return false
+end
+local segment = cjson.decode(data)
+segment['updated_at'] = ARGV[2]
+data = cjson.encode(segment)
+redis.call('HSET', KEYS[1], ARGV[1], data)
+return data
+"""
+
+
+def _members_key(name: str) -> str:
+    return f"segment:{name}:members"
+
+
+def _chunks(items: List[str], size: int = WRITE_CHUNK) -> Iterable[List[str]]:
+    for i in range(0, len(items), size):
+        yield items[i : i + size]
+
+
+class SegmentService:
+    def __init__(self):
+        # only used when redis is disabled, e.g. local development and tests
+        self._local_segments: Dict[str, Segment] = {}
+        self._local_members: Dict[str, Set[str]] = {}
+        # TOUCH_SEGMENT_SCRIPT registered on the current client
+        self._touch_script: Optional[Any] = None
+
+    def _get_client(self):
+        client = redis_client.get_client()
+        if client is None and settings.redis_enabled:
+            raise RuntimeError("Redis is not connected")
+        return client
+
+    async def create_segment(self, data: SegmentCreate) -> Segment:
+        now = datetime.now(timezone.utc)
+        segment = Segment(
+            name=data.name, description=data.description, created_at=now, updated_at=now
+        )
+        user_ids = list(dict.fromkeys(user_id for user_id in data.user_ids if user_id))
+
+        client = self._get_client()
+        if client is None:
+            if data.name in self._local_segments:
+                raise ValueError(f"Segment '{data.name}' already exists")
+            self._local_segments[data.name] = segment
+            self._local_members[data.name] = set(user_ids)
+        else:
+            with metrics.redis_latency.labels("hsetnx").time():
+                created = await client.hsetnx(
+                    SEGMENT_INDEX_KEY, data.name, segment.model_dump_json()
+                )
+            if not created:
+                raise ValueError(f"Segment '{data.name}' already exists")
+            await self._add_to_redis(client, data.name, user_ids)
+
+        segment.size = len(user_ids)
+        logger.info(f"Created segment: {data.name} ({segment.size} members)")
+        return segment
+
+    async def get_segment(self, name: str) -> Optional[Segment]:
+        client = self._get_client()
+        if client is None:
+            segment = self._local_segments.get(name)
+            if segment is None:
+                return None
+            return segment.model_copy(update={"size": len(self._local_members[name])})
+
+        pipe = client.pipeline(transaction=False)
+        pipe.hget(SEGMENT_INDEX_KEY, name)
+        pipe.scard(_members_key(name))
+        with metrics.redis_latency.labels("pipeline").time():
+            data, size = await pipe.execute()
+        if not data:
+            return None
+        return Segment.model_validate_json(data).model_copy(update={"size": size})
+
+    async def list_segments(self) -> List[Segment]:
+        client = self._get_client()
+        if client is None:
+            return [
+                segment.model_copy(update={"size": len(self._local_members[name])})
+                for name, segment in self._local_segments.items()
+            ]
+
+        with metrics.redis_latency.labels("hgetall").time():
+            stored = await client.hgetall(SEGMENT_INDEX_KEY)
+        if not stored:
+            return []
+
+        names = list(stored)
+        pipe = client.pipeline(transaction=False)
+        for name in names:
+            pipe.scard(_members_key(name))
+        with metrics.redis_latency.labels("pipeline").time():
+            sizes = await pipe.execute()
+
+        return [
+            Segment.model_validate_json(stored[name]).model_copy(update={"size": size})
+            for name, size in zip(names, sizes)
+        ]
+
+    async def delete_segment(self, name: str) -> bool:
+        client = self._get_client()
+        if client is None:
+            self._local_members.pop(name, None)
+            deleted = self._local_segments.pop(name, None) is not None
+        else:
+            pipe = client.pipeline(transaction=True)
+            pipe.hdel(SEGMENT_INDEX_KEY, name)
+            pipe.delete(_members_key(name))
+            with metrics.redis_latency.labels("pipeline").time():
+                removed, _ = await pipe.execute()
+            deleted = bool(removed)
+
+        if deleted:
+            logger.info(f"Deleted segment: {name}")
+        return deleted
+
+    async def _add_to_redis(self, client, name: str, user_ids: List[str]) -> int:
+        added = 0
+        for chunk in _chunks(user_ids):
+            with metrics.redis_latency.labels("sadd").time():
+                added += await client.sadd(_members_key(name), *chunk)
+        return added
+
+    async def _touch(self, client, name: str) -> Optional[Segment]:
+        # bumps updated_at, returns None if the segment doesn't exist
+        if client is None:
+            segment = self._local_segments.get(name)
+            if segment is not None:
+                segment = segment.model_copy(update={"updated_at": datetime.now(timezone.utc)})
+                self._local_segments[name] = segment
+            return segment
+
+        if self._touch_script is None or self._touch_script.registered_client is not client:
+            self._touch_script = client.register_script(TOUCH_SEGMENT_SCRIPT)
+        now = datetime.now(timezone.utc).isoformat()
+        with metrics.redis_latency.labels("evalsha").time():
+            data = await self._touch_script(keys=[SEGMENT_INDEX_KEY], args=[name, now])
+        return Segment.model_validate_json(data) if data else None
+
+    async def add_members(self, name: str, user_ids: List[str]) -> Optional[SegmentMembersResult]:
+        client = self._get_client()
+        if await self._touch(client, name) is None:
+            return None
+
+        user_ids = [user_id for user_id in user_ids if user_id]
+        if client is None:
+            members = self._local_members[name]
+            before = len(members)
+            members.update(user_ids)
+            changed, size = len(members) - before, len(members)
+        else:
+            changed = await self._add_to_redis(client, name, user_ids)
+            with metrics.redis_latency.labels("scard").time():
+                size = await client.scard(_members_key(name))
+
+        logger.info(f"Added {changed} members to segment: {name}")
+        return SegmentMembersResult(name=name, changed=changed, size=size)
+
+    async def remove_members(
+        self, name: str, user_ids: List[str]
+    ) -> Optional[SegmentMembersResult]:
+        client = self._get_client()
+        if await self._touch(client, name) is None:
+            return None
+
+        if client is None:
+            members = self._local_members[name]
+            before = len(members)
+            members.difference_update(user_ids)
+            changed, size = before - len(members), len(members)
+        else:
+            changed = 0
+            for chunk in _chunks(user_ids):
+                with metrics.redis_latency.labels("srem").time():
+                    changed += await client.srem(_members_key(name), *chunk)
+            with metrics.redis_latency.labels("scard").time():
+                size = await client.scard(_members_key(name))
+
+        logger.info(f"Removed {changed} members from segment: {name}")
+        return SegmentMembersResult(name=name, changed=changed, size=size)
+
+    async def is_member(self, name: str, user_id: str) -> bool:
+        return name in await self.memberships((name,), user_id)
+
+    async def memberships(self, names: Iterable[str], user_id: str) -> FrozenSet[str]:
+        # which of these segments the user is in, one round-trip for all of them.
+        # evaluation fails closed, a redis error means "not a member"
+        names = list(names)
+        if not names or not user_id:
+            return frozenset()
+
+        try:
+            client = self._get_client()
+            if client is None:
+                return frozenset(
+                    name for name in names if user_id in self._local_members.get(name, ())
+                )
+
+            pipe = client.pipeline(transaction=False)
+            for name in names:
+                pipe.sismember(_members_key(name), user_id)
+            with metrics.redis_latency.labels("pipeline").time():
+                found = await pipe.execute()
+            return frozenset(name for name, member in zip(names, found) if member)
+        except Exception as e:
+            redis_client.record_error(e)
+            logger.error(f"Segment membership check failed: {e}")
+            return frozenset()
+
+    async def contains_many(self, name: str, user_ids: List[Optional[str]]) -> List[bool]:
+        # membership of a whole column of users in one SMISMEMBER, used by batch evaluation
+        present = [user_id for user_id in user_ids if user_id]
+        if not present:
+            return [False] * len(user_ids)
+
+        try:
+            client = self._get_client()
+            if client is None:
+                members = self._local_members.get(name, set())
+                return [bool(user_id) and user_id in members for user_id in user_ids]
+
+            with metrics.redis_latency.labels("smismember").time():
+                found = await client.smismember(_members_key(name), present)
+        except Exception as e:
+            redis_client.record_error(e)
+            logger.error(f"Segment membership check failed: {e}")
+            return [False] * len(user_ids)
+
+        results = iter(found)
+        return [bool(next(results)) if user_id else False for user_id in user_ids]
+
+
+segment_service = SegmentService()
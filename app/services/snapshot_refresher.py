@@ -0,0 +1,62 @@
+"""
+Background refresh of the flag snapshot.
+Reloads every flag from the flag index on an interval so steady-state reads
+never wait on Redis or SSM. Until the full SSM load has succeeded once it is
+retried instead, after that SSM is scanned when the index is due for a rebuild.
+"""
+
+import asyncio
+import random
+from typing import Optional
+from loguru import logger
+
+from core.config import settings
+from services.feature_flag_service import feature_flag_service
+
+
+class SnapshotRefresher:
+    def __init__(self, interval: float, jitter: float):
+        self.interval = interval
+        self.jitter = jitter
+        self._task: Optional[asyncio.Task] = None
+
+    def _next_delay(self) -> float:
+        # jitter spreads replicas out so they don't all hit redis at the same moment
+        spread = self.interval * self.jitter
+        return max(0.0, self.interval + random.uniform(-spread, spread))
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self._next_delay())
+            try:
+                if feature_flag_service.snapshot_loaded:
+                    await feature_flag_service.refresh_snapshot()
+                else:
+                    # the warm-up failed or timed out, keep at it, readiness waits on this
+                    await feature_flag_service.load_snapshot()
+            except Exception as e:
+                logger.error(f"Snapshot refresh failed: {e}")
+
+    def start(self):
+        if self.interval <= 0 or self._task:
+            return
+
+        self._task = asyncio.create_task(self._run())
+        logger.info(f"Snapshot refresher started, every ~{self.interval}s")
+
+    async def stop(self):
+        if not self._task:
+            return
+
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+        logger.info("Snapshot refresher stopped")
+
+
+snapshot_refresher = SnapshotRefresher(
+    interval=settings.snapshot_refresh_interval, jitter=settings.snapshot_refresh_jitter
+)
@@ -0,0 +1,290 @@
+"""
+Custom targeting rules for RolloutStrategy.CUSTOM.
+custom_rules is compiled once per flag version into plain predicates, with
+regexes, sets, numbers and semvers parsed up front, so evaluating a context
+is just a few function calls.
+
+custom_rules format:
+
+    {
+      "rules": [
+        {
+          "name": "beta_in_us",
+          "conditions": {"all": [
+            {"attribute": "country", "op": "in", "value": ["US", "CA"]},
+            {"any": [
+              {"attribute": "plan", "op": "eq", "value": "premium"},
+              {"attribute": "app_version", "op": "semver_gte", "value": "2.4.0"}
+            ]}
+          ]},
+          "percentage": 50
+        }
+      ],
+      "default": false
+    }
+
+Rules are tried in order. The first rule whose conditions match and whose
+percentage (if any) includes the user decides the result.
+"""
+
+import re
+from typing import Any, Callable, Dict, FrozenSet, List, Optional, Tuple
+
+from services.bucketing import BUCKETS, Bucketer
+
+
+# (user_id, context) -> matched
+Predicate = Callable[[Optional[str], Dict[str, Any]], bool]
+# (enabled, matched_rule)
+Outcome = Tuple[bool, str]
+
+# context key the service fills with the segments the user belongs to
+SEGMENTS_KEY = "$segments"
+
+
+class InvalidRuleError(ValueError):
+    pass
+
+
+def _require(condition: bool, message: str):
+    if not condition:
+        raise InvalidRuleError(message)
+
+
+def _prerelease_key(prerelease: str) -> Tuple:
+    # per dot-separated identifier: numeric ones compare as ints and before alphanumeric
+    # ones, which compare by their digit runs as ints too, so rc.2 < rc.10 and rc2 < rc10
+    key = []
+    for identifier in prerelease.split("."):
+        if identifier.isdigit():
+            key.append((0, int(identifier)))
+        else:
+            runs = re.findall(r"\d+|\D+", identifier)
+            key.append((1, tuple((0, int(run)) if run.isdigit() else (1, run) for run in runs)))
+    return tuple(key)
+
+
+def _parse_semver(value: Any) -> Optional[Tuple]:
+    # (major, minor, patch, is_release, prerelease), so 1.0.0-rc1 < 1.0.0
+    match = re.match(r"^v?(\d+)(?:\.(\d+))?(?:\.(\d+))?(?:-([0-9A-Za-z.-]+))?", str(value))
+    if not match:
+        return None
+    major, minor, patch, prerelease = match.groups()
+    key = _prerelease_key(prerelease) if prerelease else ()
+    return (int(major), int(minor or 0), int(patch or 0), prerelease is None, key)
+
+
+def _to_number(value: Any) -> Optional[float]:
+    if isinstance(value, bool):
+        return None
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _getter(attribute: str) -> Callable[[Optional[str], Dict[str, Any]], Any]:
+    if attribute == "user_id":
+        return lambda user_id, context: context.get("user_id", user_id)
+    return lambda user_id, context: context.get(attribute)
+
+
+def _compile_leaf(condition: Dict[str, Any]) -> Predicate:
+    attribute = condition.get("attribute")
+    op = condition.get("op")
+    value = condition.get("value")
+
+    # membership is resolved by the service, no attribute involved
+    if op == "in_segment":
+        _require(isinstance(value, str) and value, "'in_segment' needs a segment name")
+        return lambda user_id, context: value in context.get(SEGMENTS_KEY, ())
+
+    _require(isinstance(attribute, str) and attribute, f"condition needs an attribute: {condition}")
+    get = _getter(attribute)
+
+    if op == "exists":
+        return lambda user_id, context: get(user_id, context) is not None
+
+    if op in ("eq", "neq"):
+        negate = op == "neq"
+        return lambda user_id, context: (get(user_id, context) == value) is not negate
+
+    if op in ("in", "not_in"):
+        _require(isinstance(value, list), f"'{op}' needs a list value")
+        try:
+            members = frozenset(value)
+        except TypeError:
+            raise InvalidRuleError(f"'{op}' values must be scalars")
+        negate = op == "not_in"
+
+        def in_set(user_id, context):
+            actual = get(user_id, context)
+            try:
+                return (actual in members) is not negate
+            except TypeError:
+                return negate
+
+        return in_set
+
+    if op in ("contains", "starts_with", "ends_with"):
+        _require(isinstance(value, str), f"'{op}' needs a string value")
+        method = _STRING_OPS[op]
+
+        def string_match(user_id, context):
+            actual = get(user_id, context)
+            return isinstance(actual, str) and method(actual, value)
+
+        return string_match
+
+    if op == "regex":
+        _require(isinstance(value, str), "'regex' needs a string pattern")
+        try:
+            search = re.compile(value).search
+        except re.error as e:
+            raise InvalidRuleError(f"invalid regex {value!r}: {e}")
+
+        def regex_match(user_id, context):
+            actual = get(user_id, context)
+            return actual is not None and search(str(actual)) is not None
+
+        return regex_match
+
+    if op in ("gt", "gte", "lt", "lte"):
+        target = _to_number(value)
+        _require(target is not None, f"'{op}' needs a numeric value")
+        compare = _COMPARATORS[op]
+
+        def numeric(user_id, context):
+            actual = _to_number(get(user_id, context))
+            return actual is not None and compare(actual, target)
+
+        return numeric
+
+    if op == "between":
+        _require(isinstance(value, list) and len(value) == 2, "'between' needs [low, high]")
+        low, high = _to_number(value[0]), _to_number(value[1])
+        _require(low is not None and high is not None, "'between' bounds must be numeric")
+
+        def between(user_id, context):
+            actual = _to_number(get(user_id, context))
+            return actual is not None and low <= actual <= high
+
+        return between
+
+    if op in ("semver_eq", "semver_gt", "semver_gte", "semver_lt", "semver_lte"):
+        target = _parse_semver(value)
+        _require(target is not None, f"'{op}' needs a version like 1.2.3")
+        compare = _COMPARATORS[op.split("_", 1)[1]]
+
+        def semver(user_id, context):
+            actual = get(user_id, context)
+            parsed = _parse_semver(actual) if actual is not None else None
+            return parsed is not None and compare(parsed, target)
+
+        return semver
+
+    raise InvalidRuleError(f"unknown operator: {op!r}")
+
+
+_COMPARATORS = {
+    "eq": lambda a, b: a == b,
+    "gt": lambda a, b: a > b,
+    "gte": lambda a, b: a >= b,
+    "lt": lambda a, b: a < b,
+    "lte": lambda a, b: a <= b,
+}
+
+_STRING_OPS = {
+    "contains": str.__contains__,
+    "starts_with": str.startswith,
+    "ends_with": str.endswith,
+}
+
+
+def compile_condition(condition: Any) -> Predicate:
+    # a bare list means "all of these"
+    if isinstance(condition, list):
+        condition = {"all": condition}
+    _require(isinstance(condition, dict), f"condition must be an object: {condition!r}")
+
+    if "all" in condition or "any" in condition:
+        group = "all" if "all" in condition else "any"
+        parts = condition[group]
+        _require(isinstance(parts, list) and parts, f"'{group}' needs a non-empty list")
+        predicates = tuple(compile_condition(part) for part in parts)
+        if len(predicates) == 1:
+            return predicates[0]
+        if group == "all":
+            return lambda user_id, context: all(p(user_id, context) for p in predicates)
+        return lambda user_id, context: any(p(user_id, context) for p in predicates)
+
+    if "not" in condition:
+        inner = compile_condition(condition["not"])
+        return lambda user_id, context: not inner(user_id, context)
+
+    return _compile_leaf(condition)
+
+
+def referenced_segments(custom_rules: Any) -> FrozenSet[str]:
+    # segments used by in_segment conditions, so membership can be looked up before evaluating
+    found = set()
+    stack = [custom_rules]
+    while stack:
+        node = stack.pop()
+        if isinstance(node, list):
+            stack.extend(node)
+        elif isinstance(node, dict):
+            if node.get("op") == "in_segment" and isinstance(node.get("value"), str):
+                found.add(node["value"])
+            stack.extend(value for value in node.values() if isinstance(value, (list, dict)))
+    return frozenset(found)
+
+
+def _rule_threshold(rule: Dict[str, Any]) -> Optional[int]:
+    if rule.get("basis_points") is not None:
+        threshold = rule["basis_points"]
+        _require(isinstance(threshold, int) and 0 <= threshold <= BUCKETS, "bad basis_points")
+        return threshold
+    if rule.get("percentage") is not None:
+        percentage = rule["percentage"]
+        _require(isinstance(percentage, int) and 0 <= percentage <= 100, "bad percentage")
+        return percentage * 100
+    return None
+
+
+def compile_custom_rules(
+    custom_rules: Optional[Dict[str, Any]], bucket: Bucketer
+) -> Callable[[Optional[str], Optional[Dict[str, Any]]], Outcome]:
+    _require(isinstance(custom_rules, dict), "custom strategy needs custom_rules")
+    rules = custom_rules.get("rules")
+    _require(isinstance(rules, list), "custom_rules.rules must be a list")
+
+    default = custom_rules.get("default", False)
+    _require(isinstance(default, bool), "custom_rules.default must be true or false")
+    default_outcome: Outcome = (default, "custom_default")
+
+    compiled: List[Tuple[Predicate, Optional[int], Outcome]] = []
+    for i, rule in enumerate(rules):
+        _require(isinstance(rule, dict), f"rule {i} must be an object")
+        name = rule.get("name") or f"rule_{i}"
+        enabled = rule.get("enabled", True)
+        _require(isinstance(enabled, bool), f"rule {name}: enabled must be true or false")
+        _require("conditions" in rule, f"rule {name} has no conditions")
+        predicate = compile_condition(rule["conditions"])
+        compiled.append((predicate, _rule_threshold(rule), (enabled, f"custom:{name}")))
+
+    plan = tuple(compiled)
+    empty: Dict[str, Any] = {}
+
+    def evaluate(user_id, context=None):
+        context = context or empty
+        for predicate, threshold, outcome in plan:
+            if not predicate(user_id, context):
+                continue
+            if threshold is None:
+                return outcome
+            if user_id and bucket(user_id) < threshold:
+                return outcome
+        return default_outcome
+
+    return evaluate
@@ -0,0 +1,56 @@
+"""
+Percentage bucketing tests.
+"""
+
+import hashlib
+from collections import Counter
+
+from models.feature_flag import BucketingHash, FeatureFlag, FeatureFlagRule, RolloutStrategy
+from services.bucketing import BUCKETS, bucket_many, get_bucketer
+from services.flag_evaluator import compile_flag
+
+
+def test_md5_buckets_keep_legacy_percent():
+    """Test md5 buckets keep every user's legacy whole-percent assignment."""
+    bucket = get_bucketer("legacy_flag", BucketingHash.MD5)
+
+    for i in range(500):
+        user_id = f"user{i}"
+        legacy = int(hashlib.md5(f"legacy_flag:{user_id}".encode()).hexdigest(), 16) % 100
+        assert bucket(user_id) // 100 == legacy
+
+
+def test_crc32_buckets_are_spread_evenly():
+    """Test the fast hash spreads users evenly across the range."""
+    bucket = get_bucketer("fast_flag", BucketingHash.CRC32)
+    counts = Counter(bucket(f"user{i}") * 10 // BUCKETS for i in range(50000))
+
+    assert set(counts) == set(range(10))
+    assert all(4500 < count < 5500 for count in counts.values())
+
+
+def test_bucket_many_matches_single_calls():
+    """Test the batch path agrees with per-user bucketing."""
+    bucket = get_bucketer("batch_flag", BucketingHash.CRC32)
+    user_ids = [f"user{i}" for i in range(100)] + [None]
+
+    assert bucket_many(bucket, user_ids) == [bucket(u) for u in user_ids[:-1]] + [BUCKETS]
+
+
+def test_basis_point_rollout():
+    """Test basis-point rollouts and batch evaluation agree."""
+    flag = FeatureFlag(
+        key="bp_flag",
+        rules=FeatureFlagRule(
+            strategy=RolloutStrategy.PERCENTAGE, basis_points=1250, bucketing=BucketingHash.CRC32
+        ),
+    )
+    compiled = compile_flag(flag)
+    user_ids = [f"user{i}" for i in range(20000)]
+
+    outcomes = compiled.evaluate_many(user_ids, [None] * len(user_ids))
+    assert outcomes == [compiled.evaluate(u, None) for u in user_ids]
+
+    enabled = sum(1 for enabled, _ in outcomes if enabled)
+    assert 2200 < enabled < 2800
+    assert outcomes[0][1] in ("percentage_bp_1250", "percentage_not_matched")
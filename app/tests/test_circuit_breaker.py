@@ -0,0 +1,211 @@
+"""
+Circuit breaker and degraded backend tests.
+"""
+
+import asyncio
+import threading
+import time
+
+import pytest
+
+from core.circuit_breaker import CLOSED, HALF_OPEN, OPEN, CircuitBreaker, CircuitOpenError
+from core.redis_client import redis_client
+from core.ssm_client import SSMClient, ssm_batch_loader, ssm_client
+from models.feature_flag import BatchEvaluationUser, FeatureFlag, FeatureFlagCreate, FeatureFlagRule
+from services.feature_flag_service import feature_flag_service
+from services.flag_cache import LocalFlagCache
+from services.flag_evaluator import UNAVAILABLE
+from services.flag_index import flag_index
+
+
+def test_breaker_opens_after_threshold_and_probes():
+    """Test N failures in the window open the circuit and one probe decides recovery."""
+    breaker = CircuitBreaker("test", threshold=3, window=30, reset_timeout=10)
+    for _ in range(2):
+        breaker.record_failure()
+    assert breaker.allow() and breaker.state == CLOSED
+
+    breaker.record_failure()
+    assert breaker.state == OPEN
+    assert breaker.allow() is False
+
+    breaker._opened_at = time.monotonic() - 11
+    assert breaker.allow() is True
+    assert breaker.state == HALF_OPEN
+    assert breaker.allow() is False
+
+    breaker.record_failure()
+    assert breaker.state == OPEN
+
+    breaker._opened_at = time.monotonic() - 11
+    breaker.allow()
+    breaker.record_success()
+    assert breaker.state == CLOSED
+
+
+def test_breaker_forgets_old_failures():
+    """Test failures outside the window don't add up."""
+    breaker = CircuitBreaker("test", threshold=2, window=30, reset_timeout=10)
+    breaker.record_failure()
+    breaker._failures[0] -= 31
+    breaker.record_failure()
+    assert breaker.state == CLOSED
+
+
+async def test_ssm_fails_fast_when_open():
+    """Test an open SSM circuit raises without touching the pool."""
+    client = SSMClient()
+    client.breaker = CircuitBreaker("ssm", threshold=1, window=30, reset_timeout=60)
+    client.breaker.record_failure()
+
+    def never_called():
+        raise AssertionError("called SSM with the circuit open")
+
+    with pytest.raises(CircuitOpenError):
+        await client._run("get", never_called)
+
+
+async def test_cancelled_probe_reopens_the_circuit():
+    """Test a half-open probe cancelled mid-call counts as a failure instead of hanging."""
+    client = SSMClient()
+    client.breaker = CircuitBreaker("ssm", threshold=1, window=30, reset_timeout=10)
+    client.breaker.record_failure()
+    client.breaker._opened_at = time.monotonic() - 11
+    released = threading.Event()
+
+    probe = asyncio.create_task(client._run("get", released.wait, 5))
+    await asyncio.sleep(0.01)
+    assert client.breaker.state == HALF_OPEN
+    probe.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await probe
+    released.set()
+
+    # open again, so the next probe is allowed once the reset timeout passes
+    assert client.breaker.state == OPEN
+    client.breaker._opened_at = time.monotonic() - 11
+    assert await client._run("get", lambda: "ok") == "ok"
+    assert client.breaker.state == CLOSED
+
+
+class FlakyRedis:
+    def __init__(self):
+        self.up = False
+
+    async def ping(self):
+        if not self.up:
+            raise ConnectionError("connection refused")
+        return True
+
+
+async def test_redis_circuit_hides_client_until_ping_recovers(monkeypatch):
+    """Test connection errors open the redis circuit and the monitor's probe closes it."""
+    flaky = FlakyRedis()
+    monkeypatch.setattr(redis_client, "_client", flaky)
+    monkeypatch.setattr(redis_client, "_connected", True)
+    # stands in for a running monitor, _check is driven by hand below
+    monkeypatch.setattr(redis_client, "_monitor", object())
+    monkeypatch.setattr(
+        redis_client, "breaker", CircuitBreaker("redis", threshold=2, window=30, reset_timeout=0)
+    )
+
+    assert redis_client.get_client() is flaky
+    redis_client.record_error(ValueError("bad payload"))
+    assert redis_client.get_client() is flaky
+
+    redis_client.record_error(ConnectionError("reset"))
+    redis_client.record_error(TimeoutError("timed out"))
+    assert redis_client.get_client() is None
+
+    await redis_client._check()
+    assert redis_client.breaker.state == OPEN
+
+    flaky.up = True
+    await redis_client._check()
+    assert redis_client.get_client() is flaky
+
+
+async def test_redis_circuit_recovers_without_the_monitor(monkeypatch):
+    """Test the request path probes an open redis circuit when no monitor runs."""
+    flaky = FlakyRedis()
+    monkeypatch.setattr(redis_client, "_client", flaky)
+    monkeypatch.setattr(redis_client, "_connected", True)
+    monkeypatch.setattr(redis_client, "_monitor", None)
+    monkeypatch.setattr(
+        redis_client, "breaker", CircuitBreaker("redis", threshold=1, window=30, reset_timeout=0)
+    )
+
+    redis_client.record_error(ConnectionError("reset"))
+    assert redis_client.get_client() is None
+    await redis_client._probe_task
+    assert redis_client.breaker.state == OPEN
+
+    flaky.up = True
+    assert redis_client.get_client() is None
+    await redis_client._probe_task
+    assert redis_client.get_client() is flaky
+
+
+async def test_batch_lookup_failure_is_unavailable(monkeypatch):
+    """Test keys a failed GetParameters couldn't answer fall back to the index or unavailable."""
+
+    async def get_parameters(names, decrypt=False, strict=False):
+        raise ConnectionError("connection reset")
+
+    monkeypatch.setattr(ssm_client, "is_enabled", lambda: True)
+    monkeypatch.setattr(ssm_client, "is_configured", lambda: True)
+    monkeypatch.setattr(ssm_client, "get_parameters", get_parameters)
+    monkeypatch.setitem(flag_index._local, "batch_indexed", FeatureFlag(key="batch_indexed"))
+
+    result = await feature_flag_service.evaluate_flags(
+        ["batch_indexed", "batch_lost"], [BatchEvaluationUser(user_id="u1")]
+    )
+    assert result.outcome(0, "batch_indexed") == (True, "all")
+    assert result.outcome(0, "batch_lost") == UNAVAILABLE
+    # nothing was remembered as missing, the next lookup asks again
+    assert not feature_flag_service._local_cache.is_missing("batch_lost")
+
+
+def test_local_cache_keeps_stale_entries():
+    """Test expired entries are only handed out on request, until the stale window ends."""
+    cache = LocalFlagCache(ttl=60, max_size=10, stale_ttl=30)
+    cache.put(FeatureFlag(key="stale_flag"))
+    cache._entries["stale_flag"].expires_at = time.monotonic() - 1
+
+    assert cache.get("stale_flag") is None
+    assert cache.get("stale_flag", stale=True).key == "stale_flag"
+
+    cache._entries["stale_flag"].expires_at = time.monotonic() - 31
+    assert cache.get("stale_flag", stale=True) is None
+    assert len(cache) == 0
+
+
+async def test_stale_flag_served_while_ssm_is_down(monkeypatch):
+    """Test an expired flag keeps serving and failed lookups aren't reported as not found."""
+
+    async def failing_load(name):
+        raise RuntimeError("throttled")
+
+    monkeypatch.setattr(ssm_client, "is_enabled", lambda: True)
+    monkeypatch.setattr(ssm_batch_loader, "load", failing_load)
+    monkeypatch.setattr(ssm_client, "_enabled", True)
+
+    await feature_flag_service.create_flag(
+        FeatureFlagCreate(key="stale_service_flag", rules=FeatureFlagRule())
+    )
+    feature_flag_service._local_cache._entries["stale_service_flag"].expires_at = (
+        time.monotonic() - 1
+    )
+
+    result = await feature_flag_service.evaluate_flag("stale_service_flag", "u1")
+    assert (result.enabled, result.source) == (True, "stale")
+    await asyncio.sleep(0)
+    assert feature_flag_service._local_cache.get("stale_service_flag", stale=True)
+
+    # never seen and ssm failing: the index copy, and without one "unavailable", not "not_found"
+    feature_flag_service._local_cache.invalidate("stale_service_flag")
+    result = await feature_flag_service.evaluate_flag("stale_service_flag", "u1")
+    assert (result.enabled, result.source) == (True, "stale")
+
+    result = await feature_flag_service.evaluate_flag("stale_unknown_flag", "u1")
+    assert (result.matched_rule, result.source) == ("unavailable", "error")
@@ -0,0 +1,65 @@
+"""
+Evaluation memo tests.
+"""
+
+from models.feature_flag import FeatureFlag, FeatureFlagCreate, FeatureFlagRule, FeatureFlagUpdate
+from services.evaluation_memo import EvaluationMemo, context_key
+from services.feature_flag_service import feature_flag_service
+from services.flag_evaluator import compile_flag
+
+
+async def test_repeat_evaluations_are_memoized_per_version():
+    """Test a repeat evaluation returns the memoized result until the flag changes."""
+    await feature_flag_service.create_flag(
+        FeatureFlagCreate(
+            key="memo_flag", rules=FeatureFlagRule(strategy="percentage", percentage=100)
+        )
+    )
+    memo = feature_flag_service._memo
+    hits = memo.hits
+
+    first = await feature_flag_service.evaluate_flag("memo_flag", "memo_user")
+    assert await feature_flag_service.evaluate_flag("memo_flag", "memo_user") is first
+    assert memo.hits == hits + 1
+    assert 0 < memo.hit_rate <= 1
+
+    await feature_flag_service.update_flag("memo_flag", FeatureFlagUpdate(enabled=False))
+    result = await feature_flag_service.evaluate_flag("memo_flag", "memo_user")
+    assert (result.enabled, result.matched_rule) == (False, "disabled")
+
+
+def test_memo_keys():
+    """Test context only keys targeting plans, and segment plans are never memoized."""
+    memo = EvaluationMemo(max_size=10)
+    percentage = compile_flag(FeatureFlag(key="p", rules=FeatureFlagRule(strategy="percentage")))
+    custom = compile_flag(
+        FeatureFlag(key="c", rules=FeatureFlagRule(strategy="custom", custom_rules={"rules": []}))
+    )
+    segment = compile_flag(
+        FeatureFlag(key="s", rules=FeatureFlagRule(strategy="segment", segments=["beta"]))
+    )
+
+    assert memo.key(percentage, "u", {"country": "US"}) == memo.key(percentage, "u", None)
+    assert memo.key(custom, "u", {"country": "US"}) != memo.key(custom, "u", {"country": "DE"})
+    assert memo.key(custom, "u", {"tags": ["a"]}) is None
+    assert memo.key(segment, "u", None) is None
+    assert context_key({"n": 1}) != context_key({"n": True})
+    assert EvaluationMemo(max_size=0).key(percentage, "u", None) is None
+
+
+def test_memo_is_bounded_and_checks_the_plan():
+    """Test least recently used entries go first and a new plan never hits an old entry."""
+    memo = EvaluationMemo(max_size=2)
+    old = compile_flag(FeatureFlag(key="f", version=1))
+    new = compile_flag(FeatureFlag(key="f", version=2))
+    counter = object()
+
+    memo.put(("f", "a"), old, "result_a", counter)
+    memo.put(("f", "b"), old, "result_b", counter)
+    memo.get(("f", "a"), old)
+    memo.put(("f", "c"), old, "result_c", counter)
+
+    assert memo.get(("f", "b"), old) is None
+    assert memo.get(("f", "a"), old) == ("result_a", counter)
+    assert memo.get(("f", "a"), new) is None
+    assert len(memo) == 2
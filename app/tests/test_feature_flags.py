@@ -96,4 +96,246 @@ def test_percentage_rollout_consistency():
         results.append(response.json()["enabled"])
     
     # All results should be the same (consistent)
-    assert len(set(results)) == 1, "Flag evaluation should be consistent for same user"
\ No newline at end of file
+    assert len(set(results)) == 1, "Flag evaluation should be consistent for same user"
+
+
+def test_batch_evaluate_flags():
+    """Test evaluating several flags for several users in one request."""
+    from main import app
+    client = TestClient(app)
+
+    flag_data = {
+        "key": "batch_user_list_flag",
+        "enabled": True,
+        "rules": {"strategy": "user_list", "user_ids": ["batch_user_1"]}
+    }
+    assert client.post("/api/v1/flags", json=flag_data).status_code == 201
+
+    response = client.post("/api/v1/flags/evaluate/batch", json={
+        "flags": ["batch_user_list_flag", "batch_missing_flag"],
+        "users": [{"user_id": "batch_user_1"}, {"user_id": "batch_user_2"}]
+    })
+    assert response.status_code == 200
+
+    results = response.json()["results"]
+    assert [r["user_id"] for r in results] == ["batch_user_1", "batch_user_2"]
+    assert results[0]["flags"]["batch_user_list_flag"] == {"enabled": True, "matched_rule": "user_list"}
+    assert results[1]["flags"]["batch_user_list_flag"]["enabled"] is False
+    assert results[0]["flags"]["batch_missing_flag"]["matched_rule"] == "not_found"
+
+
+async def test_service_evaluates_concurrently():
+    """Test the async service API can keep many evaluations in flight."""
+    import asyncio
+    from models.feature_flag import FeatureFlagCreate, FeatureFlagRule
+    from services.feature_flag_service import feature_flag_service
+
+    await feature_flag_service.create_flag(
+        FeatureFlagCreate(key="async_flag_test", rules=FeatureFlagRule())
+    )
+
+    results = await asyncio.gather(
+        *(feature_flag_service.evaluate_flag("async_flag_test", f"user{i}") for i in range(20))
+    )
+    assert all(result.enabled for result in results)
+    assert {result.matched_rule for result in results} == {"all"}
+
+
+def test_conditional_get_flag():
+    """Test ETag and Last-Modified on a flag, and 304 once it's unchanged."""
+    from main import app
+
+    client = TestClient(app)
+
+    client.post("/api/v1/flags", json={"key": "etag_flag", "rules": {"strategy": "all"}})
+    response = client.get("/api/v1/flags/etag_flag")
+    etag = response.headers["etag"]
+    assert response.headers["last-modified"]
+
+    response = client.get("/api/v1/flags/etag_flag", headers={"If-None-Match": etag})
+    assert response.status_code == 304
+    assert response.content == b""
+
+    client.put("/api/v1/flags/etag_flag", json={"enabled": False})
+    response = client.get("/api/v1/flags/etag_flag", headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.headers["etag"] != etag
+
+
+def test_conditional_list_flags():
+    """Test the flag list ETag follows the config version."""
+    from main import app
+
+    client = TestClient(app)
+
+    etag = client.get("/api/v1/flags").headers["etag"]
+    assert client.get("/api/v1/flags", headers={"If-None-Match": etag}).status_code == 304
+
+    client.post("/api/v1/flags", json={"key": "etag_list_flag", "rules": {"strategy": "all"}})
+    response = client.get("/api/v1/flags", headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.headers["etag"] != etag
+
+
+def test_list_flags_filters_and_pages():
+    """Test listing by prefix, metadata and page from the flag index."""
+    from main import app
+
+    client = TestClient(app)
+
+    for i, team in enumerate(["search", "checkout", "search"]):
+        client.post(
+            "/api/v1/flags",
+            json={
+                "key": f"indexed_{i}",
+                "rules": {"strategy": "all"},
+                "metadata": {"team": team},
+            },
+        )
+    client.delete("/api/v1/flags/indexed_1")
+
+    keys = [flag["key"] for flag in client.get("/api/v1/flags?prefix=indexed_").json()]
+    assert keys == ["indexed_0", "indexed_2"]
+
+    response = client.get("/api/v1/flags?prefix=indexed_&metadata.team=search&limit=1&offset=1")
+    assert [flag["key"] for flag in response.json()] == ["indexed_2"]
+
+    response = client.get("/api/v1/flags?prefix=indexed_&sort=updated_at")
+    assert [flag["key"] for flag in response.json()] == ["indexed_2", "indexed_0"]
+
+
+async def test_index_rebuild_keeps_writes_made_during_the_scan(monkeypatch):
+    """Test a rebuild doesn't revive a flag deleted mid-scan and changes the list ETag."""
+    from core.ssm_client import ssm_client
+    from models.feature_flag import FeatureFlagCreate, FeatureFlagRule
+    from services.config_version import config_version
+    from services.feature_flag_service import feature_flag_service
+    from services.flag_index import flag_index
+
+    monkeypatch.setattr(flag_index, "_local", dict(flag_index._local))
+    monkeypatch.setattr(flag_index, "_local_built_at", flag_index._local_built_at)
+    kept = await feature_flag_service.create_flag(
+        FeatureFlagCreate(key="rebuild_kept", rules=FeatureFlagRule())
+    )
+    gone = await feature_flag_service.create_flag(
+        FeatureFlagCreate(key="rebuild_gone", rules=FeatureFlagRule())
+    )
+    edited = kept.model_copy(update={"description": "edited in ssm"})
+    etags = []
+
+    async def scan():
+        # the scan read both, then one is deleted before the index is swapped
+        if not etags:
+            await feature_flag_service.delete_flag("rebuild_gone")
+        etags.append((await config_version.current())[0])
+        return [edited, gone] if len(etags) == 1 else [edited]
+
+    async def delete_from_ssm(flag_key, strict=False):
+        return True
+
+    monkeypatch.setattr(ssm_client, "is_enabled", lambda: True)
+    monkeypatch.setattr(feature_flag_service, "_scan_ssm", scan)
+    monkeypatch.setattr(feature_flag_service, "_delete_from_ssm", delete_from_ssm)
+
+    await feature_flag_service._rebuild_index()
+    assert await flag_index.get("rebuild_gone") is None
+    assert (await flag_index.get("rebuild_kept")).description == "edited in ssm"
+    assert (await config_version.current())[0] != etags[0]
+
+    # nothing changed since, the ETag stays
+    await feature_flag_service._rebuild_index()
+    assert (await config_version.current())[0] == etags[1]
+
+
+def test_failed_ssm_write_changes_nothing(monkeypatch):
+    """Test an update or delete SSM refuses is a 500 and leaves the flag as it was."""
+    from botocore.exceptions import ClientError
+    from main import app
+    from core.circuit_breaker import CircuitBreaker
+    from core.ssm_client import ssm_client
+
+    client = TestClient(app)
+
+    client.post("/api/v1/flags", json={"key": "unwritten_flag", "rules": {"strategy": "all"}})
+
+    class ThrottledSSM:
+        class exceptions:
+            class ParameterNotFound(Exception):
+                pass
+
+            class ParameterAlreadyExists(Exception):
+                pass
+
+        def _throttle(self, **kwargs):
+            raise ClientError({"Error": {"Code": "ThrottlingException"}}, "SSM")
+
+        put_parameter = delete_parameter = _throttle
+
+    monkeypatch.setattr(ssm_client, "_enabled", True)
+    monkeypatch.setattr(ssm_client, "_client", ThrottledSSM())
+    monkeypatch.setattr(ssm_client, "breaker", CircuitBreaker("ssm", 100, 30, 60))
+
+    assert client.put("/api/v1/flags/unwritten_flag", json={"enabled": False}).status_code == 500
+    assert client.delete("/api/v1/flags/unwritten_flag").status_code == 500
+    flag = client.get("/api/v1/flags/unwritten_flag").json()
+    assert (flag["enabled"], flag["version"]) == (True, 1)
+
+    # and nothing holds the next version, a retry once ssm is back goes through
+    monkeypatch.setattr(ssm_client, "_enabled", False)
+    assert (
+        client.put("/api/v1/flags/unwritten_flag", json={"enabled": False}).json()["version"] == 2
+    )
+
+
+def test_list_flags_failure_is_an_error(monkeypatch):
+    """Test a listing that can't be read is a 503 without validators, not an empty 200."""
+    from main import app
+    from services.feature_flag_service import feature_flag_service
+
+    client = TestClient(app)
+
+    async def ensure_index():
+        raise ConnectionError("connection reset")
+
+    monkeypatch.setattr(feature_flag_service, "_ensure_index", ensure_index)
+    for url in ("/api/v1/flags", "/api/v1/flags?limit=10", "/api/v1/flags/export"):
+        response = client.get(url)
+        assert response.status_code == 503
+        assert "etag" not in response.headers
+
+    response = client.post(
+        "/api/v1/flags/evaluate/batch", json={"flags": "all", "users": [{"user_id": "u1"}]}
+    )
+    assert response.status_code == 500
+
+
+def test_list_flags_cursor_projection_and_ndjson():
+    """Test cursor paging, field projection and NDJSON output."""
+    import json
+
+    from main import app
+
+    client = TestClient(app)
+
+    for i in range(5):
+        client.post("/api/v1/flags", json={"key": f"paged_{i}", "rules": {"strategy": "all"}})
+
+    keys = []
+    params = {"prefix": "paged_", "limit": 2, "fields": "key,enabled"}
+    while True:
+        response = client.get("/api/v1/flags", params=params)
+        page = response.json()
+        assert all(set(flag) == {"key", "enabled"} for flag in page)
+        keys.extend(flag["key"] for flag in page)
+        if "x-next-cursor" not in response.headers:
+            break
+        params["cursor"] = response.headers["x-next-cursor"]
+    assert keys == [f"paged_{i}" for i in range(5)]
+
+    response = client.get("/api/v1/flags?prefix=paged_&format=ndjson&fields=key")
+    assert response.headers["content-type"] == "application/x-ndjson"
+    lines = [json.loads(line) for line in response.text.splitlines()]
+    assert lines == [{"key": f"paged_{i}"} for i in range(5)]
+
+    assert client.get("/api/v1/flags?fields=nope").status_code == 422
+    assert client.get("/api/v1/flags?cursor=garbage").status_code == 400
@@ -0,0 +1,92 @@
+"""
+Local flag snapshot tests.
+Tests TTL, size bound, version-based invalidation and the encoded payload kept
+with each entry.
+"""
+
+import time
+from fastapi.testclient import TestClient
+
+from models.feature_flag import FeatureFlag
+from services.flag_cache import LocalFlagCache
+
+
+def test_local_cache_hit_and_expiry():
+    """Test entries are served until their TTL runs out."""
+    cache = LocalFlagCache(ttl=60, max_size=10)
+    cache.put(FeatureFlag(key="cached_flag", version=1))
+
+    assert cache.get("cached_flag").key == "cached_flag"
+
+    cache._entries["cached_flag"].expires_at = time.monotonic() - 1
+    assert cache.get("cached_flag") is None
+    assert len(cache) == 0
+
+
+def test_local_cache_evicts_least_recently_used():
+    """Test the snapshot stays within its size bound."""
+    cache = LocalFlagCache(ttl=60, max_size=2)
+    cache.put(FeatureFlag(key="flag_a"))
+    cache.put(FeatureFlag(key="flag_b"))
+    cache.get("flag_a")
+    cache.put(FeatureFlag(key="flag_c"))
+
+    assert cache.get("flag_a") is not None
+    assert cache.get("flag_b") is None
+    assert cache.get("flag_c") is not None
+
+
+def test_local_cache_version_guard():
+    """Test an older version never replaces a newer one."""
+    cache = LocalFlagCache(ttl=60, max_size=10)
+    cache.put(FeatureFlag(key="versioned_flag", enabled=True, version=2))
+
+    assert cache.put(FeatureFlag(key="versioned_flag", enabled=False, version=1)) is False
+    assert cache.get("versioned_flag").enabled is True
+
+
+def test_local_cache_refill_after_invalidation_is_dropped():
+    """Test a refill that raced an invalidation is not stored."""
+    cache = LocalFlagCache(ttl=60, max_size=10)
+    generation = cache.generation
+    cache.invalidate("raced_flag")
+
+    assert cache.put(FeatureFlag(key="raced_flag"), generation) is False
+    assert cache.get("raced_flag") is None
+
+
+def test_local_cache_payload_follows_version():
+    """Test the encoded payload is reused per version and never served for another one."""
+    cache = LocalFlagCache(ttl=60, max_size=10)
+    flag = FeatureFlag(key="payload_flag", version=1)
+    cache.put(flag)
+
+    payload = cache.get_payload(flag)
+    assert FeatureFlag.model_validate_json(payload) == flag
+    assert cache.get_payload(flag) is payload
+
+    newer = FeatureFlag(key="payload_flag", enabled=False, version=2)
+    assert cache.get_payload(newer) is None
+    cache.put(newer)
+    assert FeatureFlag.model_validate_json(cache.get_payload(newer)).enabled is False
+
+
+def test_evaluate_served_from_local_snapshot():
+    """Test a created flag is evaluated without any backing store."""
+    from main import app
+
+    client = TestClient(app)
+
+    flag_data = {"key": "local_snapshot_flag", "enabled": True, "rules": {"strategy": "all"}}
+    assert client.post("/api/v1/flags", json=flag_data).status_code == 201
+
+    data = client.get("/api/v1/flags/local_snapshot_flag/evaluate?user_id=u1").json()
+    assert data["enabled"] is True
+    assert data["matched_rule"] == "all"
+    assert data["source"] == "cache"
+
+    updated = client.put("/api/v1/flags/local_snapshot_flag", json={"enabled": False}).json()
+    assert updated["version"] == 2
+
+    data = client.get("/api/v1/flags/local_snapshot_flag/evaluate?user_id=u1").json()
+    assert data["matched_rule"] == "disabled"
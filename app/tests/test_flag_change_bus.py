@@ -0,0 +1,42 @@
+"""
+Flag change notification tests.
+"""
+
+from models.feature_flag import FeatureFlagCreate, FeatureFlagRule, FlagChangeEvent
+from services.feature_flag_service import feature_flag_service
+from services.flag_change_bus import FlagChangeBus, flag_change_bus
+
+
+async def test_publish_notifies_local_listeners():
+    """Test published events reach local listeners with our instance id."""
+    bus = FlagChangeBus(channel="test:changes")
+    received = []
+    bus.add_listener(received.append)
+
+    event = await bus.publish("bus_flag", 3, "updated")
+
+    assert received == [event]
+    assert event.origin == bus.instance_id
+
+
+async def test_remote_change_evicts_local_snapshot():
+    """Test a change from another replica evicts our local copy."""
+    await feature_flag_service.create_flag(
+        FeatureFlagCreate(key="remote_change_flag", rules=FeatureFlagRule())
+    )
+    assert feature_flag_service._local_cache.get("remote_change_flag") is not None
+
+    flag_change_bus._dispatch(
+        FlagChangeEvent(key="remote_change_flag", version=2, action="updated", origin="other-pod")
+    )
+
+    assert feature_flag_service._local_cache.get("remote_change_flag") is None
+
+
+async def test_own_change_keeps_local_snapshot():
+    """Test our own published writes don't evict the fresh local copy."""
+    flag = await feature_flag_service.create_flag(
+        FeatureFlagCreate(key="own_change_flag", rules=FeatureFlagRule())
+    )
+
+    assert feature_flag_service._local_cache.get("own_change_flag") is flag
@@ -0,0 +1,78 @@
+"""
+Compiled flag evaluation tests.
+"""
+
+import hashlib
+import json
+import pytest
+
+from models.feature_flag import (
+    FeatureFlag,
+    FeatureFlagBatchEvaluationResult,
+    FeatureFlagEvaluationResult,
+    FeatureFlagRule,
+    RolloutStrategy,
+)
+from services.evaluation_result import BatchEvaluationResult, EvaluationResult
+from services.flag_evaluator import ALL, NOT_FOUND, compile_flag
+
+
+def test_compiled_user_list():
+    """Test user lists are matched through the compiled set."""
+    flag = FeatureFlag(
+        key="compiled_users",
+        rules=FeatureFlagRule(strategy=RolloutStrategy.USER_LIST, user_ids=["u1", "u2"]),
+    )
+    compiled = compile_flag(flag)
+
+    assert compiled.evaluate("u1", None) == (True, "user_list")
+    assert compiled.evaluate("u3", None) == (False, "user_not_in_list")
+    assert compiled.evaluate(None, None) == (False, "user_not_in_list")
+
+
+def test_compiled_percentage_matches_md5_bucketing():
+    """Test the compiled percentage plan keeps the md5 bucket assignment."""
+    flag = FeatureFlag(
+        key="compiled_pct",
+        rules=FeatureFlagRule(strategy=RolloutStrategy.PERCENTAGE, percentage=30),
+    )
+    compiled = compile_flag(flag)
+
+    for i in range(200):
+        user_id = f"user{i}"
+        bucket = int(hashlib.md5(f"compiled_pct:{user_id}".encode()).hexdigest(), 16) % 100
+        assert compiled.evaluate(user_id, None)[0] is (bucket < 30)
+
+    assert compiled.evaluate(None, None) == (False, "percentage_not_matched")
+
+
+def test_compiled_disabled_and_immutable():
+    """Test disabled flags short-circuit and compiled plans can't be changed."""
+    compiled = compile_flag(FeatureFlag(key="compiled_off", enabled=False))
+
+    assert compiled.evaluate("u1", None) == (False, "disabled")
+    with pytest.raises(AttributeError):
+        compiled.key = "other"
+
+
+def test_results_encode_to_the_response_models():
+    """Test the internal results serialize to what the response models describe."""
+    single = EvaluationResult("flag", True, "all", "cache")
+    assert FeatureFlagEvaluationResult.model_validate_json(single.to_json()) == (
+        FeatureFlagEvaluationResult(key="flag", enabled=True, matched_rule="all", source="cache")
+    )
+
+    batch = BatchEvaluationResult(
+        ['quote"d', None], {"a": [ALL, NOT_FOUND], "b\u00e9": [NOT_FOUND, ALL]}
+    )
+    data = json.loads(batch.to_json())
+    FeatureFlagBatchEvaluationResult.model_validate(data)
+    assert data["results"][0] == {
+        "user_id": 'quote"d',
+        "flags": {
+            "a": {"enabled": True, "matched_rule": "all"},
+            "b\u00e9": {"enabled": False, "matched_rule": "not_found"},
+        },
+    }
+    assert data["results"][1]["user_id"] is None
+    assert batch.outcome(1, "b\u00e9") == ALL
@@ -0,0 +1,88 @@
+"""
+Bulk import and export tests.
+"""
+
+import json
+
+from botocore.exceptions import ClientError
+from fastapi.testclient import TestClient
+
+from core import metrics
+from models.feature_flag import FeatureFlagCreate
+from services import flag_import
+from services.feature_flag_service import feature_flag_service
+from services.flag_import import FlagImporter
+
+
+def _lines(*items):
+    return "".join((item if isinstance(item, str) else json.dumps(item)) + "\n" for item in items)
+
+
+def test_import_reports_each_line_and_export_round_trips():
+    """Test an NDJSON import answers per line and the export can be imported again."""
+    from main import app
+
+    client = TestClient(app)
+
+    body = _lines(
+        {"key": "imported_a", "rules": {"strategy": "all"}},
+        "",
+        "{not json",
+        {"key": "imported_b", "enabled": False, "rules": {"strategy": "all"}},
+        {"key": "imported_a", "rules": {"strategy": "all"}},
+        {"key": "imported_c", "rules": {"strategy": "percentage", "percentage": 250}},
+    )
+    response = client.post("/api/v1/flags/import", content=body)
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/x-ndjson"
+    results = sorted(
+        (json.loads(line) for line in response.text.splitlines()), key=lambda r: r["line"]
+    )
+    assert [(r["line"], r["status"]) for r in results] == [
+        (1, "created"),
+        (3, "invalid"),
+        (4, "created"),
+        (5, "exists"),
+        (6, "invalid"),
+    ]
+    assert "key" not in results[1]
+
+    exported = client.get("/api/v1/flags/export?prefix=imported_")
+    assert exported.headers["content-type"] == "application/x-ndjson"
+    flags = [json.loads(line) for line in exported.text.splitlines()]
+    assert [flag["key"] for flag in flags] == ["imported_a", "imported_b"]
+
+    flags[1]["enabled"] = True
+    response = client.post("/api/v1/flags/import?overwrite=true", content=_lines(*flags))
+    statuses = {r["key"]: r["status"] for r in map(json.loads, response.text.splitlines())}
+    assert statuses == {"imported_a": "unchanged", "imported_b": "updated"}
+    assert client.get("/api/v1/flags/imported_b").json()["enabled"] is True
+
+
+async def test_importer_retries_throttled_writes(monkeypatch):
+    """Test a throttled write is retried after a pause and other errors are not."""
+    throttled = ClientError({"Error": {"Code": "ThrottlingException"}}, "PutParameter")
+    calls = []
+
+    async def import_flag(flag_data, overwrite=False):
+        calls.append(flag_data.key)
+        if flag_data.key == "broken":
+            raise RuntimeError("bad parameter")
+        if calls.count(flag_data.key) < 3:
+            raise throttled
+        return None, "created"
+
+    monkeypatch.setattr(feature_flag_service, "import_flag", import_flag)
+    monkeypatch.setattr(flag_import, "RETRY_BASE_DELAY", 0.001)
+    retries = metrics.import_retries.labels().value
+
+    async def lines():
+        yield FeatureFlagCreate(key="throttled").model_dump_json().encode()
+        yield FeatureFlagCreate(key="broken").model_dump_json().encode()
+
+    importer = FlagImporter(concurrency=2, max_retries=5)
+    results = {result.key: result async for result in importer.run(lines())}
+
+    assert (results["throttled"].status, results["throttled"].attempts) == ("created", 3)
+    assert (results["broken"].status, results["broken"].attempts) == ("failed", 1)
+    assert metrics.import_retries.labels().value == retries + 2
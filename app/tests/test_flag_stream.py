@@ -0,0 +1,92 @@
+"""
+Flag change stream tests.
+"""
+
+import json
+
+import pytest
+
+from models.feature_flag import FeatureFlagCreate, FeatureFlagRule, FeatureFlagUpdate
+from services.feature_flag_service import feature_flag_service
+from services.flag_change_bus import flag_change_bus
+from services.flag_stream import FlagStream
+
+
+def _parse(message):
+    lines = dict(line.split(": ", 1) for line in message.strip().split("\n"))
+    return lines["event"], json.loads(lines["data"])
+
+
+async def test_stream_sends_snapshot_then_changes():
+    """Test a client gets a snapshot, then one event per change with the flag."""
+    events = FlagStream(keepalive=5).events()
+
+    kind, data = _parse(await events.__anext__())
+    assert kind == "snapshot"
+    assert isinstance(data["flags"], list)
+
+    await feature_flag_service.create_flag(
+        FeatureFlagCreate(key="streamed_flag", rules=FeatureFlagRule())
+    )
+    kind, data = _parse(await events.__anext__())
+    assert (kind, data["action"], data["version"]) == ("change", "created", 1)
+    assert data["flag"]["key"] == "streamed_flag"
+
+    await feature_flag_service.update_flag("streamed_flag", FeatureFlagUpdate(enabled=False))
+    kind, data = _parse(await events.__anext__())
+    assert (data["action"], data["version"], data["flag"]["enabled"]) == ("updated", 2, False)
+
+    await feature_flag_service.delete_flag("streamed_flag")
+    kind, data = _parse(await events.__anext__())
+    assert (data["action"], data["flag"]) == ("deleted", None)
+
+    listeners = len(flag_change_bus._listeners)
+    await events.aclose()
+    assert len(flag_change_bus._listeners) == listeners - 1
+
+
+async def test_slow_client_gets_a_new_snapshot():
+    """Test a client whose backlog overflows is sent a fresh snapshot instead."""
+    events = FlagStream(keepalive=5, queue_size=1).events()
+    await events.__anext__()
+
+    await flag_change_bus.publish("overflow_a", 1, "updated")
+    await flag_change_bus.publish("overflow_b", 1, "updated")
+
+    kind, _ = _parse(await events.__anext__())
+    assert kind == "snapshot"
+    await events.aclose()
+
+
+async def test_stream_keepalive():
+    """Test idle streams send keepalive comments."""
+    events = FlagStream(keepalive=0.01).events()
+    await events.__anext__()
+
+    assert await events.__anext__() == ": keepalive\n\n"
+    await events.aclose()
+
+
+async def test_stream_ends_when_a_snapshot_cant_be_read(monkeypatch):
+    """Test a failing snapshot is a 503 or the end of the stream, never an empty snapshot."""
+    from fastapi.testclient import TestClient
+    from main import app
+
+    async def iter_flags(**kwargs):
+        raise ConnectionError("connection reset")
+        yield
+
+    events = FlagStream(keepalive=5, queue_size=1).events()
+    await events.__anext__()
+    listeners = len(flag_change_bus._listeners)
+    monkeypatch.setattr(feature_flag_service, "iter_flags", iter_flags)
+
+    # overflowing the queue asks for a new snapshot, which can't be read now
+    await flag_change_bus.publish("unreadable_a", 1, "updated")
+    await flag_change_bus.publish("unreadable_b", 1, "updated")
+    with pytest.raises(StopAsyncIteration):
+        await events.__anext__()
+    assert len(flag_change_bus._listeners) == listeners - 1
+
+    response = TestClient(app).get("/api/v1/flags/stream")
+    assert response.status_code == 503
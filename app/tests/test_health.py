@@ -79,4 +79,26 @@ def test_ping():
     
     data = response.json()
     assert data["message"] == "pong"
-    assert data["version"] == "1.0.0"
\ No newline at end of file
+    assert data["version"] == "1.0.0"
+
+
+def test_health_ready_while_redis_circuit_is_open(monkeypatch):
+    """Test readiness stays 200 when the Redis circuit opens."""
+    from main import app
+    from core.config import settings
+    from core.redis_client import redis_client
+
+    monkeypatch.setattr(settings, "redis_enabled", True)
+    monkeypatch.setattr(redis_client, "_connected", True)
+    monkeypatch.setattr(redis_client, "_client", object())
+    monkeypatch.setattr(redis_client, "_monitor", object())
+    for _ in range(redis_client.breaker.threshold):
+        redis_client.breaker.record_failure()
+    try:
+        response = TestClient(app).get("/health/ready")
+    finally:
+        redis_client.breaker.record_success()
+
+    assert response.status_code == 200
+    assert "Redis: unavailable" in response.text
+    assert "redis open" in response.text
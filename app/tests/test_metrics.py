@@ -0,0 +1,55 @@
+"""
+Metrics tests.
+"""
+
+from fastapi.testclient import TestClient
+
+from core.metrics import Counter, Histogram, rule_label
+
+
+def test_histogram_renders_cumulative_buckets():
+    """Test histogram buckets are cumulative with sum and count."""
+    histogram = Histogram("test_seconds", "Test latency", ["operation"], buckets=(0.1, 1.0))
+    child = histogram.labels("get")
+    child.observe(0.05)
+    child.observe(0.5)
+    child.observe(5)
+
+    lines = histogram.render()
+    assert 'test_seconds_bucket{operation="get",le="0.1"} 1' in lines
+    assert 'test_seconds_bucket{operation="get",le="1.0"} 2' in lines
+    assert 'test_seconds_bucket{operation="get",le="+Inf"} 3' in lines
+    assert 'test_seconds_count{operation="get"} 3' in lines
+
+
+def test_counter_and_rule_labels():
+    """Test counters per label and low-cardinality rule labels."""
+    counter = Counter("test_total", "Test counter", ["matched_rule"])
+    counter.labels(rule_label("percentage_25")).inc()
+    counter.labels(rule_label("percentage_bp_1250")).inc()
+    counter.labels(rule_label("percentage_not_matched")).inc()
+
+    assert 'test_total{matched_rule="percentage"} 2.0' in counter.render()
+    assert 'test_total{matched_rule="percentage_not_matched"} 1.0' in counter.render()
+
+
+def test_label_values_are_escaped():
+    """Test backslashes, quotes and newlines in label values are escaped."""
+    counter = Counter("test_escaped_total", "Test counter", ["key"])
+    counter.labels('say "hi"\\now\nplease').inc()
+
+    assert 'test_escaped_total{key="say \\"hi\\"\\\\now\\nplease"} 1.0' in counter.render()
+
+
+def test_metrics_endpoint():
+    """Test /metrics exposes evaluation metrics."""
+    from main import app
+
+    client = TestClient(app)
+
+    client.get("/api/v1/flags/metrics_missing_flag/evaluate?user_id=u1")
+
+    response = client.get("/metrics")
+    assert response.status_code == 200
+    assert 'feature_flag_evaluations_total{matched_rule="not_found"}' in response.text
+    assert 'feature_flag_evaluation_seconds_count{kind="single"}' in response.text
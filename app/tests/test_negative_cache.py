@@ -0,0 +1,84 @@
+"""
+Negative cache tests.
+Tests unknown flag keys are remembered until they expire or the flag is
+created, so repeated lookups don't reach SSM.
+"""
+
+import time
+
+from core.ssm_client import ssm_batch_loader, ssm_client
+from models.feature_flag import FeatureFlag, FeatureFlagCreate, FeatureFlagRule
+from services.feature_flag_service import feature_flag_service
+from services.flag_cache import LocalFlagCache
+
+
+def test_local_cache_negative_entries():
+    """Test unknown keys are remembered until they expire or the flag appears."""
+    cache = LocalFlagCache(ttl=60, max_size=10, negative_ttl=5)
+    assert cache.put_missing("ghost_flag") is True
+    assert cache.is_missing("ghost_flag") is True
+
+    cache.invalidate("ghost_flag")
+    assert cache.is_missing("ghost_flag") is False
+
+    generation = cache.generation
+    cache.invalidate("ghost_flag")
+    assert cache.put_missing("ghost_flag", generation) is False
+
+    cache.put_missing("ghost_flag")
+    cache.put(FeatureFlag(key="ghost_flag"))
+    assert cache.is_missing("ghost_flag") is False
+
+    cache.put_missing("expired_flag")
+    cache._missing["expired_flag"] = time.monotonic() - 1
+    assert cache.is_missing("expired_flag") is False
+
+    assert LocalFlagCache(ttl=60, max_size=10).put_missing("ghost_flag") is False
+
+
+async def test_unknown_keys_skip_ssm_until_created(monkeypatch):
+    """Test repeated lookups of a missing key make one SSM call and create clears it."""
+    calls = []
+
+    async def load(name):
+        calls.append(name)
+        return None
+
+    monkeypatch.setattr(ssm_client, "is_enabled", lambda: True)
+    monkeypatch.setattr(ssm_batch_loader, "load", load)
+    monkeypatch.setattr(ssm_client, "_enabled", True)
+
+    for _ in range(3):
+        assert await feature_flag_service.get_flag("negative_flag") is None
+    assert calls == ["negative_flag"]
+
+    await feature_flag_service.create_flag(
+        FeatureFlagCreate(key="negative_flag", rules=FeatureFlagRule())
+    )
+    assert (await feature_flag_service.get_flag("negative_flag")).key == "negative_flag"
+
+    async def failing_load(name):
+        calls.append(name)
+        raise RuntimeError("throttled")
+
+    # errors are not "not found", nothing is remembered
+    monkeypatch.setattr(ssm_batch_loader, "load", failing_load)
+    assert await feature_flag_service.get_flag("negative_error_flag") is None
+    assert await feature_flag_service.get_flag("negative_error_flag") is None
+    assert calls.count("negative_error_flag") == 2
+
+
+async def test_batch_lookup_remembers_unknown_keys(monkeypatch):
+    """Test get_flags caches the keys SSM doesn't have."""
+    calls = []
+
+    async def get_parameters(names, decrypt=False, strict=False):
+        calls.append(list(names))
+        return {}
+
+    monkeypatch.setattr(ssm_client, "is_enabled", lambda: True)
+    monkeypatch.setattr(ssm_client, "get_parameters", get_parameters)
+
+    assert await feature_flag_service.get_flags(["negative_a", "negative_b"]) == {}
+    assert await feature_flag_service.get_flags(["negative_a", "negative_b"]) == {}
+    assert calls == [["negative_a", "negative_b"]]
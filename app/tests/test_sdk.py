@@ -0,0 +1,110 @@
+"""
+Local evaluation client tests.
+Polls the app through the test client instead of a socket.
+"""
+
+import asyncio
+import time
+
+from fastapi.testclient import TestClient
+
+from sdk import FlagClient
+
+
+def _client_for(app) -> FlagClient:
+    http = TestClient(app)
+    client = FlagClient("http://testserver", max_age=60, refresh_interval=0.01)
+
+    def fetch(etag):
+        response = http.get("/api/v1/flags", headers={"If-None-Match": etag} if etag else {})
+        return response.status_code, response.headers.get("etag"), response.content
+
+    client._fetch = fetch
+    return client
+
+
+def test_client_evaluates_like_the_service():
+    """Test local results match the service and unchanged snapshots are a 304."""
+    from main import app
+
+    http = TestClient(app)
+    http.post(
+        "/api/v1/flags",
+        json={
+            "key": "sdk_percentage",
+            "rules": {"strategy": "percentage", "percentage": 50},
+        },
+    )
+    http.post(
+        "/api/v1/flags",
+        json={
+            "key": "sdk_custom",
+            "rules": {
+                "strategy": "custom",
+                "custom_rules": {
+                    "rules": [
+                        {
+                            "name": "us",
+                            "conditions": [{"attribute": "country", "op": "eq", "value": "US"}],
+                        },
+                    ]
+                },
+            },
+        },
+    )
+
+    client = _client_for(app)
+    assert client.evaluate("sdk_percentage", "user") == (False, "stale")
+    assert client.refresh() is True
+
+    for user_id in (f"user_{i}" for i in range(50)):
+        remote = http.get(f"/api/v1/flags/sdk_percentage/evaluate?user_id={user_id}").json()
+        assert client.evaluate("sdk_percentage", user_id) == (
+            remote["enabled"],
+            remote["matched_rule"],
+        )
+    assert client.evaluate("sdk_custom", "u", {"country": "US"}) == (True, "custom:us")
+    assert client.evaluate("sdk_missing", default=True) == (True, "not_found")
+
+    etag = client._etag
+    assert client.refresh() is True
+    assert client._etag == etag
+
+    http.put("/api/v1/flags/sdk_custom", json={"enabled": False})
+    assert client.refresh() is True
+    assert client.evaluate("sdk_custom", "u", {"country": "US"}) == (False, "disabled")
+
+
+def test_client_falls_back_to_defaults_when_stale():
+    """Test a snapshot past max_age yields defaults and a failed poll keeps the old one."""
+    from main import app
+
+    TestClient(app).post("/api/v1/flags", json={"key": "sdk_stale", "rules": {"strategy": "all"}})
+
+    client = _client_for(app)
+    client.defaults = {"sdk_stale": False}
+    client.refresh()
+    assert client.is_enabled("sdk_stale") is True
+
+    def unreachable(etag):
+        raise OSError("connection refused")
+
+    client._fetch = unreachable
+    assert client.refresh() is False
+    assert client.is_enabled("sdk_stale") is True
+
+    client._synced_at = time.monotonic() - 61
+    assert client.evaluate("sdk_stale") == (False, "stale")
+
+
+async def test_background_refresher():
+    """Test the refresher keeps the snapshot current until stopped."""
+    from main import app
+
+    client = _client_for(app)
+    client.start()
+    await asyncio.sleep(0.1)
+    await client.stop()
+
+    assert client.stale is False
+    assert client._task is None
@@ -0,0 +1,128 @@
+"""
+Segment tests.
+Mostly runs against the in-memory fallback, redis is disabled in tests. The
+redis-side metadata update runs on fakeredis.
+"""
+
+import fakeredis
+from fastapi.testclient import TestClient
+
+from core.redis_client import redis_client
+from models.segment import Segment, SegmentCreate
+from services.segment_service import SEGMENT_INDEX_KEY, segment_service
+
+
+def test_segment_crud_and_membership():
+    """Test creating a segment, changing members and checking membership."""
+    from main import app
+
+    client = TestClient(app)
+
+    response = client.post("/api/v1/segments", json={"name": "crud_segment", "user_ids": ["u1"]})
+    assert response.status_code == 201
+    assert response.json()["size"] == 1
+    assert client.post("/api/v1/segments", json={"name": "crud_segment"}).status_code == 409
+
+    added = client.post("/api/v1/segments/crud_segment/members", json={"user_ids": ["u1", "u2"]})
+    assert added.json() == {"name": "crud_segment", "changed": 1, "size": 2}
+
+    removed = client.post("/api/v1/segments/crud_segment/members/remove", json={"user_ids": ["u1"]})
+    assert removed.json()["size"] == 1
+
+    assert client.get("/api/v1/segments/crud_segment/members/u2").json()["member"] is True
+    assert client.get("/api/v1/segments/crud_segment/members/u1").json()["member"] is False
+
+    assert client.delete("/api/v1/segments/crud_segment").status_code == 204
+    assert client.get("/api/v1/segments/crud_segment").status_code == 404
+    assert (
+        client.post("/api/v1/segments/crud_segment/members", json={"user_ids": ["u1"]}).status_code
+        == 404
+    )
+
+
+def test_segment_flag_evaluation():
+    """Test segment flags and in_segment rules, single and batch."""
+    from main import app
+
+    client = TestClient(app)
+
+    client.post("/api/v1/segments", json={"name": "eval_segment", "user_ids": ["member"]})
+    client.post(
+        "/api/v1/flags",
+        json={
+            "key": "segment_flag",
+            "rules": {"strategy": "segment", "segments": ["eval_segment"]},
+        },
+    )
+    client.post(
+        "/api/v1/flags",
+        json={
+            "key": "segment_custom_flag",
+            "rules": {
+                "strategy": "custom",
+                "custom_rules": {
+                    "rules": [
+                        {
+                            "name": "members_in_us",
+                            "conditions": [
+                                {"op": "in_segment", "value": "eval_segment"},
+                                {"attribute": "country", "op": "eq", "value": "US"},
+                            ],
+                        },
+                    ]
+                },
+            },
+        },
+    )
+
+    result = client.get("/api/v1/flags/segment_flag/evaluate?user_id=member").json()
+    assert result["enabled"] is True
+    assert result["matched_rule"] == "segment:eval_segment"
+    result = client.get("/api/v1/flags/segment_flag/evaluate?user_id=stranger").json()
+    assert result["matched_rule"] == "segment_not_matched"
+
+    response = client.post(
+        "/api/v1/flags/evaluate/batch",
+        json={
+            "flags": ["segment_flag", "segment_custom_flag"],
+            "users": [
+                {"user_id": "member", "context": {"country": "US"}},
+                {"user_id": "stranger", "context": {"country": "US"}},
+            ],
+        },
+    )
+    member, stranger = response.json()["results"]
+    assert member["flags"]["segment_flag"]["enabled"] is True
+    assert member["flags"]["segment_custom_flag"]["matched_rule"] == "custom:members_in_us"
+    assert stranger["flags"]["segment_flag"]["enabled"] is False
+    assert stranger["flags"]["segment_custom_flag"]["enabled"] is False
+
+    # a segment flag without segments is rejected
+    response = client.post(
+        "/api/v1/flags",
+        json={
+            "key": "segment_flag_empty",
+            "rules": {"strategy": "segment"},
+        },
+    )
+    assert response.status_code == 422
+
+
+async def test_member_changes_touch_the_stored_segment(monkeypatch):
+    """Test a member change bumps updated_at in redis and a deleted segment stays deleted."""
+    redis = fakeredis.FakeAsyncRedis(decode_responses=True)
+    monkeypatch.setattr(redis_client, "get_client", lambda: redis)
+
+    created = await segment_service.create_segment(
+        SegmentCreate(name="touched_segment", description="beta", user_ids=["u1"])
+    )
+    result = await segment_service.add_members("touched_segment", ["u2"])
+    assert (result.changed, result.size) == (1, 2)
+
+    stored = Segment.model_validate_json(await redis.hget(SEGMENT_INDEX_KEY, "touched_segment"))
+    assert (stored.description, stored.created_at) == ("beta", created.created_at)
+    assert stored.updated_at >= created.updated_at
+
+    assert await segment_service.delete_segment("touched_segment")
+    assert await segment_service.remove_members("touched_segment", ["u2"]) is None
+    assert not await redis.hexists(SEGMENT_INDEX_KEY, "touched_segment")
@@ -0,0 +1,43 @@
+"""
+Request coalescing tests.
+"""
+
+import asyncio
+
+from core.singleflight import SingleFlight
+
+
+async def test_singleflight_coalesces_concurrent_calls():
+    """Test concurrent callers for one key share a single fetch."""
+    flight = SingleFlight()
+    calls = []
+
+    async def fetch():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return "value"
+
+    results = await asyncio.gather(*(flight.do("flag", fetch) for _ in range(10)))
+
+    assert results == ["value"] * 10
+    assert len(calls) == 1
+
+    await asyncio.sleep(0)
+    assert flight.in_flight() == 0
+
+
+async def test_singleflight_propagates_errors():
+    """Test every waiter sees the leader's error and the key is released."""
+    flight = SingleFlight()
+
+    async def fail():
+        await asyncio.sleep(0.01)
+        raise RuntimeError("ssm down")
+
+    results = await asyncio.gather(
+        *(flight.do("flag", fail) for _ in range(3)), return_exceptions=True
+    )
+
+    assert all(isinstance(result, RuntimeError) for result in results)
+    await asyncio.sleep(0)
+    assert flight.in_flight() == 0
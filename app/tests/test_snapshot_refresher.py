@@ -0,0 +1,94 @@
+"""
+Background snapshot refresher tests.
+"""
+
+import asyncio
+import time
+
+from models.feature_flag import FeatureFlag
+from services.feature_flag_service import feature_flag_service
+from services.flag_index import flag_index
+from services.snapshot_refresher import SnapshotRefresher
+
+
+def test_refresh_delay_stays_within_jitter():
+    """Test jittered delays stay within the configured spread."""
+    refresher = SnapshotRefresher(interval=10, jitter=0.2)
+    delays = [refresher._next_delay() for _ in range(200)]
+
+    assert all(8 <= delay <= 12 for delay in delays)
+
+
+async def test_refresher_reloads_until_stopped(monkeypatch):
+    """Test the refresher keeps reloading the snapshot and stops cleanly."""
+    calls = []
+
+    async def fake_refresh_snapshot():
+        calls.append(1)
+        return 0
+
+    monkeypatch.setattr(feature_flag_service, "refresh_snapshot", fake_refresh_snapshot)
+    monkeypatch.setattr(feature_flag_service, "snapshot_loaded", True)
+    refresher = SnapshotRefresher(interval=0.01, jitter=0)
+    refresher.start()
+    await asyncio.sleep(0.05)
+    await refresher.stop()
+
+    count = len(calls)
+    assert count >= 2
+    await asyncio.sleep(0.03)
+    assert len(calls) == count
+
+
+async def test_refresh_reads_the_index_not_ssm(monkeypatch):
+    """Test a refresh fills the snapshot from the flag index without scanning SSM."""
+    flag = FeatureFlag(key="refreshed_flag", version=2)
+    monkeypatch.setattr(flag_index, "_local", {**flag_index._local, flag.key: flag})
+    monkeypatch.setattr(flag_index, "_local_built_at", time.monotonic())
+
+    async def scan():
+        raise AssertionError("refreshing scanned SSM")
+
+    monkeypatch.setattr(feature_flag_service, "_scan_ssm", scan)
+    assert await feature_flag_service.refresh_snapshot() >= 1
+    assert feature_flag_service._local_cache.get("refreshed_flag").version == 2
+
+
+async def test_refresher_retries_a_failed_warm_up(monkeypatch):
+    """Test a pod whose warm-up failed becomes ready on the next refresh."""
+    from fastapi.testclient import TestClient
+
+    from core.config import settings
+    from core.ssm_client import ssm_client
+    from main import app
+
+    scans = []
+
+    async def scan():
+        scans.append(1)
+        if len(scans) == 1:
+            raise ConnectionError("ssm unreachable")
+        return [FeatureFlag(key="warmed_flag")]
+
+    monkeypatch.setattr(settings, "snapshot_warmup_enabled", True)
+    monkeypatch.setattr(settings, "ssm_enabled", True)
+    monkeypatch.setattr(ssm_client, "is_enabled", lambda: True)
+    monkeypatch.setattr(feature_flag_service, "_scan_ssm", scan)
+    monkeypatch.setattr(feature_flag_service, "snapshot_loaded", False)
+    monkeypatch.setattr(flag_index, "_local", dict(flag_index._local))
+    monkeypatch.setattr(flag_index, "_local_built_at", flag_index._local_built_at)
+    client = TestClient(app)
+
+    try:
+        await feature_flag_service.load_snapshot()
+    except ConnectionError:
+        pass
+    assert client.get("/health/ready").status_code == 503
+
+    refresher = SnapshotRefresher(interval=0.01, jitter=0)
+    refresher.start()
+    await asyncio.sleep(0.05)
+    await refresher.stop()
+
+    assert client.get("/health/ready").status_code == 200
+    assert feature_flag_service._local_cache.get("warmed_flag") is not None
@@ -0,0 +1,40 @@
+"""
+Batched SSM read tests.
+"""
+
+import asyncio
+
+from core.ssm_client import SSMBatchLoader
+
+
+class RecordingSSMClient:
+    def __init__(self, values):
+        self.values = values
+        self.calls = []
+
+    async def get_parameters(self, names, decrypt=False, strict=False):
+        self.calls.append(list(names))
+        return {name: self.values[name] for name in names if name in self.values}
+
+
+async def test_batch_loader_groups_concurrent_reads():
+    """Test reads arriving together share one GetParameters call."""
+    client = RecordingSSMClient({"flag_a": "a", "flag_b": "b"})
+    loader = SSMBatchLoader(client, window=0.001)
+
+    results = await asyncio.gather(
+        loader.load("flag_a"), loader.load("flag_b"), loader.load("flag_a"), loader.load("gone")
+    )
+
+    assert results == ["a", "b", "a", None]
+    assert client.calls == [["flag_a", "flag_b", "gone"]]
+
+
+async def test_batch_loader_starts_new_batch_after_flush():
+    """Test reads after a flush go out in a fresh batch."""
+    client = RecordingSSMClient({"flag_a": "a"})
+    loader = SSMBatchLoader(client, window=0)
+
+    assert await loader.load("flag_a") == "a"
+    assert await loader.load("flag_a") == "a"
+    assert len(client.calls) == 2
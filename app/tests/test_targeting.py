@@ -0,0 +1,194 @@
+"""
+Custom targeting rule tests.
+"""
+
+import pytest
+from fastapi.testclient import TestClient
+
+from models.feature_flag import FeatureFlag, FeatureFlagRule, RolloutStrategy
+from services.flag_evaluator import compile_flag
+from services.targeting import InvalidRuleError, compile_condition
+
+
+def _custom_flag(key, custom_rules):
+    return FeatureFlag(
+        key=key,
+        rules=FeatureFlagRule(strategy=RolloutStrategy.CUSTOM, custom_rules=custom_rules),
+    )
+
+
+def test_operators():
+    """Test each operator family against a context."""
+    context = {"country": "US", "age": "42", "app_version": "2.4.1-beta", "email": "a@corp.io"}
+    cases = [
+        ({"attribute": "country", "op": "eq", "value": "US"}, True),
+        ({"attribute": "country", "op": "neq", "value": "US"}, False),
+        ({"attribute": "country", "op": "in", "value": ["CA", "US"]}, True),
+        ({"attribute": "country", "op": "not_in", "value": ["CA", "US"]}, False),
+        ({"attribute": "email", "op": "regex", "value": r"@corp\.io$"}, True),
+        ({"attribute": "email", "op": "ends_with", "value": "@other.io"}, False),
+        ({"attribute": "age", "op": "gte", "value": 18}, True),
+        ({"attribute": "age", "op": "between", "value": [50, 60]}, False),
+        ({"attribute": "app_version", "op": "semver_gte", "value": "2.4.0"}, True),
+        ({"attribute": "app_version", "op": "semver_gte", "value": "2.4.1"}, False),
+        ({"attribute": "missing", "op": "exists"}, False),
+        ({"not": {"attribute": "missing", "op": "gt", "value": 1}}, True),
+    ]
+    for condition, expected in cases:
+        assert compile_condition(condition)("u1", context) is expected, condition
+
+
+def test_semver_prerelease_order():
+    """Test prerelease identifiers compare numerically, numbers before words."""
+    ordered = [
+        "1.0.0-alpha",
+        "1.0.0-alpha.1",
+        "1.0.0-alpha.beta",
+        "1.0.0-rc.2",
+        "1.0.0-rc.10",
+        "1.0.0-rc2",
+        "1.0.0-rc10",
+        "1.0.0",
+    ]
+    for lower, higher in zip(ordered, ordered[1:]):
+        condition = {"attribute": "app_version", "op": "semver_gt", "value": lower}
+        assert compile_condition(condition)("u1", {"app_version": higher}), (higher, lower)
+        assert not compile_condition(condition)("u1", {"app_version": lower}), lower
+
+
+def test_rules_are_tried_in_order():
+    """Test the first matching rule wins and the default applies otherwise."""
+    compiled = compile_flag(
+        _custom_flag(
+            "custom_order",
+            {
+                "rules": [
+                    {
+                        "name": "blocked",
+                        "enabled": False,
+                        "conditions": [{"attribute": "country", "op": "eq", "value": "XX"}],
+                    },
+                    {
+                        "name": "premium",
+                        "conditions": {
+                            "any": [
+                                {"attribute": "plan", "op": "eq", "value": "premium"},
+                                {"attribute": "user_id", "op": "in", "value": ["vip"]},
+                            ]
+                        },
+                    },
+                ],
+            },
+        )
+    )
+
+    assert compiled.evaluate("u1", {"plan": "premium", "country": "XX"}) == (
+        False,
+        "custom:blocked",
+    )
+    assert compiled.evaluate("u1", {"plan": "premium"}) == (True, "custom:premium")
+    assert compiled.evaluate("vip", None) == (True, "custom:premium")
+    assert compiled.evaluate("u1", {"plan": "free"}) == (False, "custom_default")
+
+
+def test_rule_percentage():
+    """Test a rule's percentage limits it to a share of matching users."""
+    compiled = compile_flag(
+        _custom_flag(
+            "custom_pct",
+            {
+                "rules": [
+                    {
+                        "name": "half",
+                        "percentage": 50,
+                        "conditions": [{"attribute": "beta", "op": "eq", "value": True}],
+                    }
+                ],
+            },
+        )
+    )
+
+    matched = sum(compiled.evaluate(f"user{i}", {"beta": True})[0] for i in range(1000))
+    assert 400 < matched < 600
+    assert compiled.evaluate(None, {"beta": True}) == (False, "custom_default")
+
+
+def test_invalid_rules():
+    """Test bad rules fail to compile and are rejected by the API."""
+    with pytest.raises(InvalidRuleError):
+        compile_condition({"attribute": "email", "op": "regex", "value": "("})
+    with pytest.raises(InvalidRuleError):
+        compile_condition({"attribute": "age", "op": "gt", "value": "old"})
+
+    # stored flags with bad rules fail closed instead of raising
+    compiled = compile_flag(_custom_flag("custom_broken", {"rules": [{"name": "x"}]}))
+    assert compiled.evaluate("u1", {}) == (False, "invalid_rules")
+
+    from main import app
+
+    client = TestClient(app)
+
+    response = client.post(
+        "/api/v1/flags",
+        json={
+            "key": "custom_invalid_flag",
+            "rules": {
+                "strategy": "custom",
+                "custom_rules": {
+                    "rules": [
+                        {"conditions": [{"attribute": "plan", "op": "like", "value": "x"}]},
+                    ]
+                },
+            },
+        },
+    )
+    assert response.status_code == 422
+
+
+def test_custom_flag_api():
+    """Test creating, evaluating and updating a custom flag through the API."""
+    from main import app
+
+    client = TestClient(app)
+
+    rules = {
+        "strategy": "custom",
+        "custom_rules": {
+            "rules": [
+                {"name": "us", "conditions": [{"attribute": "country", "op": "eq", "value": "US"}]},
+            ]
+        },
+    }
+    response = client.post("/api/v1/flags", json={"key": "custom_api_flag", "rules": rules})
+    assert response.status_code == 201
+
+    result = client.post(
+        "/api/v1/flags/evaluate",
+        json={
+            "key": "custom_api_flag",
+            "enabled": True,
+            "user_id": "u1",
+            "context": {"country": "US"},
+        },
+    ).json()
+    assert result["enabled"] is True
+    assert result["matched_rule"] == "custom:us"
+
+    rules["custom_rules"]["rules"][0]["conditions"][0]["value"] = "CA"
+    response = client.put("/api/v1/flags/custom_api_flag", json={"rules": rules})
+    assert response.status_code == 200
+
+    result = client.post(
+        "/api/v1/flags/evaluate",
+        json={
+            "key": "custom_api_flag",
+            "enabled": True,
+            "user_id": "u1",
+            "context": {"country": "US"},
+        },
+    ).json()
+    assert result["enabled"] is False
+
+    bad = {"strategy": "custom", "custom_rules": {"rules": "nope"}}
+    response = client.put("/api/v1/flags/custom_api_flag", json={"rules": bad})
+    assert response.status_code == 422
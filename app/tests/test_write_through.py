@@ -0,0 +1,222 @@
+"""
+Write-through tests.
+Tests the version scripts on fakeredis, which runs their real lua, the
+write path built on them and how creates detect existing flags.
+"""
+
+import fakeredis
+import pytest
+from redis.exceptions import ResponseError
+
+from core.redis_client import redis_client
+from core.ssm_client import ParameterExistsError, ssm_batch_loader, ssm_client
+from models.feature_flag import FeatureFlag, FeatureFlagCreate, FeatureFlagRule, FeatureFlagUpdate
+from services.feature_flag_service import (
+    RELEASE_VERSION_SCRIPT,
+    RESERVE_VERSION_SCRIPT,
+    VERSIONS_KEY,
+    WRITE_FLAG_SCRIPT,
+    FlagConflictError,
+    feature_flag_service,
+)
+from services.flag_index import INDEX_KEY
+
+RESERVATION_KEY = "feature_flags:writing:scripted_flag"
+
+
+@pytest.fixture
+def redis(monkeypatch):
+    """Serve the service from a fresh fakeredis."""
+    client = fakeredis.FakeAsyncRedis(decode_responses=True)
+    monkeypatch.setattr(redis_client, "get_client", lambda: client)
+    return client
+
+
+def _snapshot(flag):
+    feature_flag_service._local_cache.invalidate(flag.key)
+    feature_flag_service._local_cache.put(flag)
+
+
+async def test_write_flag_script_only_moves_forward(redis):
+    """Test a cache write older than the stored version is refused."""
+    write = redis.register_script(WRITE_FLAG_SCRIPT)
+    keys = ["feature_flag:scripted_flag", VERSIONS_KEY]
+
+    assert await write(keys=keys, args=["scripted_flag", 2, "v2", 60]) == 1
+    assert await write(keys=keys, args=["scripted_flag", 1, "v1", 60]) == 0
+    assert await redis.get("feature_flag:scripted_flag") == "v2"
+    assert 0 < await redis.ttl("feature_flag:scripted_flag") <= 60
+
+    # a ttl of 0 deletes, and the version stays behind for a recreate
+    assert await write(keys=keys, args=["scripted_flag", 3, "", 0]) == 1
+    assert await redis.exists("feature_flag:scripted_flag") == 0
+    assert await redis.hget(VERSIONS_KEY, "scripted_flag") == "3"
+
+
+async def test_version_reservation_scripts(redis):
+    """Test a reservation hands out the next version once and only its holder releases it."""
+    reserve = redis.register_script(RESERVE_VERSION_SCRIPT)
+    release = redis.register_script(RELEASE_VERSION_SCRIPT)
+    keys = [RESERVATION_KEY, VERSIONS_KEY]
+    await redis.hset(VERSIONS_KEY, "scripted_flag", 3)
+
+    assert await reserve(keys=keys, args=["scripted_flag", 3, 30]) == 4
+    assert await reserve(keys=keys, args=["scripted_flag", 3, 30]) == 0
+    assert 0 < await redis.ttl(RESERVATION_KEY) <= 30
+
+    assert await release(keys=[RESERVATION_KEY], args=[5]) == 0
+    assert await release(keys=[RESERVATION_KEY], args=[4]) == 1
+    assert await redis.exists(RESERVATION_KEY) == 0
+
+    # behind the last written version
+    assert await reserve(keys=keys, args=["scripted_flag", 2, 30]) == 0
+    # ahead of it, e.g. a cache that lost the versions hash
+    assert await reserve(keys=keys, args=["scripted_flag", 7, 30]) == 8
+
+
+async def test_update_takes_its_version_from_redis(redis, monkeypatch):
+    """Test an update reserves the next version and a stale or concurrent one conflicts."""
+    saved = []
+
+    async def save_to_ssm(flag, overwrite=True, strict=False):
+        saved.append(flag.version)
+        return True
+
+    monkeypatch.setattr(feature_flag_service, "_save_to_ssm", save_to_ssm)
+    flag = FeatureFlag(key="reserved_flag", version=3)
+    reservation_key = "feature_flags:writing:reserved_flag"
+    update = FeatureFlagUpdate(enabled=False)
+
+    await redis.hset(VERSIONS_KEY, "reserved_flag", 3)
+    _snapshot(flag)
+    updated = await feature_flag_service.update_flag("reserved_flag", update)
+    assert (updated.version, saved) == (4, [4])
+    assert await redis.hget(VERSIONS_KEY, "reserved_flag") == "4"
+    assert FeatureFlag.model_validate_json(await redis.get("feature_flag:reserved_flag")) == updated
+    assert await redis.exists(reservation_key) == 0
+
+    # another replica wrote v4 after our snapshot read v3, ssm is never touched
+    _snapshot(flag)
+    with pytest.raises(FlagConflictError):
+        await feature_flag_service.update_flag("reserved_flag", update)
+    assert saved == [4]
+    assert feature_flag_service._local_cache.get("reserved_flag") is None
+
+    # a write still in flight holds the next version
+    _snapshot(FeatureFlag(key="reserved_flag", version=4))
+    await redis.set(reservation_key, 5)
+    with pytest.raises(FlagConflictError):
+        await feature_flag_service.delete_flag("reserved_flag")
+    assert saved == [4]
+
+
+async def test_superseded_write_through_leaves_the_index_alone(redis, monkeypatch):
+    """Test a write-through refused by the version guard conflicts and a failed put releases."""
+
+    async def save_to_ssm(flag, overwrite=True, strict=False):
+        # a newer write lands while this one is at ssm
+        await redis.hset(VERSIONS_KEY, flag.key, 9)
+        return True
+
+    monkeypatch.setattr(feature_flag_service, "_save_to_ssm", save_to_ssm)
+    flag = FeatureFlag(key="superseded_flag", version=1)
+    reservation_key = "feature_flags:writing:superseded_flag"
+
+    _snapshot(flag)
+    with pytest.raises(FlagConflictError):
+        await feature_flag_service.update_flag("superseded_flag", FeatureFlagUpdate(enabled=False))
+    assert await redis.hget(VERSIONS_KEY, "superseded_flag") == "9"
+    assert await redis.exists(reservation_key, "feature_flag:superseded_flag") == 0
+    assert await redis.hget(INDEX_KEY, "superseded_flag") is None
+
+    async def failing_save(flag, overwrite=True, strict=False):
+        raise RuntimeError("throttled")
+
+    monkeypatch.setattr(feature_flag_service, "_save_to_ssm", failing_save)
+    await redis.hset(VERSIONS_KEY, "superseded_flag", 1)
+    _snapshot(flag)
+    with pytest.raises(RuntimeError):
+        await feature_flag_service.update_flag(
+            "superseded_flag", FeatureFlagUpdate(enabled=False), strict=True
+        )
+    assert await redis.exists(reservation_key) == 0
+    assert await redis.hget(VERSIONS_KEY, "superseded_flag") == "1"
+
+
+async def test_create_reserves_its_version(redis, monkeypatch):
+    """Test a create continues a deleted flag's numbering and conflicts with a write in flight."""
+
+    async def save_to_ssm(flag, overwrite=True, strict=False):
+        return True
+
+    monkeypatch.setattr(feature_flag_service, "_save_to_ssm", save_to_ssm)
+    reservation_key = "feature_flags:writing:recreated_flag"
+    feature_flag_service._local_cache.invalidate("recreated_flag")
+
+    # a delete of the old flag is still on its way to ssm
+    await redis.hset(VERSIONS_KEY, "recreated_flag", 5)
+    await redis.set(reservation_key, 6)
+    create = FeatureFlagCreate(key="recreated_flag", rules=FeatureFlagRule())
+    with pytest.raises(FlagConflictError):
+        await feature_flag_service.create_flag(create)
+
+    await redis.delete(reservation_key)
+    created = await feature_flag_service.create_flag(create)
+    assert created.version == 6
+    assert await redis.hget(VERSIONS_KEY, "recreated_flag") == "6"
+    assert await redis.exists(reservation_key) == 0
+
+
+async def test_failed_write_through_releases_the_reservation(redis, monkeypatch):
+    """Test a redis error in the write-through doesn't leave the key reserved."""
+
+    async def save_to_ssm(flag, overwrite=True, strict=False):
+        return True
+
+    pipeline = redis.pipeline
+
+    def failing_pipeline(transaction=True):
+        pipe = pipeline(transaction=transaction)
+
+        async def execute(raise_on_error=True):
+            raise ResponseError("OOM command not allowed when used memory > 'maxmemory'")
+
+        pipe.execute = execute
+        return pipe
+
+    monkeypatch.setattr(feature_flag_service, "_save_to_ssm", save_to_ssm)
+    monkeypatch.setattr(redis, "pipeline", failing_pipeline)
+    await redis.hset(VERSIONS_KEY, "unwritten_flag", 1)
+    _snapshot(FeatureFlag(key="unwritten_flag", version=1))
+
+    updated = await feature_flag_service.update_flag("unwritten_flag", FeatureFlagUpdate())
+    assert updated.version == 2
+    assert await redis.exists("feature_flags:writing:unwritten_flag") == 0
+
+    # the next write doesn't have to wait out the reservation ttl
+    monkeypatch.setattr(redis, "pipeline", pipeline)
+    updated = await feature_flag_service.update_flag("unwritten_flag", FeatureFlagUpdate())
+    assert updated.version == 3
+
+
+async def test_create_conflict_is_a_non_overwriting_put(monkeypatch):
+    """Test create detects a flag only SSM has without reading it first."""
+    puts = []
+
+    async def put_parameter(name, value, description="", overwrite=True, strict=False):
+        puts.append(overwrite)
+        raise ParameterExistsError(name)
+
+    async def load(name):
+        raise AssertionError("create shouldn't read SSM")
+
+    monkeypatch.setattr(ssm_client, "is_enabled", lambda: True)
+    monkeypatch.setattr(ssm_client, "put_parameter", put_parameter)
+    monkeypatch.setattr(ssm_batch_loader, "load", load)
+
+    with pytest.raises(ValueError, match="already exists"):
+        await feature_flag_service.create_flag(
+            FeatureFlagCreate(key="ssm_only_flag", rules=FeatureFlagRule())
+        )
+    assert puts == [False]
+    assert feature_flag_service._local_cache.get("ssm_only_flag") is None
@@ -0,0 +1,76 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+os.environ.setdefault("ENVIRONMENT", "development")
+os.environ.setdefault("REDIS_ENABLED", "false")
+os.environ.setdefault("SSM_ENABLED", "false")
+os.environ.setdefault("LOG_LEVEL", "WARNING")
+
+from benchmarks.fakes import FakeSSM, InMemoryRedis  # noqa: E402
+from benchmarks.harness import UPDATE_BASELINE, save_baselines  # noqa: E402
+
+
+# simulated round-trips: same-AZ redis and a parameter store call
+REDIS_LATENCY = 0.0002
+SSM_LATENCY = 0.005
+
+_results = {}
+
+
+@pytest.fixture(scope="session", autouse=True)
+def quiet_logs():
+    from loguru import logger
+
+    logger.remove()
+    yield
+
+
+@pytest.fixture
+def backends():
+    """Wire in-memory Redis and SSM into the global clients."""
+    from core.config import settings
+    from core.redis_client import redis_client
+    from core.ssm_client import ssm_client
+    from services.feature_flag_service import feature_flag_service
+
+    redis = InMemoryRedis(latency=REDIS_LATENCY)
+    ssm = FakeSSM(prefix=settings.ssm_prefix, latency=SSM_LATENCY)
+
+    redis_client._client, redis_client._connected = redis, True
+    ssm_client._client, ssm_client._enabled = ssm, True
+    ssm_client._executor = ThreadPoolExecutor(max_workers=settings.ssm_max_workers)
+    feature_flag_service._local_cache.clear()
+
+    yield redis, ssm
+
+    ssm_client._executor.shutdown(wait=True)
+    redis_client._client, redis_client._connected = None, False
+    ssm_client._client, ssm_client._enabled = None, settings.ssm_enabled
+    ssm_client._executor = None
+    feature_flag_service._local_cache.clear()
+
+
+@pytest.fixture
+def record():
+    """Collect results so they can be reported and saved as baselines."""
+
+    def _record(result):
+        _results[result.name] = result
+        return result
+
+    return _record
+
+
+def pytest_terminal_summary(terminalreporter):
+    if not _results:
+        return
+
+    terminalreporter.section("benchmark results")
+    for result in _results.values():
+        terminalreporter.write_line(str(result))
+
+    if UPDATE_BASELINE:
+        save_baselines(_results)
+        terminalreporter.write_line("baselines updated")
@@ -0,0 +1,388 @@
+"""
+In-memory stand-ins for Redis and SSM.
+Just enough of each API for the service, with optional simulated latency so
+cache hits and misses cost roughly what they would over the network.
+"""
+
+import asyncio
+import fnmatch
+import hashlib
+import time
+from typing import Any, Dict, List, Optional
+
+from lupa import LuaRuntime
+from redis.commands.core import AsyncScript
+from redis.connection import Encoder
+from redis.exceptions import NoScriptError
+
+
+class InMemoryRedis:
+    # mimics redis.asyncio.Redis with decode_responses=True
+    def __init__(self, latency: float = 0.0):
+        self.latency = latency
+        self.data: Dict[str, Any] = {}
+        self.scripts: Dict[str, str] = {}
+        self.calls = 0
+        self._lua: Optional[LuaRuntime] = None
+
+    async def _roundtrip(self):
+        self.calls += 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+
+    async def ping(self) -> bool:
+        await self._roundtrip()
+        return True
+
+    async def get(self, key: str) -> Optional[str]:
+        await self._roundtrip()
+        return self.data.get(key)
+
+    async def mget(self, keys: List[str]) -> List[Optional[str]]:
+        await self._roundtrip()
+        return [self.data.get(key) for key in keys]
+
+    async def set(self, key: str, value: str, ex: Optional[int] = None, nx: bool = False):
+        await self._roundtrip()
+        if nx and key in self.data:
+            return None
+        self.data[key] = value
+        return True
+
+    async def setex(self, key: str, ttl: int, value: str):
+        await self._roundtrip()
+        self.data[key] = value
+        return True
+
+    async def delete(self, *keys: str) -> int:
+        await self._roundtrip()
+        return sum(1 for key in keys if self.data.pop(key, None) is not None)
+
+    async def exists(self, *keys: str) -> int:
+        await self._roundtrip()
+        return sum(1 for key in keys if key in self.data)
+
+    async def hget(self, key: str, field: str) -> Optional[str]:
+        await self._roundtrip()
+        return self.data.get(key, {}).get(field)
+
+    async def hgetall(self, key: str) -> Dict[str, str]:
+        await self._roundtrip()
+        return dict(self.data.get(key, {}))
+
+    async def hset(
+        self,
+        key: str,
+        field: Optional[str] = None,
+        value: Any = None,
+        mapping: Optional[Dict[str, Any]] = None,
+    ) -> int:
+        await self._roundtrip()
+        fields = self.data.setdefault(key, {})
+        updates = dict(mapping or {})
+        if field is not None:
+            updates[field] = value
+        created = sum(1 for name in updates if name not in fields)
+        fields.update({name: str(value) for name, value in updates.items()})
+        return created
+
+    async def hmget(self, key: str, fields: List[str]) -> List[Optional[str]]:
+        await self._roundtrip()
+        stored = self.data.get(key, {})
+        return [stored.get(field) for field in fields]
+
+    async def hsetnx(self, key: str, field: str, value: str) -> bool:
+        await self._roundtrip()
+        fields = self.data.setdefault(key, {})
+        if field in fields:
+            return False
+        fields[field] = value
+        return True
+
+    async def hincrby(self, key: str, field: str, amount: int = 1) -> int:
+        await self._roundtrip()
+        fields = self.data.setdefault(key, {})
+        fields[field] = str(int(fields.get(field, 0)) + amount)
+        return int(fields[field])
+
+    async def hdel(self, key: str, *fields: str) -> int:
+        await self._roundtrip()
+        stored = self.data.get(key, {})
+        return sum(1 for field in fields if stored.pop(field, None) is not None)
+
+    async def sadd(self, key: str, *members: str) -> int:
+        await self._roundtrip()
+        stored = self.data.setdefault(key, set())
+        before = len(stored)
+        stored.update(members)
+        return len(stored) - before
+
+    async def srem(self, key: str, *members: str) -> int:
+        await self._roundtrip()
+        stored = self.data.get(key, set())
+        before = len(stored)
+        stored.difference_update(members)
+        return before - len(stored)
+
+    async def scard(self, key: str) -> int:
+        await self._roundtrip()
+        return len(self.data.get(key, ()))
+
+    async def sismember(self, key: str, member: str) -> bool:
+        await self._roundtrip()
+        return member in self.data.get(key, ())
+
+    async def smismember(self, key: str, members: List[str]) -> List[int]:
+        await self._roundtrip()
+        stored = self.data.get(key, ())
+        return [int(member in stored) for member in members]
+
+    async def zadd(self, key: str, mapping: Dict[str, float]) -> int:
+        await self._roundtrip()
+        scores = self.data.setdefault(key, {})
+        added = sum(1 for member in mapping if member not in scores)
+        scores.update(mapping)
+        return added
+
+    async def zrem(self, key: str, *members: str) -> int:
+        await self._roundtrip()
+        scores = self.data.get(key, {})
+        return sum(1 for member in members if scores.pop(member, None) is not None)
+
+    async def zrevrange(self, key: str, start: int, end: int, withscores: bool = False) -> list:
+        await self._roundtrip()
+        scores = self.data.get(key, {})
+        members = sorted(scores, key=lambda member: (scores[member], member), reverse=True)
+        members = members[start : None if end == -1 else end + 1]
+        return [(member, scores[member]) for member in members] if withscores else members
+
+    async def zrangebylex(
+        self, key: str, low: str, high: str, start: Optional[int] = None, num: Optional[int] = None
+    ) -> List[str]:
+        await self._roundtrip()
+        members = sorted(self.data.get(key, {}))
+        # "[x" is inclusive, "(x" exclusive, "-" / "+" unbounded
+        if low != "-":
+            inclusive, bound = low[0] == "[", low[1:]
+            members = [m for m in members if m > bound or (inclusive and m == bound)]
+        if high != "+":
+            inclusive, bound = high[0] == "[", high[1:]
+            members = [m for m in members if m < bound or (inclusive and m == bound)]
+        if start is not None:
+            members = members[start:] if num in (None, -1) else members[start : start + num]
+        return members
+
+    async def rename(self, source: str, destination: str) -> bool:
+        await self._roundtrip()
+        self.data[destination] = self.data.pop(source)
+        return True
+
+    async def publish(self, channel: str, message: str) -> int:
+        await self._roundtrip()
+        return 0
+
+    async def keys(self, pattern: str = "*") -> List[str]:
+        await self._roundtrip()
+        return [key for key in self.data if fnmatch.fnmatchcase(key, pattern)]
+
+    def get_encoder(self) -> Encoder:
+        # what register_script hashes the script body with
+        return Encoder(encoding="utf-8", encoding_errors="strict", decode_responses=True)
+
+    def register_script(self, script: str) -> AsyncScript:
+        # loaded right away, redis-py's pipeline loads registered scripts before executing
+        registered = AsyncScript(self, script)
+        self.scripts[registered.sha] = script
+        return registered
+
+    async def script_load(self, script: str) -> str:
+        await self._roundtrip()
+        sha = hashlib.sha1(script.encode()).hexdigest()
+        self.scripts[sha] = script
+        return sha
+
+    async def evalsha(self, sha: str, numkeys: int, *keys_and_args: Any) -> Any:
+        await self._roundtrip()
+        if sha not in self.scripts:
+            raise NoScriptError("No matching script")
+        keys, args = keys_and_args[:numkeys], keys_and_args[numkeys:]
+        return self._run_script(self.scripts[sha], keys, args)
+
+    def _run_script(self, script: str, keys: tuple, args: tuple) -> Any:
+        # the real lua, with redis.call served straight from self.data
+        if self._lua is None:
+            self._lua = LuaRuntime()
+            self._lua.globals().redis = self._lua.table_from({"call": self._call})
+        lua_globals = self._lua.globals()
+        lua_globals.KEYS = self._lua.table_from([str(key) for key in keys])
+        lua_globals.ARGV = self._lua.table_from([str(arg) for arg in args])
+        result = self._lua.execute(script)
+        # lua to redis reply conversion: false is nil, true is 1, numbers truncate
+        if result is None or result is False:
+            return None
+        if isinstance(result, (bool, float)):
+            return int(result)
+        return result
+
+    def _call(self, command: str, *args: Any) -> Any:
+        # the commands the service's scripts use. A nil reply reaches lua as false
+        command, args = command.upper(), [str(arg) for arg in args]
+        if command == "GET":
+            return self.data.get(args[0], False)
+        if command == "SET":
+            key, value, options = args[0], args[1], [option.upper() for option in args[2:]]
+            if "NX" in options and key in self.data:
+                return False
+            self.data[key] = value
+            return self._lua.table_from({"ok": "OK"})
+        if command == "DEL":
+            return sum(1 for key in args if self.data.pop(key, None) is not None)
+        if command == "HGET":
+            return self.data.get(args[0], {}).get(args[1], False)
+        if command == "HSET":
+            fields = self.data.setdefault(args[0], {})
+            updates = dict(zip(args[1::2], args[2::2]))
+            created = sum(1 for field in updates if field not in fields)
+            fields.update(updates)
+            return created
+        raise NotImplementedError(f"{command} isn't supported in scripts")
+
+    def pipeline(self, transaction: bool = True) -> "InMemoryPipeline":
+        return InMemoryPipeline(self)
+
+    async def aclose(self):
+        pass
+
+    def flushall(self):
+        self.data.clear()
+
+
+class InMemoryPipeline:
+    # queues commands and runs them in one simulated round-trip
+    def __init__(self, redis: InMemoryRedis):
+        self._redis = redis
+        self._commands: List[tuple] = []
+        # between watch() and multi() commands run right away, like redis-py's
+        self._immediate = False
+
+    async def __aenter__(self) -> "InMemoryPipeline":
+        return self
+
+    async def __aexit__(self, *exc_info):
+        self._commands = []
+
+    def __await__(self):
+        # queueing returns the pipeline, which redis-py's pipelines let you await
+        return self._self().__await__()
+
+    async def _self(self) -> "InMemoryPipeline":
+        return self
+
+    async def watch(self, *keys: str):
+        # watched keys aren't tracked, a write racing the transaction goes through
+        self._immediate = True
+
+    def multi(self):
+        self._immediate = False
+
+    def __getattr__(self, name: str):
+        if self._immediate:
+            return getattr(self._redis, name)
+
+        def queue(*args, **kwargs):
+            self._commands.append((name, args, kwargs))
+            return self
+
+        return queue
+
+    async def execute(self) -> List[Any]:
+        await self._redis._roundtrip()
+        latency, self._redis.latency = self._redis.latency, 0.0
+        try:
+            results = []
+            for name, args, kwargs in self._commands:
+                results.append(await getattr(self._redis, name)(*args, **kwargs))
+            return results
+        finally:
+            self._redis.latency = latency
+            self._commands = []
+
+
+class ParameterNotFound(Exception):
+    pass
+
+
+class ParameterAlreadyExists(Exception):
+    pass
+
+
+class _Exceptions:
+    ParameterNotFound = ParameterNotFound
+    ParameterAlreadyExists = ParameterAlreadyExists
+
+
+class FakeSSM:
+    # mimics the boto3 ssm client, blocking like the real one
+    exceptions = _Exceptions
+
+    def __init__(self, prefix: str, latency: float = 0.0):
+        self.prefix = prefix
+        self.latency = latency
+        self.parameters: Dict[str, str] = {}
+        self.calls = 0
+
+    def _roundtrip(self):
+        self.calls += 1
+        if self.latency:
+            time.sleep(self.latency)
+
+    def describe_parameters(self, **kwargs):
+        self._roundtrip()
+        return {"Parameters": []}
+
+    def get_parameter(self, Name: str, WithDecryption: bool = False):
+        self._roundtrip()
+        if Name not in self.parameters:
+            raise ParameterNotFound(Name)
+        return {"Parameter": {"Name": Name, "Value": self.parameters[Name]}}
+
+    def get_parameters(self, Names: List[str], WithDecryption: bool = False):
+        self._roundtrip()
+        found = [name for name in Names if name in self.parameters]
+        return {
+            "Parameters": [{"Name": name, "Value": self.parameters[name]} for name in found],
+            "InvalidParameters": [name for name in Names if name not in self.parameters],
+        }
+
+    def put_parameter(self, Name: str, Value: str, Overwrite: bool = True, **kwargs):
+        self._roundtrip()
+        if not Overwrite and Name in self.parameters:
+            raise ParameterAlreadyExists(Name)
+        self.parameters[Name] = Value
+        return {"Version": 1}
+
+    def delete_parameter(self, Name: str):
+        self._roundtrip()
+        if Name not in self.parameters:
+            raise ParameterNotFound(Name)
+        del self.parameters[Name]
+
+    def get_paginator(self, operation: str) -> "FakePaginator":
+        return FakePaginator(self)
+
+
+class FakePaginator:
+    def __init__(self, ssm: FakeSSM, page_size: int = 10):
+        self._ssm = ssm
+        self._page_size = page_size
+
+    def paginate(self, Path: str, Recursive: bool = True):
+        names = sorted(name for name in self._ssm.parameters if name.startswith(Path))
+        for i in range(0, len(names), self._page_size):
+            self._ssm._roundtrip()
+            yield {
+                "Parameters": [
+                    {"Name": name, "Value": self._ssm.parameters[name]}
+                    for name in names[i : i + self._page_size]
+                ]
+            }
@@ -0,0 +1,140 @@
+"""
+Tiny benchmark harness.
+Times async operations, reports p50/p99 latency and ops/sec, and compares
+the numbers against stored baselines.
+"""
+
+import asyncio
+import gc
+import json
+import os
+import time
+from pathlib import Path
+from typing import Awaitable, Callable, Dict, List, Optional
+
+
+BASELINE_FILE = Path(__file__).parent / "baselines.json"
+
+# allowed slowdown before a scenario counts as a regression (1.0 = twice as slow)
+TOLERANCE = float(os.environ.get("BENCH_TOLERANCE", "1.0"))
+UPDATE_BASELINE = os.environ.get("BENCH_UPDATE_BASELINE") == "1"
+
+
+class BenchResult:
+    def __init__(self, name: str, latencies_ns: List[int], wall_seconds: float):
+        self.name = name
+        self.ops = len(latencies_ns)
+        latencies = sorted(latencies_ns)
+        self.p50_us = latencies[len(latencies) // 2] / 1000
+        self.p99_us = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))] / 1000
+        self.ops_per_sec = self.ops / wall_seconds if wall_seconds else float("inf")
+
+    @classmethod
+    def best_of(cls, results: List["BenchResult"]) -> "BenchResult":
+        # each metric from its best round, like timeit's min of repeats
+        best = max(results, key=lambda result: result.ops_per_sec)
+        best.p50_us = min(result.p50_us for result in results)
+        best.p99_us = min(result.p99_us for result in results)
+        return best
+
+    def to_dict(self) -> Dict[str, float]:
+        return {
+            "ops_per_sec": round(self.ops_per_sec, 1),
+            "p50_us": round(self.p50_us, 1),
+            "p99_us": round(self.p99_us, 1),
+        }
+
+    def __str__(self) -> str:
+        return (
+            f"{self.name:<32} {self.ops_per_sec:>12,.0f} ops/s"
+            f"   p50 {self.p50_us:>9.1f}us   p99 {self.p99_us:>9.1f}us"
+        )
+
+
+async def run_sequential(
+    name: str,
+    operation: Callable[[], Awaitable],
+    iterations: int,
+    setup: Optional[Callable[[], Awaitable]] = None,
+    warmup: int = 50,
+    rounds: int = 3,
+) -> BenchResult:
+    # setup runs before every timed call and is excluded from the timings
+    for _ in range(warmup):
+        if setup:
+            await setup()
+        await operation()
+
+    # best of a few rounds, a single noisy neighbour shouldn't fail the run
+    results = []
+    for _ in range(rounds):
+        # like timeit, keep gc pauses out of the numbers
+        gc.collect()
+        gc.disable()
+        latencies = []
+        wall = 0.0
+        for _ in range(iterations):
+            if setup:
+                await setup()
+            start = time.perf_counter_ns()
+            await operation()
+            elapsed = time.perf_counter_ns() - start
+            latencies.append(elapsed)
+            wall += elapsed / 1e9
+        gc.enable()
+
+        results.append(BenchResult(name, latencies, wall))
+
+    return BenchResult.best_of(results)
+
+
+async def run_concurrent(
+    name: str, operation: Callable[[], Awaitable], clients: int, iterations: int
+) -> BenchResult:
+    # many clients in flight at once, throughput is measured on wall time
+    latencies: List[int] = []
+
+    async def client():
+        for _ in range(iterations):
+            start = time.perf_counter_ns()
+            await operation()
+            latencies.append(time.perf_counter_ns() - start)
+
+    await asyncio.gather(*(operation() for _ in range(clients)))
+
+    start = time.perf_counter()
+    await asyncio.gather(*(client() for _ in range(clients)))
+    return BenchResult(name, latencies, time.perf_counter() - start)
+
+
+def load_baselines() -> Dict[str, Dict[str, float]]:
+    if not BASELINE_FILE.exists():
+        return {}
+    return json.loads(BASELINE_FILE.read_text())
+
+
+def save_baselines(results: Dict[str, BenchResult]):
+    baselines = load_baselines()
+    baselines.update({name: result.to_dict() for name, result in results.items()})
+    BASELINE_FILE.write_text(json.dumps(baselines, indent=2, sort_keys=True) + "\n")
+
+
+def find_regression(result: BenchResult, baseline: Optional[Dict[str, float]]) -> Optional[str]:
+    if not baseline:
+        return None
+
+    problems = []
+    min_ops = baseline["ops_per_sec"] / (1 + TOLERANCE)
+    if result.ops_per_sec < min_ops:
+        problems.append(f"ops/sec {result.ops_per_sec:,.0f} < {min_ops:,.0f}")
+
+    max_p50 = baseline["p50_us"] * (1 + TOLERANCE)
+    if result.p50_us > max_p50:
+        problems.append(f"p50 {result.p50_us:.1f}us > {max_p50:.1f}us")
+
+    # tails are noisier, give them twice the slack
+    max_p99 = baseline["p99_us"] * (1 + 2 * TOLERANCE)
+    if result.p99_us > max_p99:
+        problems.append(f"p99 {result.p99_us:.1f}us > {max_p99:.1f}us")
+
+    return f"{result.name} regressed: " + ", ".join(problems) if problems else None
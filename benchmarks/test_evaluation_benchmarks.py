@@ -0,0 +1,146 @@
+"""
+Evaluation hot-path benchmarks.
+Each scenario fails if it is slower than its stored baseline by more than
+BENCH_TOLERANCE. Run with BENCH_UPDATE_BASELINE=1 to record new baselines.
+"""
+
+import httpx
+import pytest
+
+from benchmarks.harness import find_regression, load_baselines, run_concurrent, run_sequential
+from models.feature_flag import (
+    BatchEvaluationUser,
+    FeatureFlag,
+    FeatureFlagCreate,
+    FeatureFlagRule,
+    RolloutStrategy,
+)
+from services.feature_flag_service import feature_flag_service
+
+
+pytestmark = pytest.mark.benchmark
+
+BASELINES = load_baselines()
+
+
+def check(result):
+    regression = find_regression(result, BASELINES.get(result.name))
+    assert regression is None, regression
+
+
+async def create(key: str, **rules) -> FeatureFlag:
+    rule = FeatureFlagRule(**rules) if rules else FeatureFlagRule()
+    return await feature_flag_service.create_flag(FeatureFlagCreate(key=key, rules=rule))
+
+
+async def test_evaluate_local_hit(backends, record):
+    await create("bench_pct", strategy=RolloutStrategy.PERCENTAGE, percentage=50)
+
+    result = await run_sequential(
+        "evaluate_local_hit",
+        lambda: feature_flag_service.evaluate_flag("bench_pct", "user42"),
+        iterations=10000,
+    )
+    check(record(result))
+
+
+async def test_evaluate_redis_hit(backends, record):
+    await create("bench_redis", strategy=RolloutStrategy.PERCENTAGE, percentage=50)
+
+    async def drop_local():
+        feature_flag_service._local_cache.invalidate("bench_redis")
+
+    result = await run_sequential(
+        "evaluate_redis_hit",
+        lambda: feature_flag_service.evaluate_flag("bench_redis", "user42"),
+        iterations=1000,
+        setup=drop_local,
+    )
+    check(record(result))
+
+
+async def test_evaluate_ssm_miss(backends, record):
+    redis, _ = backends
+    await create("bench_cold", strategy=RolloutStrategy.ALL)
+
+    async def drop_caches():
+        feature_flag_service._local_cache.invalidate("bench_cold")
+        redis.flushall()
+
+    result = await run_sequential(
+        "evaluate_ssm_miss",
+        lambda: feature_flag_service.evaluate_flag("bench_cold", "user42"),
+        iterations=100,
+        setup=drop_caches,
+    )
+    check(record(result))
+
+
+async def test_evaluate_large_user_list(backends, record):
+    user_ids = [f"user{i}" for i in range(100000)]
+    await create("bench_users", strategy=RolloutStrategy.USER_LIST, user_ids=user_ids)
+
+    result = await run_sequential(
+        "evaluate_large_user_list",
+        lambda: feature_flag_service.evaluate_flag("bench_users", "user99999"),
+        iterations=10000,
+    )
+    check(record(result))
+
+
+async def test_get_flag_local_hit(backends, record):
+    await create("bench_get")
+
+    result = await run_sequential(
+        "get_flag_local_hit", lambda: feature_flag_service.get_flag("bench_get"), iterations=10000
+    )
+    check(record(result))
+
+
+async def test_batch_evaluate(backends, record):
+    keys = [f"bench_batch_{i}" for i in range(20)]
+    for key in keys:
+        await create(key, strategy=RolloutStrategy.PERCENTAGE, percentage=30)
+    users = [BatchEvaluationUser(user_id=f"user{i}") for i in range(50)]
+
+    result = await run_sequential(
+        "batch_evaluate_20x50",
+        lambda: feature_flag_service.evaluate_flags(keys, users),
+        iterations=200,
+    )
+    check(record(result))
+
+
+async def test_batch_evaluate_cold(backends, record):
+    redis, _ = backends
+    keys = [f"bench_batch_cold_{i}" for i in range(20)]
+    for key in keys:
+        await create(key, strategy=RolloutStrategy.ALL)
+    users = [BatchEvaluationUser(user_id="user1")]
+
+    async def drop_caches():
+        feature_flag_service._local_cache.clear()
+        redis.flushall()
+
+    result = await run_sequential(
+        "batch_evaluate_cold_20",
+        lambda: feature_flag_service.evaluate_flags(keys, users),
+        iterations=100,
+        setup=drop_caches,
+    )
+    check(record(result))
+
+
+async def test_concurrent_route(backends, record):
+    from main import app
+
+    await create("bench_route", strategy=RolloutStrategy.PERCENTAGE, percentage=50)
+
+    async with httpx.AsyncClient(app=app, base_url="http://bench") as client:
+        result = await run_concurrent(
+            "route_evaluate_50_clients",
+            lambda: client.get("/api/v1/flags/bench_route/evaluate", params={"user_id": "u1"}),
+            clients=50,
+            iterations=40,
+        )
+    check(record(result))